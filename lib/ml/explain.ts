@@ -73,3 +73,15 @@ export function explainImportance(importance: Record<string, number> | undefined
     .map(([k, v]) => `${k} (${Math.round(v * 100)}%)`);
   return items.length ? `Most influential features: ${items.join(", ")}.` : null;
 }
+
+/** One donor's / request's own drivers, from per-row attributions (`explain` on the batch). */
+export function explainAttributions(attributions: Record<string, number> | undefined, top = 3): string | null {
+  if (!attributions) return null;
+  const items = Object.entries(attributions)
+    .sort((a, b) => Math.abs(b[1]) - Math.abs(a[1]))
+    .slice(0, top);
+  const up = items.filter(([, v]) => v > 0).map(([k]) => k);
+  const down = items.filter(([, v]) => v < 0).map(([k]) => k);
+  const parts = [up.length ? `raised by ${up.join(", ")}` : "", down.length ? `lowered by ${down.join(", ")}` : ""].filter(Boolean);
+  return parts.length ? `This score was ${parts.join("; ")}.` : null;
+}
@@ -3,7 +3,8 @@
  *
  * This is the ONLY place agents talk to the model. Behaviour:
  *  - one batched call per agent step (`predictBatch`)
- *  - short timeout (ML_TIMEOUT_MS, default 3 s) + one retry
+ *  - short timeout (ML_TIMEOUT_MS, default 3 s) + one retry; each attempt sends its
+ *    remaining budget (`budgetMs`) so the service drops work we will no longer wait for
  *  - shared-secret header (ML_API_SECRET)
  *  - never throws: returns null on any failure so the caller falls back to
  *    deterministic logic and records `fallback_reason`
@@ -25,6 +26,8 @@ export interface PredictOptions {
   timeoutMs?: number;
   retries?: number;
   modelVersion?: string;
+  /** Ask for the top-k per-row feature attributions (see PredictResult.attributions). */
+  explain?: number;
   /** Injectable fetch for tests. */
   fetchImpl?: typeof fetch;
   env?: Record<string, string | undefined>;
@@ -43,6 +46,9 @@ export interface PredictSuccess {
 }
 export type PredictOutcome = PredictSuccess | PredictFailure;
 
+/** Allowance for transport + JSON on both sides, subtracted from the attempt timeout. */
+const BUDGET_MARGIN_MS = 100;
+
 function isRecord(v: unknown): v is Record<string, unknown> {
   return typeof v === "object" && v !== null && !Array.isArray(v);
 }
@@ -60,6 +66,7 @@ function parseResult(v: unknown): PredictResult | null {
     prediction: pred as number | number[],
     confidence: v.confidence,
     featureImportance: isRecord(v.featureImportance) ? (v.featureImportance as Record<string, number>) : undefined,
+    attributions: isRecord(v.attributions) ? (v.attributions as Record<string, number>) : undefined,
     backend: typeof v.backend === "string" ? v.backend : undefined,
   };
 }
@@ -105,7 +112,12 @@ export async function predictBatchDetailed(
   const fetchImpl = opts.fetchImpl ?? fetch;
   const timeoutMs = opts.timeoutMs ?? conn.timeoutMs;
   const retries = opts.retries ?? 1;
-  const body: PredictBatchRequest = { requests, ...(opts.modelVersion ? { modelVersion: opts.modelVersion } : {}) };
+  const body: PredictBatchRequest = {
+    requests,
+    budgetMs: Math.max(1, timeoutMs - BUDGET_MARGIN_MS),
+    ...(opts.modelVersion ? { modelVersion: opts.modelVersion } : {}),
+    ...(opts.explain ? { explain: opts.explain } : {}),
+  };
   const headers: Record<string, string> = { "Content-Type": "application/json" };
   if (conn.apiSecret) headers["X-ML-Secret"] = conn.apiSecret;
 
@@ -66,14 +66,26 @@ export type FeatureVector = Record<string, FeatureValue>;
 
 export interface PredictRequest {
   task: PredictionTask;
+  /** With `entity`: only the task-specific extras (may be empty). */
   features: FeatureVector;
   /** Optional caller-side identifier echoed back in the result. */
   ref?: string;
+  /** Key into `PredictBatchRequest.entities`; its features are parsed once for every task. */
+  entity?: string;
 }
 
 export interface PredictBatchRequest {
   /** Pin a specific model version; omit for the active version. */
   modelVersion?: string;
+  /**
+   * Caller's remaining time for this attempt (ms from receipt). The service sheds work
+   * it cannot finish in time and answers late heads from the rules baseline.
+   */
+  budgetMs?: number;
+  /** Feature dicts shared by several requests (e.g. one donor scored by three tasks). */
+  entities?: Record<string, FeatureVector>;
+  /** Return each row's top-k signed feature attributions (`PredictResult.attributions`); 0/omitted = off. */
+  explain?: number;
   requests: PredictRequest[];
 }
 
@@ -90,7 +102,13 @@ export interface PredictResult {
   confidence: number;
   /** Optional per-feature contribution scores (GBDT importances / MLP gradients). */
   featureImportance?: Record<string, number>;
-  /** Which backend produced this (mlp | gbdt | baseline). */
+  /**
+   * Per-row contributions to this prediction's raw output (log-odds / class logit / model-space value),
+   * largest |value| first; positive pushes the prediction up. Only when the request asked for `explain`
+   * and the service had time to compute them.
+   */
+  attributions?: Record<string, number>;
+  /** Which backend produced this (mlp | gbdt | linear | rules; "rules" also when the service fell back to the baseline). */
   backend?: string;
 }
 
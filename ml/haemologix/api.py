@@ -1,31 +1,79 @@
 """FastAPI model service.
 
-    POST /predict/batch   {modelVersion?, requests:[{task, features, ref?}]}
-                          → {modelVersion, results:[{task, ref, prediction, confidence, featureImportance?, backend}], latencyMs}
-    GET  /health          {status, model_loaded, activeVersion, tasks:{task: backend}}
+    POST /predict/batch   {modelVersion?, budgetMs?, explain?, entities?:{ref: features}, requests:[{task, features?, ref?, entity?}]}
+                          → {modelVersion, results:[{task, ref, prediction, confidence, featureImportance?, attributions?, backend}], latencyMs}
+    GET  /health          {status, model_loaded, activeVersion, tasks:{task: backend}, shard, threads}
     GET  /models          registry listing
+    GET  /drift           live input drift vs the training distribution, per task (see drift.py)
+    POST /calibration/outcomes  {outcomes:[{task, ref, label}]} → calibration overlay update (see calib.py)
     POST /reload          re-read the active pointer (after activateModel)
+    GET  /debug/profile   ?seconds=5&intervalMs=5&format=json|collapsed&idle=false — sample this
+                          worker's stacks (see profiler.py); ML_PROFILE=0 turns it off
 
 Auth: if ML_API_SECRET is set, requests must carry `X-ML-Secret: <secret>`
 (health is open so load balancers can probe it).
 
+With ML_PREDICTION_LOG_DIR set, every scored row is also appended (asynchronously,
+never blocking the response) to gzip JSONL segments for harvesting — see predlog.py.
+
+Degraded path: each task head runs against a per-request deadline
+(ML_HEAD_DEADLINE_MS, default 1000; 0 = none). A head that errors or is still
+running when the deadline passes is answered from the task's vectorised rules
+baseline instead (`backend: "rules"`), so callers get the floor answer within a
+bound rather than a timeout; /health counts these fallbacks. A task served by a
+distilled student (distill.py) first retries a failing student on its GBDT
+teacher (`backend: "gbdt"`, counted as `teacher`) within the same deadline.
+
+Deadlines: `budgetMs` (the caller's remaining timeout) caps the head deadline
+too. Heads queue on an earliest-deadline-first pool (sched.py) that drops jobs
+whose deadline passed while queued; a request that arrives with no budget left
+gets an immediate 504 instead of doing stale work. /health reports requests
+with a budget, the ones shed and the ones answered after the caller's deadline.
+
+Explanations: `explain: k` adds each row's top-k signed feature attributions
+(explain.py) from the head that answered, computed on the head pool within
+ML_EXPLAIN_BUDGET_MS (default 50; also capped by the caller's budget). When that
+runs out the rows come back without them; /health counts both.
+
+Calibration: binary / multiclass outputs of the task's own head pass through the
+version's calibration overlay (calib.py) before confidence is computed; outcome
+labels posted for refs this worker scored recently update it without a reload.
+ML_CALIBRATION=0 serves raw head outputs.
+
+Sharding: with ML_TASKS set (comma list) the instance loads and serves only those
+heads and answers other tasks with 421, so hot tasks can run on their own instances
+behind the routing front in router.py; /health → shard names the instance
+(ML_SHARD) and its task list.
+
+Each worker sizes its torch / OpenMP / BLAS pools at startup (threads.py).
+
 Run:  uvicorn haemologix.api:app --host 0.0.0.0 --port 8000   (from ml/)
 """
 
 from __future__ import annotations
 
+import asyncio
 import os
 import time
 from pathlib import Path
 from typing import Any
 
 import numpy as np
-from fastapi import Depends, FastAPI, Header, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel, Field
 
-from .data import inverse_label
-from .registry import LoadedModel, get_active_version, list_versions, load_active, resolve_model_dir
+from .calib import CalibrationOverlay, RecentScores, collect
+from .data import FeatureColumns, inverse_label
+from .explain import row_attributions
+from .drift import DriftMonitor
+from .models import confidence
+from .predlog import PredictionLog, make_records
+from .profiler import ProfilerBusy, sample
+from .registry import LoadedModel, LoadedTask, get_active_version, list_versions, load_active, resolve_model_dir, serving_tasks
+from .sched import DeadlineExceeded, DeadlineExecutor
 from .tasks import TASKS, get_task
+from .threads import apply_thread_budget, head_workers, resolve_thread_budget
 
 try:  # optional: ml/.env
     from dotenv import load_dotenv
@@ -36,24 +84,52 @@ except Exception:  # pragma: no cover
 
 app = FastAPI(title="Haemologix ML API", version="2.0.0")
 
-_state: dict[str, Any] = {"model": None, "loaded_at": None, "error": None}
+_state: dict[str, Any] = {"model": None, "loaded_at": None, "error": None, "drift": None, "predlog": None, "threads": None,
+                          "calibration": None, "recent": None, "shard": None,
+                          "head_pool": None, "fallbacks": {"timeout": 0, "shed": 0, "error": 0, "teacher": 0},
+                          "deadline": {"requests": 0, "shed": 0, "missed": 0}, "explain": {"rows": 0, "skipped": 0}}
 
 
 def _load() -> None:
+    if _state["drift"] is not None:
+        _state["drift"].close()
+    if _state["calibration"] is not None:
+        _state["calibration"].close()
     try:
-        _state["model"] = load_active()
+        _state["shard"] = serving_tasks()
+        _state["model"] = load_active(tasks=_state["shard"])
         _state["loaded_at"] = time.time()
         _state["error"] = None if _state["model"] else "no active version"
     except Exception as e:  # pragma: no cover
         _state["model"] = None
         _state["error"] = repr(e)
+    _state["drift"] = DriftMonitor.from_env(_state["model"].version) if _state["model"] else None
+    _state["calibration"] = CalibrationOverlay.from_env(_state["model"].version_dir, poll=True) if _state["model"] else None
+    _state["recent"] = RecentScores.from_env() if _state["calibration"] else None
 
 
 @app.on_event("startup")
 async def _startup() -> None:
+    workers = head_workers(resolve_thread_budget("serve"))
+    _state["threads"] = apply_thread_budget("serve", workers=workers) | {"headWorkers": workers}
     _load()
+    if _state["predlog"] is None:
+        _state["predlog"] = PredictionLog.from_env()
     m: LoadedModel | None = _state["model"]
-    print(f"[ml-api] model_dir={resolve_model_dir()} active={get_active_version()} loaded={m.version if m else None} tasks={sorted(m.tasks) if m else []}")
+    print(f"[ml-api] model_dir={resolve_model_dir()} active={get_active_version()} loaded={m.version if m else None} tasks={sorted(m.tasks) if m else []} threads={_state['threads']}")
+
+
+@app.on_event("shutdown")
+async def _shutdown() -> None:
+    log: PredictionLog | None = _state["predlog"]
+    if log is not None:
+        log.close()
+    if _state["drift"] is not None:
+        _state["drift"].close()
+    if _state["calibration"] is not None:
+        _state["calibration"].close()
+    if _state["head_pool"] is not None:
+        _state["head_pool"].shutdown()
 
 
 def require_secret(x_ml_secret: str | None = Header(default=None)) -> None:
@@ -68,13 +144,17 @@ def require_secret(x_ml_secret: str | None = Header(default=None)) -> None:
 
 class PredictRequest(BaseModel):
     task: str
-    features: dict[str, Any]
+    features: dict[str, Any] = Field(default_factory=dict)
     ref: str | None = None
+    entity: str | None = None  # key into PredictBatchRequest.entities; `features` then only adds/overrides
 
 
 class PredictBatchRequest(BaseModel):
     modelVersion: str | None = None
     requests: list[PredictRequest] = Field(default_factory=list)
+    budgetMs: int | None = None  # caller's remaining time for this attempt, counted from receipt
+    entities: dict[str, dict[str, Any]] = Field(default_factory=dict)  # shared feature dicts by entity ref
+    explain: int = Field(default=0, ge=0, le=32)  # top-k per-row attributions (0 = off)
 
 
 class PredictResult(BaseModel):
@@ -83,6 +163,7 @@ class PredictResult(BaseModel):
     prediction: float | list[float]
     confidence: float
     featureImportance: dict[str, float] | None = None
+    attributions: dict[str, float] | None = None
     backend: str | None = None
 
 
@@ -92,6 +173,16 @@ class PredictBatchResponse(BaseModel):
     latencyMs: int
 
 
+class Outcome(BaseModel):
+    task: str
+    ref: str
+    label: float
+
+
+class OutcomesRequest(BaseModel):
+    outcomes: list[Outcome] = Field(default_factory=list)
+
+
 # ---------------------------------------------------------------------------
 # Routes
 # ---------------------------------------------------------------------------
@@ -104,7 +195,14 @@ async def health() -> dict[str, Any]:
         "model_loaded": m is not None,
         "activeVersion": m.version if m else get_active_version(),
         "tasks": {t: lt.backend for t, lt in m.tasks.items()} if m else {},
+        "shard": {"name": os.environ.get("ML_SHARD") or None, "tasks": _state["shard"]},
         "error": _state["error"],
+        "predictionLog": _state["predlog"].stats() if _state["predlog"] else None,
+        "threads": _state["threads"],
+        "fallbacks": _state["fallbacks"],
+        "deadline": _state["deadline"] | {"pool": _state["head_pool"].stats() if _state["head_pool"] else None},
+        "explain": _state["explain"],
+        "calibration": _state["calibration"].summary() if _state["calibration"] else None,
     }
 
 
@@ -113,20 +211,140 @@ async def models() -> dict[str, Any]:
     return {"active": get_active_version(), "versions": list_versions()}
 
 
+@app.get("/drift", dependencies=[Depends(require_secret)])
+async def drift() -> dict[str, Any]:
+    d: DriftMonitor | None = _state["drift"]
+    if d is None:
+        raise HTTPException(status_code=404, detail="drift monitoring is off or no model is loaded")
+    return d.summary()
+
+
+@app.post("/calibration/outcomes", dependencies=[Depends(require_secret)])
+async def calibration_outcomes(body: OutcomesRequest) -> dict[str, Any]:
+    ov: CalibrationOverlay | None = _state["calibration"]
+    recent: RecentScores | None = _state["recent"]
+    if ov is None or recent is None:
+        raise HTTPException(status_code=404, detail="calibration is off or no model is loaded")
+    for o in body.outcomes:
+        if o.task not in TASKS:
+            raise HTTPException(status_code=400, detail=f"unknown task {o.task}")
+    per_task, skipped = collect((o.task, recent.get(o.task, o.ref), o.label) for o in body.outcomes)
+    try:
+        await asyncio.to_thread(ov.record, per_task)
+    except OSError as e:  # read-only image: the checkpoint dir cannot take revisions
+        raise HTTPException(status_code=503, detail=f"calibration revisions cannot be written under {ov.version_dir.name}: {e.strerror or e}")
+    return {"used": {t: len(y) for t, (_, y) in per_task.items()}, "skipped": skipped} | ov.summary()
+
+
+@app.get("/debug/profile", dependencies=[Depends(require_secret)])
+async def debug_profile(seconds: float = Query(5.0, gt=0, le=60), intervalMs: float = Query(5.0, ge=1, le=1000),
+                        format: str = Query("json", pattern="^(json|collapsed)$"), idle: bool = False) -> Any:
+    if os.environ.get("ML_PROFILE", "1").strip() == "0":
+        raise HTTPException(status_code=404, detail="profiling is off (ML_PROFILE=0)")
+    try:  # the sampler runs off the event loop, which keeps serving (and is sampled) meanwhile
+        prof = await asyncio.to_thread(sample, seconds, intervalMs / 1000, idle)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if format == "collapsed":
+        return PlainTextResponse(prof["collapsed"])
+    return prof
+
+
 @app.post("/reload", dependencies=[Depends(require_secret)])
 async def reload() -> dict[str, Any]:
     _load()
     return await health()
 
 
-def _confidence(spec_kind: str, pred: np.ndarray, task_metrics: dict[str, Any]) -> np.ndarray:
-    if spec_kind == "binary":
-        return np.clip(np.abs(pred - 0.5) * 2, 0, 1)
-    if spec_kind == "multiclass":
-        return np.clip(pred.max(axis=1), 0, 1)
-    # regression: shrink with the model's own p90 error relative to its prediction
-    p90 = float(task_metrics.get("metrics", {}).get("p90_abs_err", 0) or 0)
-    return np.clip(1 - p90 / np.clip(np.abs(pred) + 1e-6, 1, None), 0.05, 0.99)
+def _head_pool() -> DeadlineExecutor:
+    if _state["head_pool"] is None:
+        workers = (_state["threads"] or {}).get("headWorkers") or head_workers(resolve_thread_budget("serve"))
+        _state["head_pool"] = DeadlineExecutor(workers)
+    return _state["head_pool"]
+
+
+def _run_head(lt: LoadedTask, X: np.ndarray) -> tuple[np.ndarray, str, dict[str, Any]]:
+    """The served head's answer; a distilled student that raises is answered by its teacher."""
+    try:
+        return lt.predictor.predict(X), lt.backend, lt.metrics
+    except Exception as e:
+        if lt.teacher is None or lt.teacher_backend is None or lt.teacher_metrics is None:
+            raise
+        print(f"[ml-api] {lt.spec.name}: student failed, answering from its {lt.teacher_backend} teacher: {e!r}")
+        _state["fallbacks"]["teacher"] += 1
+        return lt.teacher.predict(X), lt.teacher_backend, lt.teacher_metrics
+
+
+async def _predict_head(lt: LoadedTask, X: np.ndarray, deadline: float | None,
+                        caller_deadline: float | None) -> tuple[np.ndarray, str, dict[str, Any]]:
+    """(raw prediction, backend, metrics for confidence) from the learned head, or from the rules
+    baseline when the head raises, is shed from the queue, or `deadline` (perf_counter seconds)
+    passes first. Without a baseline only the caller's deadline applies, and missing it is a 504."""
+    if lt.rules is None:
+        deadline = caller_deadline
+    try:
+        if deadline is None:
+            return _run_head(lt, X)
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:  # earlier work in the batch spent the budget
+            raise asyncio.TimeoutError
+        fut = asyncio.wrap_future(_head_pool().submit(deadline, _run_head, lt, X))
+        return await asyncio.wait_for(fut, remaining)
+    except asyncio.TimeoutError:
+        reason = "timeout"  # the head finishes in its pool thread; its answer is discarded
+    except DeadlineExceeded:
+        reason = "shed"
+    except Exception as e:
+        if lt.rules is None:
+            raise
+        reason = "error"
+        print(f"[ml-api] {lt.spec.name}: {lt.backend} head failed, answering from rules: {e!r}")
+    if lt.rules is None:
+        _state["deadline"]["missed"] += 1
+        raise HTTPException(status_code=504, detail=f"{lt.spec.name}: deadline passed and no rules baseline to answer from")
+    _state["fallbacks"][reason] += 1
+    return lt.rules.predict(X), "rules", {"metrics": lt.metrics.get("baseline_metrics", {})}
+
+
+async def _explain_head(lt: LoadedTask, X: np.ndarray, k: int, caller_deadline: float | None) -> list[dict[str, float]] | None:
+    """Top-k attributions per row from the learned head, or None when they miss their budget or fail."""
+    deadline = time.perf_counter() + float(os.environ.get("ML_EXPLAIN_BUDGET_MS", "50")) / 1000
+    if caller_deadline is not None:
+        deadline = min(deadline, caller_deadline - float(os.environ.get("ML_DEADLINE_RESERVE_MS", "10")) / 1000)
+    try:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            raise asyncio.TimeoutError
+        fut = _head_pool().submit(deadline, row_attributions, lt.predictor, X, lt.pre.feature_names, k)
+        out = await asyncio.wait_for(asyncio.wrap_future(fut), remaining)
+    except (asyncio.TimeoutError, DeadlineExceeded):
+        out = None
+    except Exception as e:
+        print(f"[ml-api] {lt.spec.name}: attributions failed: {e!r}")
+        out = None
+    _state["explain"]["rows" if out is not None else "skipped"] += len(X)
+    return out
+
+
+def _feature_rows(body: PredictBatchRequest) -> tuple[list[dict[str, Any]], np.ndarray]:
+    """Distinct feature dicts of a batch + the row each request reads. Requests naming the same
+    `entity` without extra features share one row, so its columns are parsed once for all tasks."""
+    dicts: list[dict[str, Any]] = []
+    shared_row: dict[str, int] = {}
+    rows = np.empty(len(body.requests), dtype=np.int64)
+    for i, r in enumerate(body.requests):
+        if r.entity is not None and r.entity not in body.entities:
+            raise HTTPException(status_code=400, detail=f"unknown entity {r.entity}")
+        if r.entity is not None and not r.features:
+            if r.entity not in shared_row:
+                shared_row[r.entity] = len(dicts)
+                dicts.append(body.entities[r.entity])
+            rows[i] = shared_row[r.entity]
+            continue
+        rows[i] = len(dicts)
+        # task-specific extras sit on top of the entity's features
+        dicts.append({**body.entities[r.entity], **r.features} if r.entity is not None else r.features)
+    return dicts, rows
 
 
 @app.post("/predict/batch", response_model=PredictBatchResponse, dependencies=[Depends(require_secret)])
@@ -138,24 +356,55 @@ async def predict_batch(body: PredictBatchRequest) -> PredictBatchResponse:
     if body.modelVersion and body.modelVersion != m.version:
         raise HTTPException(status_code=409, detail=f"active version is {m.version}, not {body.modelVersion}")
 
+    # two clocks: the caller's budget (after it the answer is useless) and the head deadline
+    # (after it the rules baseline answers); heads must finish a reserve before the caller's
+    caller_deadline = None
+    if body.budgetMs is not None:
+        _state["deadline"]["requests"] += 1
+        if body.budgetMs <= 0:
+            _state["deadline"]["shed"] += 1
+            raise HTTPException(status_code=504, detail="deadline already passed")
+        caller_deadline = t0 + body.budgetMs / 1000
+    head_ms = float(os.environ.get("ML_HEAD_DEADLINE_MS", "1000"))
+    deadlines = [d for d in (t0 + head_ms / 1000 if head_ms > 0 else None,
+                             caller_deadline - float(os.environ.get("ML_DEADLINE_RESERVE_MS", "10")) / 1000 if caller_deadline else None)
+                 if d is not None]
+    deadline = min(deadlines) if deadlines else None
+
     # group by task so each preprocessor/predictor runs once per batch
     by_task: dict[str, list[int]] = {}
     for i, r in enumerate(body.requests):
         if r.task not in TASKS:
             raise HTTPException(status_code=400, detail=f"unknown task {r.task}")
         by_task.setdefault(r.task, []).append(i)
+    for task in by_task:
+        if _state["shard"] is not None and task not in _state["shard"]:
+            raise HTTPException(status_code=421, detail=f"task {task} is served by another shard")
+        if task not in m.tasks:
+            raise HTTPException(status_code=422, detail=f"active model {m.version} has no head for task {task}")
+    dicts, row_of = _feature_rows(body)
+    cols = FeatureColumns(dicts)
 
     results: list[PredictResult | None] = [None] * len(body.requests)
-    for task, idxs in by_task.items():
-        lt = m.tasks.get(task)
-        if lt is None:
-            raise HTTPException(status_code=422, detail=f"active model {m.version} has no head for task {task}")
+    raws: list[Any] = [None] * len(body.requests)  # pre-calibration outputs, logged where the overlay changed them
+    calibration: CalibrationOverlay | None = _state["calibration"]  # kept current by its poll thread
+
+    async def score(task: str, idxs: list[int]) -> None:
+        lt = m.tasks[task]
         spec = get_task(task)
-        X = lt.pre.transform_features([body.requests[i].features for i in idxs])
-        raw = lt.predictor.predict(X)
-        conf = _confidence(spec.kind, raw, lt.metrics)
+        X = lt.pre.transform_columns(cols, row_of[idxs])
+        if _state["drift"] is not None:
+            _state["drift"].update(task, lt.pre, X)
+        raw, backend, used_metrics = await _predict_head(lt, X, deadline, caller_deadline)
+        calibrated = calibration is not None and backend == lt.backend and spec.kind != "regression"
+        if calibrated:
+            _state["recent"].add(task, [body.requests[i].ref for i in idxs], raw)
+            head_raw, raw = raw, calibration.apply(task, raw)
+            calibrated = raw is not head_raw
+        conf = confidence(spec.kind, raw, used_metrics)
         nat = inverse_label(raw, spec) if spec.kind == "regression" else raw
-        importance = lt.predictor.feature_importance(lt.pre.feature_names)
+        importance = lt.predictor.feature_importance(lt.pre.feature_names) if backend == lt.backend else None
+        attributions = await _explain_head(lt, X, body.explain, caller_deadline) if body.explain and backend == lt.backend else None
         for j, i in enumerate(idxs):
             if spec.kind == "multiclass":
                 pred: float | list[float] = [float(v) for v in nat[j]]
@@ -163,10 +412,22 @@ async def predict_batch(body: PredictBatchRequest) -> PredictBatchResponse:
                 pred = float(nat[j])
             results[i] = PredictResult(
                 task=task, ref=body.requests[i].ref, prediction=pred, confidence=float(conf[j]),
-                featureImportance=importance if j == 0 else None, backend=lt.backend,
+                featureImportance=importance if j == 0 else None, backend=backend,
+                attributions=attributions[j] if attributions is not None else None,
             )
+            if calibrated:
+                raws[i] = head_raw[j].tolist()
+
+    # heads of different tasks run side by side on the pool
+    await asyncio.gather(*(score(task, idxs) for task, idxs in by_task.items()))
+    if caller_deadline is not None and time.perf_counter() > caller_deadline:
+        _state["deadline"]["missed"] += 1
+    latency_ms = int((time.perf_counter() - t0) * 1000)
+    log: PredictionLog | None = _state["predlog"]
+    if log is not None:
+        log.log(make_records(m.version, latency_ms, [(dicts[row_of[i]], res) for i, res in enumerate(results)], raws))
     return PredictBatchResponse(
         modelVersion=m.version,
         results=[r for r in results if r is not None],
-        latencyMs=int((time.perf_counter() - t0) * 1000),
+        latencyMs=latency_ms,
     )
@@ -0,0 +1,241 @@
+"""End-to-end training benchmarks with regression tracking (CPU, no network).
+
+    python -m haemologix.bench [--sizes 10000,100000,1000000] [--backends gbdt,mlp,linear]
+                               [--tasks donor_accept,donor_eta,urgency_priority]
+                               [--results bench/results.json] [--baseline bench/baseline.json]
+                               [--tolerance 0.25] [--save-baseline]
+
+Runs `train_task` for every (size, backend, task) on synthetic datasets from
+`haemologix.synth` (generated once per size and seed under `--data-root`, reused
+afterwards) and records, per case, wall time, the per-stage seconds `train_task`
+reports (`metrics.json → stages`), peak RSS and the achieved primary metric next
+to the rules baseline's. Each case runs in a fresh spawned process so peak RSS
+belongs to that case alone and thread pools start cold, the way a retrain does.
+
+Every run is appended to the results store. With a baseline file (written by
+`--save-baseline` from the same machine) each case is compared against it:
+
+    time      total or any stage slower than baseline × (1 + --tolerance), and by
+              more than --min-seconds (sub-second stages are noise)
+    memory    peak RSS above baseline × (1 + --mem-tolerance)
+    metric    primary metric worse than baseline by more than --metric-tolerance
+              (relative)
+
+and the command exits 1 when anything regressed. Timings only compare on the
+same hardware and thread budget; the baseline records both and a mismatch is
+reported next to the comparison.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+from .data import load_manifest
+from .registry import now_iso
+from .tasks import get_task
+from .threads import apply_thread_budget, cpu_count
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+DEFAULT_BACKENDS = ("gbdt", "mlp", "linear")
+#: one task per kind: binary, regression (log target), multiclass
+DEFAULT_TASKS = ("donor_accept", "donor_eta", "urgency_priority")
+
+
+def _peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1 << 20) if sys.platform == "darwin" else peak / 1024, 1)  # bytes on macOS, KiB elsewhere
+
+
+def _git_sha() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+                             cwd=Path(__file__).resolve().parent)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def host_info(threads: int | None = None) -> dict[str, Any]:
+    import numpy
+    import sklearn
+    import torch
+
+    return {"cpus": cpu_count(), "threads": threads or cpu_count(), "machine": platform.machine(),
+            "python": platform.python_version(), "numpy": numpy.__version__, "torch": torch.__version__,
+            "sklearn": sklearn.__version__}
+
+
+def ensure_dataset(data_root: Path, rows: int, tasks: list[str], seed: int = 0, jobs: int = 1) -> Path:
+    """`<data_root>/synth-s<seed>-n<rows>`, generated unless a complete one is already there."""
+    from .synth import generate_dataset
+
+    d = Path(data_root) / f"synth-s{seed}-n{rows}"
+    have = load_manifest(d).get("rows", {})
+    missing = [t for t in tasks if have.get(t) != rows]
+    if missing:
+        generate_dataset(d, {t: rows for t in set(have) | set(missing)}, sorted(set(have) | set(missing)), seed=seed, jobs=jobs)
+    return d
+
+
+def run_case(data_dir: Path, task: str, backend: str, epochs: int = 40, quick: bool = False, n_boot: int = 0,
+             seed: int = 7, threads: int | None = None, verbose: bool = False) -> dict[str, Any]:
+    """Train one head and measure it (call in a fresh process for a meaningful peak RSS)."""
+    from .train import train_task
+
+    apply_thread_budget("train", threads=threads)
+    spec = get_task(task)
+    rss0 = _peak_rss_mb()
+    with tempfile.TemporaryDirectory() as td, contextlib.redirect_stdout(sys.stdout if verbose else io.StringIO()):
+        t0 = time.perf_counter()
+        res = train_task(task, [data_dir], Path(td), backend=backend, epochs=epochs, seed=seed, quick=quick, n_boot=n_boot)
+        seconds = time.perf_counter() - t0
+    return {
+        "task": task,
+        "backend": backend,
+        "rows": res["rows"]["total"],
+        "seconds": round(seconds, 3),
+        "stages": res["stages"],
+        "peakRssMb": _peak_rss_mb(),
+        "importRssMb": rss0,
+        "dim": res["encoding"]["dim"],
+        "metric": spec.primary_metric,
+        "lowerIsBetter": spec.lower_is_better,
+        "value": res["metrics"].get(spec.primary_metric),
+        "rulesValue": res["baseline_metrics"].get(spec.primary_metric),
+    }
+
+
+def _run_isolated(**kw: Any) -> dict[str, Any]:
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(1) as pool:
+        return pool.apply(run_case, kwds=kw)
+
+
+def case_key(case: dict[str, Any]) -> str:
+    return f"{case['task']}/{case['backend']}/{case['rows']}"
+
+
+def compare(current: dict[str, Any], baseline: dict[str, Any], tolerance: float = 0.25, mem_tolerance: float = 0.2,
+            metric_tolerance: float = 0.02, min_seconds: float = 0.5) -> list[dict[str, Any]]:
+    """Regressions of `current` cases against `baseline` cases (both keyed by `case_key`)."""
+    out: list[dict[str, Any]] = []
+
+    def slower(key: str, check: str, cur: float | None, base: float | None) -> None:
+        if cur is not None and base is not None and cur > base * (1 + tolerance) and cur - base > min_seconds:
+            out.append({"case": key, "check": check, "baseline": base, "current": cur, "ratio": round(cur / max(base, 1e-9), 2)})
+
+    for key, cur in current.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        slower(key, "seconds", cur.get("seconds"), base.get("seconds"))
+        for stage, s in (cur.get("stages") or {}).items():
+            slower(key, f"stages.{stage}", s, (base.get("stages") or {}).get(stage))
+        rc, rb = cur.get("peakRssMb"), base.get("peakRssMb")
+        if rc is not None and rb is not None and rc > rb * (1 + mem_tolerance):
+            out.append({"case": key, "check": "peakRssMb", "baseline": rb, "current": rc, "ratio": round(rc / max(rb, 1e-9), 2)})
+        vc, vb = cur.get("value"), base.get("value")
+        if vc is not None and vb is not None:
+            worse = vc - vb if cur.get("lowerIsBetter") else vb - vc
+            if worse > metric_tolerance * max(abs(vb), 1e-9):
+                out.append({"case": key, "check": f"metric.{cur.get('metric')}", "baseline": vb, "current": vc,
+                            "ratio": round(vc / vb, 4) if vb else None})
+    return out
+
+
+def run_benchmarks(sizes: list[int], backends: list[str], tasks: list[str], data_root: Path, seed: int = 0,
+                   epochs: int = 40, quick: bool = False, threads: int | None = None, jobs: int = 1,
+                   isolate: bool = True, verbose: bool = False) -> dict[str, Any]:
+    """One run: {at, gitSha, host, config, cases: {task/backend/rows: case}}."""
+    for t in tasks:
+        get_task(t)
+    cases: dict[str, Any] = {}
+    for n in sizes:
+        d = ensure_dataset(data_root, n, tasks, seed=seed, jobs=jobs)
+        for backend in backends:
+            for task in tasks:
+                kw = {"data_dir": d, "task": task, "backend": backend, "epochs": epochs, "quick": quick,
+                      "threads": threads, "verbose": verbose}
+                case = _run_isolated(**kw) if isolate else run_case(**kw)
+                cases[case_key(case)] = case
+                print(f"[bench] {case_key(case):<40} {case['seconds']:>8.2f}s  rss={case['peakRssMb']}MB  "
+                      f"{case['metric']}={case['value']:.4f} (rules {case['rulesValue']:.4f})", flush=True)
+    return {
+        "at": now_iso(),
+        "gitSha": _git_sha(),
+        "host": host_info(threads),
+        "config": {"sizes": sizes, "backends": backends, "tasks": tasks, "seed": seed, "epochs": epochs, "quick": quick},
+        "cases": cases,
+    }
+
+
+def append_result(path: Path, run: dict[str, Any]) -> None:
+    path = Path(path)
+    store = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {"runs": []}
+    store["runs"].append(run)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(store, indent=2), encoding="utf-8")
+    tmp.replace(path)
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="comma list of rows per task")
+    ap.add_argument("--backends", default=",".join(DEFAULT_BACKENDS))
+    ap.add_argument("--tasks", default=",".join(DEFAULT_TASKS))
+    ap.add_argument("--data-root", default="data/bench", help="generated datasets are cached here")
+    ap.add_argument("--results", default="bench/results.json", help="results store (every run is appended)")
+    ap.add_argument("--baseline", default="bench/baseline.json")
+    ap.add_argument("--save-baseline", action="store_true", help="write this run as the new baseline")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown per case and stage")
+    ap.add_argument("--mem-tolerance", type=float, default=0.2, help="allowed relative peak-RSS growth")
+    ap.add_argument("--metric-tolerance", type=float, default=0.02, help="allowed relative primary-metric loss")
+    ap.add_argument("--min-seconds", type=float, default=0.5, help="ignore slowdowns smaller than this")
+    ap.add_argument("--seed", type=int, default=0, help="dataset seed")
+    ap.add_argument("--epochs", type=int, default=40)
+    ap.add_argument("--quick", action="store_true", help="train_task's smoke-test budgets")
+    ap.add_argument("--threads", type=int, default=None, help="torch/OpenMP/BLAS threads (default ML_THREADS or all cores)")
+    ap.add_argument("--jobs", type=int, default=1, help="parallel processes for dataset generation")
+    ap.add_argument("--in-process", action="store_true", help="no per-case subprocess (peak RSS becomes cumulative)")
+    ap.add_argument("--verbose", action="store_true", help="show train_task's log")
+    a = ap.parse_args(argv)
+    run = run_benchmarks([int(x) for x in a.sizes.split(",")], a.backends.split(","), a.tasks.split(","), Path(a.data_root),
+                         seed=a.seed, epochs=a.epochs, quick=a.quick, threads=a.threads, jobs=a.jobs,
+                         isolate=not a.in_process, verbose=a.verbose)
+    append_result(Path(a.results), run)
+    baseline_path = Path(a.baseline)
+    regressions: list[dict[str, Any]] = []
+    if baseline_path.exists() and not a.save_baseline:
+        base = json.loads(baseline_path.read_text(encoding="utf-8"))
+        if base.get("host", {}).get("cpus") != run["host"]["cpus"] or base.get("host", {}).get("threads") != run["host"]["threads"]:
+            print(f"[bench] baseline host {base.get('host')} differs from this one; timings are not comparable")
+        regressions = compare(run["cases"], base.get("cases", {}), a.tolerance, a.mem_tolerance, a.metric_tolerance, a.min_seconds)
+        compared = len(set(run["cases"]) & set(base.get("cases", {})))
+        print(f"[bench] vs baseline {base.get('gitSha')} ({base.get('at')}): {compared} cases compared, {len(regressions)} regressions")
+        for r in regressions:
+            print(f"[bench]   REGRESSION {r['case']} {r['check']}: {r['baseline']} → {r['current']} (×{r['ratio']})")
+    if a.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(run, indent=2), encoding="utf-8")
+        print(f"[bench] baseline written to {baseline_path}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
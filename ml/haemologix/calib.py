@@ -0,0 +1,406 @@
+"""Online calibration overlay fed by outcome feedback.
+
+Heads are calibrated once, at training time, on the validation split. Outcome
+labels that arrive later for scored refs update a per-task overlay on top of the
+served head's probabilities — no retrain, no weight reload:
+
+    POST /calibration/outcomes   {outcomes:[{task, ref, label}]}  (service, see api.py)
+    python -m haemologix.calib --outcomes labels.jsonl[.gz] --log $ML_PREDICTION_LOG_DIR [--version v]
+
+Per task the state is a fixed handful of floats however many outcomes arrive:
+
+  temperature  inverse temperature s on the head's log-odds (binary) / log-probs
+               (multiclass): p' = σ(s·z) / softmax(s·z). Each batch takes Newton
+               steps on its log-loss plus a quadratic anchor at the previous s
+               weighted by the curvature accumulated so far (online Laplace), so s
+               tracks the running fit of the whole stream
+  isotonic     binary only: `BINS` equal-width bins of the raw probability holding
+               outcome counts and positives; the map is the pool-adjacent-violators
+               fit over the bins, interpolated between bin centres
+
+All sums decay with a half-life of `HALF_LIFE` outcomes so the overlay follows
+drift. Each batch is scored by every method before it updates them (prequential
+log-loss); once `MIN_OUTCOMES` (decayed) have arrived the overlay serves the method
+with the lowest running loss, "raw" included — a head that is still well
+calibrated is left alone.
+
+Outcomes are joined to the head's raw, pre-overlay output for their (task, ref):
+the service looks them up among its recently scored refs (`ML_CALIBRATION_RECENT`,
+default 100000 per worker); the CLI reads the prediction log, whose records carry
+`raw` whenever the overlay changed the answer. Only rows answered by the version's
+own head count; unknown tasks, regression tasks, unknown refs and non-label values
+are skipped and counted.
+
+Revisions are saved as `<version>/calibration/overlay-<seq>.json` (the last `KEEP`
+are kept; deleting the newest rolls back). An update is a locked read-modify-write
+of the newest revision, so several workers and the CLI can feed one version; the
+service picks up other writers' revisions every `ML_REGISTRY_POLL_S` from a
+background thread, never on a request. On a read-only image nothing can be saved:
+the endpoint answers 503 and the CLI exits 1. `ML_CALIBRATION=0` serves raw head outputs and turns the endpoint off.
+"""
+
+from __future__ import annotations
+
+import argparse
+import fcntl
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Iterable
+
+import numpy as np
+
+from .predlog import iter_log
+from .registry import ModelCard, get_active_version, now_iso, resolve_model_dir, serving_student
+from .tasks import TASKS, get_task
+
+BINS = 20
+HALF_LIFE = 5000.0
+MIN_OUTCOMES = 200
+KEEP = 10
+PRIOR_CURVATURE = 50.0  # pseudo-outcomes anchoring s at 1 before any feedback
+S_RANGE = (0.05, 20.0)
+EPS = 1e-6
+METHODS = ("raw", "temperature", "isotonic")
+
+
+def _log_odds(p: np.ndarray) -> np.ndarray:
+    p = np.clip(p, EPS, 1 - EPS)
+    return np.log(p) - np.log1p(-p)
+
+
+def _scaled(kind: str, z: np.ndarray, s: float) -> np.ndarray:
+    """Probabilities of log-odds / log-probs `z` at inverse temperature `s`."""
+    if kind == "binary":
+        return 0.5 * (1.0 + np.tanh(0.5 * s * z))
+    e = np.exp(s * (z - z.max(axis=1, keepdims=True)))
+    return e / e.sum(axis=1, keepdims=True)
+
+
+def _nll(kind: str, p: np.ndarray, y: np.ndarray) -> np.ndarray:
+    if kind == "binary":
+        p = np.clip(p, EPS, 1 - EPS)
+        return -(y * np.log(p) + (1 - y) * np.log1p(-p))
+    return -np.log(np.clip(p[np.arange(len(y)), y], EPS, None))
+
+
+def pav(values: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Weighted non-decreasing least-squares fit (pool adjacent violators)."""
+    blocks: list[list[float]] = []  # [mean, weight, length]
+    for v, w in zip(values.tolist(), weights.tolist()):
+        blocks.append([v, w, 1])
+        while len(blocks) > 1 and blocks[-2][0] > blocks[-1][0]:
+            v2, w2, n2 = blocks.pop()
+            b = blocks[-1]
+            b[0] = (b[0] * b[1] + v2 * w2) / (b[1] + w2)
+            b[1] += w2
+            b[2] += n2
+    return np.concatenate([np.full(int(n), m) for m, _, n in blocks])
+
+
+class _TaskCalibration:
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.s = 1.0
+        self.curvature = PRIOR_CURVATURE
+        self.n = 0.0  # decayed outcome count
+        self.seen = 0
+        self.loss = {m: 0.0 for m in self.methods()}
+        self.bin_n = np.zeros(BINS)
+        self.bin_pos = np.zeros(BINS)
+        self.method = "raw"
+        self._iso: np.ndarray | None = None
+
+    def methods(self) -> tuple[str, ...]:
+        return METHODS if self.kind == "binary" else METHODS[:2]
+
+    def _isotonic(self) -> np.ndarray:
+        if self._iso is None:
+            centres = (np.arange(BINS) + 0.5) / BINS
+            # one pseudo-outcome per bin at its centre keeps empty bins at the identity
+            self._iso = pav((self.bin_pos + centres) / (self.bin_n + 1.0), self.bin_n + 1.0)
+        return self._iso
+
+    def calibrated(self, p: np.ndarray, method: str | None = None) -> np.ndarray:
+        method = method or self.method
+        if method == "temperature":
+            z = _log_odds(p) if self.kind == "binary" else np.log(np.clip(p, EPS, None))
+            return _scaled(self.kind, z, self.s).astype(p.dtype)
+        if method == "isotonic":
+            return np.interp(p, (np.arange(BINS) + 0.5) / BINS, self._isotonic()).astype(p.dtype)
+        return p
+
+    def update(self, p: np.ndarray, y: np.ndarray) -> None:
+        p = p.astype(np.float64)
+        decay = 0.5 ** (len(y) / HALF_LIFE)
+        for m in self.methods():  # prequential: score with the state before this batch
+            self.loss[m] = self.loss[m] * decay + float(_nll(self.kind, self.calibrated(p, m), y).sum())
+        self.n = self.n * decay + len(y)
+        self.seen += len(y)
+
+        z = _log_odds(p) if self.kind == "binary" else np.log(np.clip(p, EPS, None))
+        s0, anchor = self.s, max(self.curvature * decay, PRIOR_CURVATURE)
+        s, h = s0, 0.0
+        for _ in range(8):
+            q = _scaled(self.kind, z, s)
+            if self.kind == "binary":
+                g, h = float(((q - y) * z).sum()), float((q * (1 - q) * z * z).sum())
+            else:
+                zbar = (q * z).sum(axis=1)
+                g = float((zbar - z[np.arange(len(y)), y]).sum())
+                h = float(((q * z * z).sum(axis=1) - zbar**2).sum())
+            step = (anchor * (s - s0) + g) / (anchor + h + EPS)
+            s = float(np.clip(s - step, *S_RANGE))
+            if abs(step) < 1e-6:
+                break
+        self.s, self.curvature = s, anchor + h
+
+        if self.kind == "binary":
+            b = np.minimum((p * BINS).astype(np.int64), BINS - 1)
+            self.bin_n = self.bin_n * decay + np.bincount(b, minlength=BINS)
+            self.bin_pos = self.bin_pos * decay + np.bincount(b, weights=y, minlength=BINS)
+            self._iso = None
+        self.method = min(self.methods(), key=self.loss.__getitem__) if self.n >= MIN_OUTCOMES else "raw"
+
+    def to_dict(self) -> dict[str, Any]:
+        d: dict[str, Any] = {"kind": self.kind, "method": self.method, "s": self.s, "curvature": self.curvature,
+                             "n": self.n, "seen": self.seen, "loss": self.loss}
+        if self.kind == "binary":
+            d |= {"binN": self.bin_n.tolist(), "binPos": self.bin_pos.tolist()}
+        return d
+
+    @classmethod
+    def from_dict(cls, d: dict[str, Any]) -> "_TaskCalibration":
+        c = cls(d["kind"])
+        c.method, c.s, c.curvature, c.n, c.seen = d["method"], d["s"], d["curvature"], d["n"], d["seen"]
+        c.loss |= d.get("loss", {})
+        if c.kind == "binary":
+            c.bin_n, c.bin_pos = np.asarray(d["binN"], dtype=np.float64), np.asarray(d["binPos"], dtype=np.float64)
+        return c
+
+    def summary(self) -> dict[str, Any]:
+        mean = {m: round(v / self.n, 5) if self.n else None for m, v in self.loss.items()}
+        return {"method": self.method, "temperature": round(1.0 / self.s, 4), "outcomes": self.seen, "logLoss": mean}
+
+
+def _revisions(version_dir: Path) -> list[Path]:
+    return sorted((Path(version_dir) / "calibration").glob("overlay-*.json"))
+
+
+class CalibrationOverlay:
+    """The newest calibration revision of one version, applied to head outputs at serve time."""
+
+    def __init__(self, version_dir: Path, tasks: dict[str, _TaskCalibration] | None = None, seq: int = 0,
+                 updated_at: str | None = None):
+        self.version_dir = Path(version_dir)
+        self.tasks = tasks or {}
+        self.seq = seq
+        self.updated_at = updated_at
+        self._lock = threading.Lock()
+        self._checked = time.monotonic()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @classmethod
+    def load(cls, version_dir: Path) -> "CalibrationOverlay":
+        revs = _revisions(version_dir)
+        if not revs:
+            return cls(version_dir)
+        d = json.loads(revs[-1].read_text(encoding="utf-8"))
+        return cls(version_dir, {t: _TaskCalibration.from_dict(v) for t, v in d["tasks"].items()}, d["seq"], d.get("updatedAt"))
+
+    @classmethod
+    def from_env(cls, version_dir: Path, poll: bool = False) -> "CalibrationOverlay | None":
+        """The version's overlay unless ML_CALIBRATION=0; `poll` starts a daemon thread that adopts
+        other writers' revisions every ML_REGISTRY_POLL_S (the service), off the request path."""
+        if os.environ.get("ML_CALIBRATION", "1").strip() == "0":
+            return None
+        ov = cls.load(version_dir)
+        if poll:
+            ov._thread = threading.Thread(target=ov._poll, name="calibration-poll", daemon=True)
+            ov._thread.start()
+        return ov
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+
+    def _poll(self) -> None:
+        while not self._stop.wait(max(float(os.environ.get("ML_REGISTRY_POLL_S", "2")), 0.1)):
+            try:
+                self.refresh(force=True)
+            except (OSError, ValueError, KeyError) as e:  # a half-deleted or foreign file: keep serving the current one
+                print(f"[calib] {self.version_dir.name}: revision poll failed: {e!r}")
+
+    def apply(self, task: str, p: np.ndarray) -> np.ndarray:
+        """Calibrated copy of raw head output `p` (unchanged for tasks without feedback)."""
+        tc = self.tasks.get(task)
+        return p if tc is None else tc.calibrated(p)
+
+    def refresh(self, force: bool = False) -> None:
+        """Adopt a newer revision written by another worker or the CLI (at most every ML_REGISTRY_POLL_S)."""
+        if not force and time.monotonic() - self._checked < float(os.environ.get("ML_REGISTRY_POLL_S", "2")):
+            return
+        self._checked = time.monotonic()
+        revs = _revisions(self.version_dir)
+        if revs and revs[-1].name != f"overlay-{self.seq:06d}.json":
+            self._adopt(CalibrationOverlay.load(self.version_dir))
+
+    def _adopt(self, other: "CalibrationOverlay") -> None:
+        with self._lock:
+            self.tasks, self.seq, self.updated_at = other.tasks, other.seq, other.updated_at
+
+    def record(self, outcomes: dict[str, tuple[np.ndarray, np.ndarray]]) -> None:
+        """Update from {task: (raw outputs, labels)} and save the next revision; OSError when the
+        version dir is not writable (a read-only image)."""
+        self._adopt(record_outcomes(self.version_dir, outcomes))
+
+    def summary(self) -> dict[str, Any]:
+        return {"seq": self.seq, "updatedAt": self.updated_at, "tasks": {t: tc.summary() for t, tc in self.tasks.items()}}
+
+
+def record_outcomes(version_dir: Path, outcomes: dict[str, tuple[np.ndarray, np.ndarray]]) -> CalibrationOverlay:
+    """Locked read-modify-write: newest revision + `outcomes` → revision seq+1 (returned)."""
+    d = Path(version_dir) / "calibration"
+    d.mkdir(parents=True, exist_ok=True)
+    with (d / ".lock").open("a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        ov = CalibrationOverlay.load(version_dir)
+        for task, (p, y) in outcomes.items():
+            if len(y):
+                ov.tasks.setdefault(task, _TaskCalibration(get_task(task).kind)).update(p, y)
+        ov.seq += 1
+        ov.updated_at = now_iso()
+        doc = {"seq": ov.seq, "updatedAt": ov.updated_at, "tasks": {t: tc.to_dict() for t, tc in ov.tasks.items()}}
+        tmp = d / f"overlay-{ov.seq:06d}.json.tmp"
+        tmp.write_text(json.dumps(doc), encoding="utf-8")
+        tmp.replace(d / f"overlay-{ov.seq:06d}.json")
+        for old in _revisions(version_dir)[:-KEEP]:
+            old.unlink(missing_ok=True)
+    return ov
+
+
+class RecentScores:
+    """Bounded (task, ref) → raw head output of this worker's latest predictions, for joining outcomes."""
+
+    def __init__(self, max_refs: int = 100_000):
+        self.max_refs = max_refs
+        self._d: OrderedDict[tuple[str, str], Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "RecentScores":
+        return cls(int(os.environ.get("ML_CALIBRATION_RECENT", "100000")))
+
+    def add(self, task: str, refs: list[str | None], raw: np.ndarray) -> None:
+        with self._lock:
+            for ref, v in zip(refs, raw.tolist()):
+                if ref is not None:
+                    self._d[(task, ref)] = v
+                    self._d.move_to_end((task, ref))
+            while len(self._d) > self.max_refs:
+                self._d.popitem(last=False)
+
+    def get(self, task: str, ref: str) -> Any:
+        with self._lock:
+            return self._d.get((task, ref))
+
+    def __len__(self) -> int:
+        return len(self._d)
+
+
+def collect(pairs: Iterable[tuple[str, Any, Any]]) -> tuple[dict[str, tuple[np.ndarray, np.ndarray]], dict[str, int]]:
+    """(task, raw output or None, label) triples → per-task arrays for `record_outcomes`, plus skip counts."""
+    raw: dict[str, list[Any]] = {}
+    labels: dict[str, list[Any]] = {}
+    skipped = {"unknown_task": 0, "regression": 0, "unmatched": 0, "bad_label": 0}
+    for task, p, label in pairs:
+        spec = TASKS.get(task)
+        if spec is None:
+            skipped["unknown_task"] += 1
+            continue
+        if spec.kind == "regression":
+            skipped["regression"] += 1
+            continue
+        if p is None:
+            skipped["unmatched"] += 1
+            continue
+        try:
+            y = float(label)
+        except (TypeError, ValueError):
+            skipped["bad_label"] += 1
+            continue
+        if (spec.kind == "binary" and y not in (0.0, 1.0)) or (spec.kind == "multiclass" and not (y.is_integer() and 0 <= y < spec.num_classes)):
+            skipped["bad_label"] += 1
+            continue
+        raw.setdefault(task, []).append(p)
+        labels.setdefault(task, []).append(y)
+    out = {t: (np.asarray(raw[t], dtype=np.float64),
+               np.asarray(labels[t], dtype=np.int64 if get_task(t).kind == "multiclass" else np.float64)) for t in raw}
+    return out, skipped
+
+
+def _ref_key(ref: Any) -> str | None:
+    """Refs compare as strings on both sides of the join: a numeric ref in the outcomes file
+    matches the same ref in the prediction log whichever of the two wrote it as a string."""
+    return None if ref is None else str(ref)
+
+
+def _read_outcomes(path: Path) -> dict[tuple[str, str], Any]:
+    opener = gzip.open if path.suffix == ".gz" else open
+    out: dict[tuple[str, str], Any] = {}
+    with opener(path, "rt", encoding="utf-8") as fh:
+        for line in fh:
+            if line.strip():
+                r = json.loads(line)
+                ref = _ref_key(r.get("ref"))
+                if r.get("task") and ref is not None:
+                    out[(r["task"], ref)] = r.get("label")
+    return out
+
+
+def join_log(version: str, backends: dict[str, str], outcomes: dict[tuple[str, str], Any],
+             log_dir: Path) -> list[tuple[str, Any, Any]]:
+    """Match outcomes to the newest prediction-log record of the same version and served head."""
+    scored: dict[tuple[str, str], Any] = {}
+    for r in iter_log(log_dir):
+        key = (r.get("task"), _ref_key(r.get("ref")))
+        if r.get("version") == version and key in outcomes and r.get("backend") == backends.get(key[0]):
+            scored[key] = r.get("raw", r.get("prediction"))
+    return [(t, scored.get((t, ref)), label) for (t, ref), label in outcomes.items()]
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--outcomes", required=True, help="JSONL(.gz) of {task, ref, label}")
+    ap.add_argument("--log", required=True, help="prediction log directory (ML_PREDICTION_LOG_DIR)")
+    ap.add_argument("--version", default=None, help="registry version (default: active)")
+    ap.add_argument("--model-dir", default=None)
+    a = ap.parse_args(argv)
+    version = a.version or get_active_version(a.model_dir)
+    if not version:
+        print("[calib] no --version and no active version", file=sys.stderr)
+        return 2
+    version_dir = resolve_model_dir(a.model_dir) / version
+    card = ModelCard.load(version_dir)
+    backends = {t: r["distillation"]["student"] if serving_student(r) else r.get("backend") for t, r in card.get("tasks", {}).items()}
+    outcomes = _read_outcomes(Path(a.outcomes))
+    per_task, skipped = collect(join_log(version, backends, outcomes, Path(a.log)))
+    try:
+        ov = record_outcomes(version_dir, per_task)
+    except OSError as e:
+        print(f"[calib] cannot write {version_dir / 'calibration'}: {e}", file=sys.stderr)
+        return 1
+    print(json.dumps({"version": version, "outcomes": len(outcomes), "used": {t: len(y) for t, (_, y) in per_task.items()},
+                      "skipped": skipped} | ov.summary(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -14,8 +14,12 @@ feature is.
 
 from __future__ import annotations
 
+import hashlib
+import heapq
 import json
 import math
+import re
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any, Iterable, Iterator
@@ -39,8 +43,15 @@ def iter_jsonl(path: Path) -> Iterator[Row]:
                 yield json.loads(line)
 
 
-def load_task_rows(data_dirs: Iterable[Path], task: str, limit: int | None = None) -> list[Row]:
-    """Load rows for one task from one or more dataset directories (sim + real)."""
+def load_task_rows(data_dirs: Iterable[Path], task: str, limit: int | None = None, jobs: int | None = 1) -> list[Row]:
+    """Load rows for one task from one or more dataset directories (sim + real).
+
+    `jobs` other than 1 parses newline-aligned shards in that many processes (None = all cores;
+    see ingest.py); the rows and their order are the same."""
+    if jobs != 1 and not limit:
+        from .ingest import read_rows
+
+        return read_rows(data_dirs, task, jobs=jobs)
     rows: list[Row] = []
     for d in data_dirs:
         p = Path(d) / f"{task}.jsonl"
@@ -58,30 +69,325 @@ def load_manifest(data_dir: Path) -> dict[str, Any]:
     return json.loads(p.read_text(encoding="utf-8")) if p.exists() else {}
 
 
-def group_split(rows: list[Row], val_frac: float = 0.15, test_frac: float = 0.15, seed: int = 7):
-    """Split by groupId (scenario / request) so correlated rows never leak across splits."""
-    groups = sorted({r.get("groupId", str(i)) for i, r in enumerate(rows)})
+_GROUP_RE = re.compile(rb'"groupId"\s*:\s*"((?:[^"\\]|\\.)*)"')
+_SOURCE_RE = re.compile(rb'"source"\s*:\s*"((?:[^"\\]|\\.)*)"')
+_STRING_RE = re.compile(rb'"(?:[^"\\]|\\.)*"')
+_LABEL_RE = re.compile(rb'"label"\s*:\s*(-?[0-9][0-9.eE+-]*)')
+#: groups whose stratum is remembered after they leave (or never enter) a reservoir
+_RECENT_GROUPS = 1 << 16
+#: shards handed to the pool per round when sampling with jobs != 1 (bounds what is in flight)
+_SHARDS_PER_JOB = 2
+
+
+class _GroupReservoir:
+    """Bottom-k sample of whole groups under a row budget: the groups with the smallest keys
+    win. Holds (dir, offset, length) spans; `cut` only ever falls, so a group it rejects can
+    never come back."""
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.groups: dict[str, tuple[int, list[tuple[int, int, int]]]] = {}
+        self._heap: list[tuple[int, str]] = []  # (-key, gid): largest key on top
+        self.rows = 0
+        self.cut = 1 << 64
+
+    def offer(self, gid: str, key: int, span: tuple[int, int, int]) -> None:
+        held = self.groups.get(gid)
+        if held is None:
+            if key >= self.cut:
+                return
+            held = self.groups[gid] = (key, [])
+            heapq.heappush(self._heap, (-key, gid))
+        held[1].append(span)
+        self.rows += 1
+        while self.rows > self.budget and len(self.groups) > 1:
+            neg, victim = heapq.heappop(self._heap)
+            self.rows -= len(self.groups.pop(victim)[1])
+            self.cut = min(self.cut, -neg)
+
+    def smallest(self, budget: int) -> list[tuple[int, int, int]]:
+        """Rows of the smallest-key groups that fit in `budget` rows (at least one group if budget > 0)."""
+        out: list[tuple[int, int, int]] = []
+        for _, spans in sorted(self.groups.values(), key=lambda kv: kv[0]):
+            if len(out) + len(spans) > budget and (out or budget <= 0):
+                break
+            out += spans
+        return out
+
+
+def _top_level(pattern: re.Pattern[bytes], line: bytes) -> re.Match[bytes] | None:
+    """First match of a `"key": value` pattern whose key belongs to the outermost object (not
+    to `features` or `meta`). Quotes inside JSON strings are escaped, so a key pattern never
+    matches inside one; the depth is the brace balance of the prefix with strings removed."""
+    for m in pattern.finditer(line):
+        head = _STRING_RE.sub(b"", line[:m.start()])
+        if head.count(b"{") - head.count(b"}") == 1:
+            return m
+    return None
+
+
+def _row_fields(line: bytes, default_gid: str) -> tuple[str, str, float]:
+    """(groupId, source, label) of one JSONL row, without parsing it when the three are plain
+    top-level values. A missing or null label reads as 0.0."""
+    m_g, m_s, m_l = _top_level(_GROUP_RE, line), _top_level(_SOURCE_RE, line), _top_level(_LABEL_RE, line)
+    if m_g is not None and m_s is not None and m_l is not None and b"\\" not in m_g.group(1) + m_s.group(1):
+        return m_g.group(1).decode(), m_s.group(1).decode(), float(m_l.group(1))
+    # escapes, a null / missing field or an unusual layout: parse it
+    r = json.loads(line)
+    gid, label = r.get("groupId"), r.get("label")
+    return (str(gid) if gid is not None else default_gid, str(r.get("source") or ""),
+            float(label) if label is not None else 0.0)
+
+
+def _scan_lines(path: str, d_i: int, start: int, end: int) -> Iterator[tuple[str, str, float, int, int]]:
+    """(groupId, source, label, offset, length) of each row in bytes [start, end) of `path`."""
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        pos = start
+        while pos < end:
+            line = fh.readline()
+            if not line:
+                break
+            off, pos = pos, pos + len(line)
+            if not line.strip():
+                continue
+            yield (*_row_fields(line, f"#{d_i}:{off}"), off, len(line))
+
+
+def _scan_shard(path: str, d_i: int, start: int, end: int) -> list[tuple[str, str, float, int, int]]:
+    return list(_scan_lines(path, d_i, start, end))
+
+
+def _scanned(files: list[tuple[int, str]], jobs: int | None) -> Iterator[tuple[int, tuple[str, str, float, int, int]]]:
+    """(dir index, `_scan_lines` item) for every row of `files`, in file order. With `jobs` other
+    than 1 the files are cut into ingest.py's newline-aligned shards and scanned by a process pool
+    (None = all cores), a few shards per worker at a time."""
+    if jobs == 1:
+        for d_i, path in files:
+            for item in _scan_lines(path, d_i, 0, Path(path).stat().st_size):
+                yield d_i, item
+        return
+    import multiprocessing
+
+    from . import ingest
+    from .threads import cpu_count
+
+    shard_bytes = max(1, int(ingest.DEFAULT_SHARD_MB * (1 << 20)))
+    shards = [(path, d_i, a, b) for d_i, path in files for a, b in ingest.shard_ranges(Path(path), shard_bytes)]
+    jobs = max(1, min(len(shards), jobs or cpu_count()))
+    if jobs == 1:
+        yield from ((s[1], item) for s in shards for item in _scan_lines(*s))
+        return
+    with multiprocessing.get_context("spawn").Pool(jobs) as pool:
+        step = jobs * _SHARDS_PER_JOB
+        for i in range(0, len(shards), step):
+            batch = shards[i:i + step]
+            for s, part in zip(batch, pool.starmap(_scan_shard, batch, chunksize=1)):
+                yield from ((s[1], item) for item in part)
+
+
+def sample_task_rows(
+    data_dirs: Iterable[Path],
+    task: str,
+    max_rows: int,
+    seed: int = 7,
+    stratify: Iterable[str] = (),
+    discrete_labels: bool = True,
+    jobs: int | None = 1,
+) -> tuple[list[Row], dict[str, Any]]:
+    """Single-pass group sample of at most `max_rows` rows of one task; returns (rows, stats).
+
+    Each groupId gets a key hashed from (seed, groupId) and the groups with the smallest
+    keys are kept whole, so the sample does not depend on file order, repeats under the
+    same seed, and never splits a group (group_split stays leak-free). Only kept rows are
+    JSON-parsed; the rest are read for groupId / source / label and dropped. `stratify`
+    ⊆ {"source", "label"} keeps one reservoir per stratum (source, and the label when
+    `discrete_labels`) and splits `max_rows` across strata by their share of all rows, so
+    real rows and minority classes keep their share; memory is then bounded by
+    `max_rows` per stratum. A group's stratum is that of its first row — remembered while
+    the group is held and for the last `_RECENT_GROUPS` groups otherwise, so only a
+    dropped group whose rows lie that far apart can be split across strata (the
+    simulator and harvester write groups contiguously). Rows come back in file order.
+
+    `jobs` other than 1 reads groupId / source / label in that many processes (None = all
+    cores) over the same shards as ingest.py; the reservoirs stay in this process, so the
+    sample is the same for any `jobs`.
+    """
+    stratify = tuple(stratify)
+    reservoirs: dict[tuple[str, str], _GroupReservoir] = {}
+    seen: dict[tuple[str, str], int] = {}
+    recent: OrderedDict[str, tuple[str, str]] = OrderedDict()  # stratum of recently seen groups, held or not
+    salt = f"{seed}:".encode()
+    files = [(d_i, str(Path(d) / f"{task}.jsonl")) for d_i, d in enumerate(data_dirs)]
+    files = [(d_i, p) for d_i, p in files if Path(p).exists()]
+    for d_i, (gid, src, label, off, length) in _scanned(files, jobs):
+        stratum = (src if "source" in stratify else "",
+                   f"{label:g}" if "label" in stratify and discrete_labels else "")
+        stratum = recent.get(gid) or next((s for s, r in reservoirs.items() if gid in r.groups), stratum)
+        recent[gid] = stratum
+        recent.move_to_end(gid)
+        if len(recent) > _RECENT_GROUPS:
+            recent.popitem(last=False)
+        seen[stratum] = seen.get(stratum, 0) + 1
+        res = reservoirs.get(stratum)
+        if res is None:
+            res = reservoirs[stratum] = _GroupReservoir(max_rows)
+        key = int.from_bytes(hashlib.blake2b(salt + gid.encode(), digest_size=8).digest(), "little")
+        res.offer(gid, key, (d_i, off, length))
+    total = sum(seen.values())
+    # proportional allocation, largest remainder first
+    quota = {s: max_rows * c / max(total, 1) for s, c in seen.items()}
+    alloc = {s: int(q) for s, q in quota.items()}
+    for s in sorted(quota, key=lambda s: alloc[s] - quota[s])[:max(0, min(max_rows, total) - sum(alloc.values()))]:
+        alloc[s] += 1
+    picked = {s: res.smallest(alloc[s]) for s, res in reservoirs.items()}
+    rows: list[Row] = []
+    paths = dict(files)
+    handles: dict[int, Any] = {}
+    try:
+        for d_i, off, length in sorted(x for spans in picked.values() for x in spans):
+            fh = handles.get(d_i) or handles.setdefault(d_i, open(paths[d_i], "rb"))
+            fh.seek(off)
+            rows.append(json.loads(fh.read(length)))
+    finally:
+        for fh in handles.values():
+            fh.close()
+    stats = {"seen": total, "kept": len(rows),
+             "strata": {"/".join(x for x in s if x) or "all": {"seen": seen[s], "kept": len(picked[s])} for s in seen}}
+    return rows, stats
+
+
+def group_codes(rows: list[Row]) -> tuple[np.ndarray, int]:
+    """Factorise groupId into dense integer codes (rows without one are their own group)."""
+    if not rows:
+        return np.zeros(0, dtype=np.int64), 0
+    uniq, codes = np.unique(np.asarray([str(r.get("groupId", i)) for i, r in enumerate(rows)]), return_inverse=True)
+    return codes.astype(np.int64), len(uniq)
+
+
+def _group_strata(rows: list[Row], codes: np.ndarray, n_groups: int, stratify: Iterable[str]) -> np.ndarray:
+    """One stratum id per group. `source`: group holds any real row; `label`: group's majority/median label bin."""
+    keys = np.zeros(n_groups, dtype=np.int64)
+    stratify = tuple(stratify)
+    if "label" in stratify:
+        y = np.asarray([float(r.get("label", 0.0)) for r in rows], dtype=np.float64)
+        uniq = np.unique(y)
+        if len(uniq) <= 16:  # classification: group's most frequent label
+            k = np.searchsorted(uniq, y)
+            counts = np.zeros((n_groups, len(uniq)), dtype=np.int64)
+            np.add.at(counts, (codes, k), 1)
+            lab = counts.argmax(axis=1)
+        else:  # regression: quartile of the group's mean label
+            mean = np.bincount(codes, weights=y, minlength=n_groups) / np.maximum(np.bincount(codes, minlength=n_groups), 1)
+            lab = np.searchsorted(np.quantile(mean, [0.25, 0.5, 0.75]), mean, side="right")
+        keys = keys * 32 + lab
+    if "source" in stratify:
+        real = np.asarray([r.get("source") == "real" for r in rows], dtype=np.int64)
+        keys = keys * 2 + (np.bincount(codes, weights=real, minlength=n_groups) > 0)
+    return keys
+
+
+def group_split_indices(
+    rows: list[Row],
+    val_frac: float = 0.15,
+    test_frac: float = 0.15,
+    seed: int = 7,
+    stratify: Iterable[str] = (),
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Split by groupId into sorted (train, val, test) row-index arrays; no group spans two splits.
+
+    `stratify` ⊆ {"source", "label"} splits each stratum of groups separately so every
+    split keeps its share of real rows / label mix; a stratum of real groups always
+    contributes at least one group to test. Without stratification the split is
+    identical to the original row-list `group_split` for the same seed.
+    """
+    codes, n_groups = group_codes(rows)
     rng = np.random.default_rng(seed)
-    rng.shuffle(groups)
-    n = len(groups)
-    n_test = int(n * test_frac)
-    n_val = int(n * val_frac)
-    test_g = set(groups[:n_test])
-    val_g = set(groups[n_test:n_test + n_val])
-    train, val, test = [], [], []
-    for i, r in enumerate(rows):
-        g = r.get("groupId", str(i))
-        (test if g in test_g else val if g in val_g else train).append(r)
-    return train, val, test
+    assign = np.zeros(n_groups, dtype=np.int8)  # 0 train, 1 val, 2 test
+    strata = _group_strata(rows, codes, n_groups, stratify)
+    for s in np.unique(strata):
+        g = np.flatnonzero(strata == s)
+        g = g[rng.permutation(len(g))]
+        n_test = int(len(g) * test_frac)
+        if "source" in tuple(stratify) and s % 2 == 1 and test_frac > 0:
+            n_test = max(1, n_test)
+        n_val = int(len(g) * val_frac)
+        assign[g[:n_test]] = 2
+        assign[g[n_test:n_test + n_val]] = 1
+    split = assign[codes]
+    return np.flatnonzero(split == 0), np.flatnonzero(split == 1), np.flatnonzero(split == 2)
+
+
+def take(rows: list[Row], idx: np.ndarray) -> list[Row]:
+    return [rows[i] for i in idx]
+
+
+def group_split(rows: list[Row], val_frac: float = 0.15, test_frac: float = 0.15, seed: int = 7, stratify: Iterable[str] = ()):
+    """Split by groupId (scenario / request) so correlated rows never leak across splits."""
+    tr, va, te = group_split_indices(rows, val_frac, test_frac, seed, stratify)
+    return take(rows, tr), take(rows, va), take(rows, te)
 
 
 # ---------------------------------------------------------------------------
 # Preprocessing
 # ---------------------------------------------------------------------------
 
+#: standardised-value bin edges for the numeric reference histograms (drift PSI)
+REF_Z_EDGES = np.asarray([-3.0, -2.0, -1.0, -0.5, 0.0, 0.5, 1.0, 2.0, 3.0])
+
+
+def _as_number(v: Any) -> float:
+    if isinstance(v, (bool, int, float)):
+        return float(v)
+    return math.nan
+
+
+class FeatureColumns:
+    """Typed columns over a list of flat feature dicts, each parsed at most once per view.
+
+    The views follow `TabularPreprocessor.transform_one`: `numeric` (NaN where missing or
+    non-numeric, bools as 0/1), `flag` (True / 1 / "true") and `codes` (vocab index, -1
+    otherwise). `/predict/batch` builds one store per request over the distinct feature
+    dicts, so an entity scored by several tasks is walked once per column, not per task.
+    """
+
+    def __init__(self, dicts: list[dict[str, Any]]):
+        self.dicts = dicts
+        self._cols: dict[tuple[Any, ...], np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.dicts)
+
+    def numeric(self, c: str) -> np.ndarray:
+        col = self._cols.get((c, "num"))
+        if col is None:
+            col = self._cols[(c, "num")] = np.fromiter((_as_number(d.get(c)) for d in self.dicts), np.float64, len(self.dicts))
+        return col
+
+    def flag(self, c: str) -> np.ndarray:
+        col = self._cols.get((c, "flag"))
+        if col is None:
+            vals = (d.get(c) for d in self.dicts)
+            col = self._cols[(c, "flag")] = np.fromiter((v is True or v == 1 or v == "true" for v in vals), np.float32, len(self.dicts))
+        return col
+
+    def codes(self, c: str, vocab: list[str]) -> np.ndarray:
+        key = (c, "codes", tuple(vocab))
+        col = self._cols.get(key)
+        if col is None:
+            index = {v: j for j, v in enumerate(vocab)}
+            vals = (d.get(c) for d in self.dicts)
+            col = self._cols[key] = np.fromiter((index.get(v, -1) if isinstance(v, str) else -1 for v in vals), np.int64, len(self.dicts))
+        return col
+
+
 @dataclass
 class TabularPreprocessor:
-    """Flat feature dict → float32 vector. Persisted as JSON so serving == training."""
+    """Flat feature dict → float32 vector. Persisted as JSON so serving == training.
+
+    Layout: standardised numerics, bools, then per categorical either its one-hot block
+    (`encoding="onehot"`, unknown → all zeros) or a single column holding the vocab index
+    (`encoding="codes"`, unknown → NaN)."""
 
     task: str
     numeric_cols: list[str] = field(default_factory=list)
@@ -90,22 +396,30 @@ class TabularPreprocessor:
     cat_vocab: dict[str, list[str]] = field(default_factory=dict)  # col → categories (one-hot, unknown → all zeros)
     num_mean: dict[str, float] = field(default_factory=dict)
     num_std: dict[str, float] = field(default_factory=dict)
+    #: training reference for drift monitoring: share of observed values per REF_Z_EDGES bin, and
+    #: share of rows per vocab entry (+ a trailing "missing" share). Empty for older checkpoints.
+    num_ref_hist: dict[str, list[float]] = field(default_factory=dict)
+    cat_ref_freq: dict[str, list[float]] = field(default_factory=dict)
+    encoding: str = "onehot"
     fitted: bool = False
 
     # -- fitting ---------------------------------------------------------------
 
-    def fit(self, rows: list[Row]) -> "TabularPreprocessor":
+    def fit(self, rows: Iterable[Row]) -> "TabularPreprocessor":
         numeric: dict[str, list[float]] = {}
         bools: set[str] = set()
-        cats: dict[str, set[str]] = {}
+        cats: dict[str, dict[str, int]] = {}
+        n_rows = 0
         for r in rows:
+            n_rows += 1
             for k, v in r["features"].items():
                 if isinstance(v, bool):
                     bools.add(k)
                 elif isinstance(v, (int, float)) and not (isinstance(v, float) and math.isnan(v)):
                     numeric.setdefault(k, []).append(float(v))
                 elif isinstance(v, str):
-                    cats.setdefault(k, set()).add(v)
+                    counts = cats.setdefault(k, {})
+                    counts[v] = counts.get(v, 0) + 1
         # a column that appears both as bool and numeric is treated as numeric
         for b in list(bools):
             if b in numeric:
@@ -120,6 +434,11 @@ class TabularPreprocessor:
             std = float(arr.std())
             self.num_mean[c] = mean
             self.num_std[c] = std if std > 1e-9 else 1.0
+            z_bin = np.searchsorted(REF_Z_EDGES, (arr - mean) / self.num_std[c], side="right")
+            self.num_ref_hist[c] = (np.bincount(z_bin, minlength=len(REF_Z_EDGES) + 1) / len(arr)).tolist()
+        for c in self.cat_cols:
+            counts = [cats[c][v] for v in self.cat_vocab[c]]
+            self.cat_ref_freq[c] = [n / n_rows for n in counts] + [1 - sum(counts) / n_rows]
         self.fitted = True
         return self
 
@@ -129,13 +448,29 @@ class TabularPreprocessor:
     def feature_names(self) -> list[str]:
         names = list(self.numeric_cols) + [f"{b}" for b in self.bool_cols]
         for c in self.cat_cols:
-            names += [f"{c}={v}" for v in self.cat_vocab[c]]
+            names += [c] if self.encoding == "codes" else [f"{c}={v}" for v in self.cat_vocab[c]]
         return names
 
     @property
     def dim(self) -> int:
         return len(self.feature_names)
 
+    @property
+    def onehot_dim(self) -> int:
+        return len(self.numeric_cols) + len(self.bool_cols) + sum(len(v) for v in self.cat_vocab.values())
+
+    @property
+    def code_columns(self) -> list[int]:
+        """Matrix columns holding category codes (empty for one-hot)."""
+        if self.encoding != "codes":
+            return []
+        start = len(self.numeric_cols) + len(self.bool_cols)
+        return list(range(start, start + len(self.cat_cols)))
+
+    @property
+    def cardinalities(self) -> list[int]:
+        return [len(self.cat_vocab[c]) for c in self.cat_cols] if self.encoding == "codes" else []
+
     def transform_one(self, features: dict[str, Any]) -> np.ndarray:
         out = np.zeros(self.dim, dtype=np.float32)
         i = 0
@@ -154,20 +489,45 @@ class TabularPreprocessor:
         for c in self.cat_cols:
             vocab = self.cat_vocab[c]
             v = features.get(c)
-            if isinstance(v, str) and v in vocab:
+            known = isinstance(v, str) and v in vocab
+            if self.encoding == "codes":
+                out[i] = vocab.index(v) if known else np.nan
+                i += 1
+                continue
+            if known:
                 out[i + vocab.index(v)] = 1.0
             i += len(vocab)
         return out
 
+    def transform_columns(self, cols: FeatureColumns, rows: np.ndarray | None = None) -> np.ndarray:
+        """Vectorised `transform_one` over `cols` (or the `rows` subset of it, in that order)."""
+        pick = (lambda a: a) if rows is None else (lambda a: a[rows])
+        n = len(cols) if rows is None else len(rows)
+        out = np.zeros((n, self.dim), dtype=np.float32)
+        i = 0
+        for c in self.numeric_cols:
+            v = pick(cols.numeric(c))
+            out[:, i] = (np.where(np.isnan(v), self.num_mean[c], v) - self.num_mean[c]) / self.num_std[c]
+            i += 1
+        for b in self.bool_cols:
+            out[:, i] = pick(cols.flag(b))
+            i += 1
+        for c in self.cat_cols:
+            code = pick(cols.codes(c, self.cat_vocab[c]))
+            if self.encoding == "codes":
+                out[:, i] = np.where(code >= 0, code, np.nan)
+                i += 1
+                continue
+            hit = np.flatnonzero(code >= 0)
+            out[hit, i + code[hit]] = 1.0
+            i += len(self.cat_vocab[c])
+        return out
+
     def transform(self, rows: list[Row]) -> np.ndarray:
-        if not rows:
-            return np.zeros((0, self.dim), dtype=np.float32)
-        return np.stack([self.transform_one(r["features"]) for r in rows])
+        return self.transform_columns(FeatureColumns([r["features"] for r in rows]))
 
     def transform_features(self, features_list: list[dict[str, Any]]) -> np.ndarray:
-        if not features_list:
-            return np.zeros((0, self.dim), dtype=np.float32)
-        return np.stack([self.transform_one(f) for f in features_list])
+        return self.transform_columns(FeatureColumns(features_list))
 
     # -- persistence -----------------------------------------------------------
 
@@ -180,6 +540,9 @@ class TabularPreprocessor:
             "cat_vocab": self.cat_vocab,
             "num_mean": self.num_mean,
             "num_std": self.num_std,
+            "num_ref_hist": self.num_ref_hist,
+            "cat_ref_freq": self.cat_ref_freq,
+            "encoding": self.encoding,
         }
 
     def save(self, path: Path) -> None:
@@ -187,7 +550,10 @@ class TabularPreprocessor:
 
     @classmethod
     def load(cls, path: Path) -> "TabularPreprocessor":
-        d = json.loads(Path(path).read_text(encoding="utf-8"))
+        return cls.from_dict(json.loads(Path(path).read_text(encoding="utf-8")))
+
+    @classmethod
+    def from_dict(cls, d: dict[str, Any]) -> "TabularPreprocessor":
         p = cls(task=d["task"])
         p.numeric_cols = d["numeric_cols"]
         p.bool_cols = d["bool_cols"]
@@ -195,6 +561,9 @@ class TabularPreprocessor:
         p.cat_vocab = d["cat_vocab"]
         p.num_mean = d["num_mean"]
         p.num_std = d["num_std"]
+        p.num_ref_hist = d.get("num_ref_hist", {})
+        p.cat_ref_freq = d.get("cat_ref_freq", {})
+        p.encoding = d.get("encoding", "onehot")
         p.fitted = True
         return p
 
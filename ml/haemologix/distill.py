@@ -0,0 +1,131 @@
+"""Distillation of a GBDT winner into a cheaper student head.
+
+`train_task(..., distill="auto"|"mlp"|"linear")` runs when the GBDT wins a task:
+every serving call would otherwise pay sklearn's per-call `predict_proba` cost.
+A student is fitted to the teacher's *soft* outputs — P(1) for binary, the class
+distribution for multiclass, the model-space value for regression — over the
+training rows plus `augment` × as many synthetic ones, and early-stops / picks
+its L2 strength and calibrates against the teacher's outputs on the validation
+split:
+
+  mlp     `MlpPredictor` with one small hidden layer (`STUDENT_MLP`: no dropout,
+          smaller batches and a higher learning rate than a full MLP head — the
+          targets are smooth)
+  linear  `LinearPredictor` (logistic / softmax / ridge on the soft targets)
+  auto    both; the faster of those that pass the gate
+
+Synthetic rows are swap-and-jitter copies of training rows (MUNGE without the
+neighbour search): each takes every feature block — a numeric, a bool, one
+categorical's one-hot block or code — from a random partner row with probability
+`SWAP_P`, and numerics get N(0, `JITTER`) noise in standardised units. They fill
+the regions between observed rows where the teacher's decision surface is what
+the student has to copy.
+
+A student is kept only when its primary metric on the test split (against the
+true labels) is within `tolerance` (relative) of the teacher's. It is saved under
+`<task>/student/` next to the teacher, which stays the task's `backend.txt` head;
+`LoadedModel.load` serves the student unless `ML_DISTILLED=0`, and the service
+answers from the teacher when the student raises. metrics.json → `distillation`
+records both heads' test metrics, the metric delta and their latency on the test
+split and on a single row.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any, Callable
+
+import numpy as np
+
+from .data import TabularPreprocessor
+from .metrics import compute_metrics, is_better, primary
+from .models import LinearPredictor, MlpPredictor, Predictor
+from .tasks import TaskSpec
+
+STUDENTS = ("mlp", "linear")
+STUDENT_MLP: dict[str, Any] = {"hidden": (64,), "dropout": 0.0, "lr": 5e-3, "batch_size": 256}
+SWAP_P = 0.5
+JITTER = 0.1
+
+
+def feature_blocks(pre: TabularPreprocessor) -> list[tuple[int, int]]:
+    """(start, width) of every input feature's matrix columns, in layout order."""
+    blocks = [(j, 1) for j in range(len(pre.numeric_cols) + len(pre.bool_cols))]
+    j = len(blocks)
+    for c in pre.cat_cols:
+        width = 1 if pre.encoding == "codes" else len(pre.cat_vocab[c])
+        blocks.append((j, width))
+        j += width
+    return blocks
+
+
+def augment_rows(pre: TabularPreprocessor, X: np.ndarray, n: int, seed: int = 7) -> np.ndarray:
+    """`n` swap-and-jitter rows drawn from the transformed training matrix `X`."""
+    if n <= 0 or not len(X):
+        return np.zeros((0, X.shape[1]), dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    out = X[rng.integers(len(X), size=n)].copy()
+    partner = X[rng.integers(len(X), size=n)]
+    for start, width in feature_blocks(pre):
+        swap = rng.random(n) < SWAP_P
+        out[swap, start:start + width] = partner[swap, start:start + width]
+    k = len(pre.numeric_cols)
+    out[:, :k] += rng.normal(0.0, JITTER, size=(n, k)).astype(np.float32)
+    return out
+
+
+def _ms(fn: Callable[[], Any], reps: int) -> float:
+    """Median wall milliseconds of `fn` over `reps` calls (after one warm-up)."""
+    fn()
+    times = []
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times)) * 1e3
+
+
+def latency(predictor: Predictor, X: np.ndarray) -> dict[str, float]:
+    """Median ms of one `predict` over all of `X` and over a single row."""
+    return {"ms_batch": round(_ms(lambda: predictor.predict(X), 5), 3),
+            "ms_row": round(_ms(lambda: predictor.predict(X[:1]), 50), 4)}
+
+
+def distill_head(spec: TaskSpec, pre: TabularPreprocessor, teacher: Predictor, teacher_metrics: dict[str, Any],
+                 Xtr: np.ndarray, Xva: np.ndarray, Xte: np.ndarray, yte: np.ndarray, yte_nat: np.ndarray | None,
+                 students: tuple[str, ...] = STUDENTS, tolerance: float = 0.01, augment: float = 1.0, epochs: int = 40,
+                 seed: int = 7) -> tuple[Predictor | None, dict[str, Any]]:
+    """(student to serve or None, report). `teacher_metrics` are the teacher's test metrics."""
+    t0 = time.perf_counter()
+    Xaug = augment_rows(pre, Xtr, int(round(augment * len(Xtr))), seed=seed)
+    Xfit = np.concatenate([Xtr, Xaug]) if len(Xaug) else Xtr
+    soft, soft_va = teacher.predict(Xfit), teacher.predict(Xva)
+    cats = {"cat_cols": pre.code_columns, "cat_cards": pre.cardinalities}
+    pt = primary(spec, teacher_metrics)
+    report: dict[str, Any] = {
+        "teacher": teacher.backend, "tolerance": tolerance, "rows": {"train": len(Xtr), "augmented": len(Xaug)},
+        "primary_teacher": pt, "teacher_latency": latency(teacher, Xte), "candidates": {}, "student": None, "accepted": False,
+    }
+    best: tuple[Predictor, str] | None = None
+    for kind in students:
+        t_f = time.perf_counter()
+        s = MlpPredictor(spec, epochs=epochs, seed=seed, **STUDENT_MLP, **cats) if kind == "mlp" else LinearPredictor(spec, **cats)
+        s.fit(Xfit, soft, Xva, soft_va)
+        fit_s = time.perf_counter() - t_f
+        m = compute_metrics(spec, yte, s.predict(Xte), yte_nat)
+        ps = primary(spec, m)
+        # refused when the teacher beats the student by more than the tolerance, like quantization
+        ok = pt is not None and ps is not None and not is_better(spec, teacher_metrics, m, min_delta=tolerance * abs(pt))
+        lat = latency(s, Xte)
+        report["candidates"][kind] = {"accepted": bool(ok), "primary": ps, "delta": None if pt is None or ps is None else ps - pt,
+                                      "fit_s": round(fit_s, 2), "latency": lat, "metrics": m}
+        if ok and (best is None or lat["ms_row"] < report["candidates"][best[1]]["latency"]["ms_row"]):
+            best = (s, kind)
+    if best is not None:
+        c = report["candidates"][best[1]]
+        tl = report["teacher_latency"]
+        report |= {"student": best[1], "accepted": True, "primary_student": c["primary"], "delta": c["delta"], "metrics": c["metrics"],
+                   "student_latency": c["latency"], "speedup_row": round(tl["ms_row"] / max(c["latency"]["ms_row"], 1e-9), 1),
+                   "speedup_batch": round(tl["ms_batch"] / max(c["latency"]["ms_batch"], 1e-9), 1)}
+    report["seconds"] = round(time.perf_counter() - t0, 2)
+    return (best[0] if best is not None else None), report
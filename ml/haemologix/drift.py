@@ -0,0 +1,172 @@
+"""Streaming input-drift monitor for the model service.
+
+Each `/predict/batch` call hands the already-transformed matrix of every task to
+`DriftMonitor.update`; a handful of column reductions per batch keep running
+sums, so there is no per-row Python work on the request path. Against the
+training distribution stored in `preprocessor.json` it reports, per task:
+
+  numeric      z_shift (live mean in training-std units; the matrix is already
+               standardised), std_ratio, imputed_rate (value missing or
+               non-numeric → imputed at the training mean, i.e. z == 0) and PSI
+               over `REF_Z_EDGES` bins
+  categorical  unseen_rate (value missing or outside the vocab → all-zero
+               one-hot block, or a NaN code) and PSI over vocab shares + "missing"
+
+PSI needs the reference histograms written at fit time; checkpoints trained
+before them report `psi: null`. Summaries are served on `GET /drift` and written
+to `$ML_DRIFT_DIR/drift-<version>.json` every `ML_DRIFT_SNAPSHOT_S` seconds by a
+background thread (and once more on `close`), never on the request path, so the
+retrain pipeline can pick them up.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from .data import REF_Z_EDGES, TabularPreprocessor
+from .registry import now_iso
+
+#: conventional PSI reading: < 0.1 stable, 0.1–0.25 moderate, > 0.25 significant
+PSI_ALERT = 0.25
+Z_SHIFT_ALERT = 0.5
+
+
+def psi(expected: np.ndarray, actual: np.ndarray, floor: float = 1e-4) -> float:
+    e = np.clip(np.asarray(expected, dtype=np.float64), floor, None)
+    a = np.clip(np.asarray(actual, dtype=np.float64), floor, None)
+    return float(np.sum((a - e) * np.log(a / e)))
+
+
+class _TaskDrift:
+    def __init__(self, pre: TabularPreprocessor):
+        self.pre = pre
+        k = len(pre.numeric_cols)
+        self.n = 0
+        self.z_sum = np.zeros(k)
+        self.z_sq = np.zeros(k)
+        self.imputed = np.zeros(k, dtype=np.int64)
+        self.z_hist = np.zeros((k, len(REF_Z_EDGES) + 1), dtype=np.int64)
+        self.cat_counts = {c: np.zeros(len(pre.cat_vocab[c]) + 1, dtype=np.int64) for c in pre.cat_cols}
+
+    def update(self, X: np.ndarray) -> None:
+        k = len(self.pre.numeric_cols)
+        Z = X[:, :k].astype(np.float64)
+        self.n += len(X)
+        self.z_sum += Z.sum(axis=0)
+        self.z_sq += (Z * Z).sum(axis=0)
+        observed = Z != 0.0
+        self.imputed += (~observed).sum(axis=0)
+        if k:
+            bins = np.searchsorted(REF_Z_EDGES, Z, side="right")
+            flat = (bins + np.arange(k) * self.z_hist.shape[1])[observed]
+            self.z_hist += np.bincount(flat, minlength=self.z_hist.size).reshape(self.z_hist.shape)
+        i = k + len(self.pre.bool_cols)
+        for c in self.pre.cat_cols:
+            counts = self.cat_counts[c]
+            if self.pre.encoding == "codes":
+                code = X[:, i]
+                known = ~np.isnan(code)
+                counts[:-1] += np.bincount(code[known].astype(np.int64), minlength=len(counts) - 1)
+                counts[-1] += int((~known).sum())
+                i += 1
+                continue
+            block = X[:, i:i + len(self.pre.cat_vocab[c])]
+            counts[:-1] += block.sum(axis=0).astype(np.int64)
+            counts[-1] += int((block.sum(axis=1) == 0).sum())
+            i += block.shape[1]
+
+    def summary(self) -> dict[str, Any]:
+        out: dict[str, Any] = {"rows": self.n, "numeric": {}, "categorical": {}, "drifted": []}
+        if not self.n:
+            return out
+        mean = self.z_sum / self.n
+        var = np.clip(self.z_sq / self.n - mean**2, 0, None)
+        for j, c in enumerate(self.pre.numeric_cols):
+            ref = self.pre.num_ref_hist.get(c)
+            obs = self.z_hist[j].sum()
+            p = psi(ref, self.z_hist[j] / obs) if ref and obs else None
+            out["numeric"][c] = {"z_shift": float(mean[j]), "std_ratio": float(np.sqrt(var[j])),
+                                 "imputed_rate": float(self.imputed[j] / self.n), "psi": p}
+            if abs(mean[j]) > Z_SHIFT_ALERT or (p is not None and p > PSI_ALERT):
+                out["drifted"].append(c)
+        for c, counts in self.cat_counts.items():
+            ref = self.pre.cat_ref_freq.get(c)
+            p = psi(ref, counts / self.n) if ref else None
+            out["categorical"][c] = {"unseen_rate": float(counts[-1] / self.n), "psi": p}
+            if p is not None and p > PSI_ALERT:
+                out["drifted"].append(c)
+        return out
+
+
+class DriftMonitor:
+    """Per-task running statistics for one served version."""
+
+    def __init__(self, version: str, snapshot_dir: Path | None = None, snapshot_every_s: float = 300.0):
+        self.version = version
+        self.snapshot_dir = snapshot_dir
+        self.snapshot_every_s = snapshot_every_s
+        self.started_at = now_iso()
+        self._tasks: dict[str, _TaskDrift] = {}
+        self._lock = threading.Lock()
+        self._last_snapshot = time.monotonic()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        if snapshot_dir is not None:
+            self._thread = threading.Thread(target=self._run, name="drift-snapshot", daemon=True)
+            self._thread.start()
+
+    @classmethod
+    def from_env(cls, version: str) -> "DriftMonitor | None":
+        if os.environ.get("ML_DRIFT", "1").strip() == "0":
+            return None
+        d = os.environ.get("ML_DRIFT_DIR", "").strip()
+        return cls(version, Path(d) if d else None, float(os.environ.get("ML_DRIFT_SNAPSHOT_S", "300")))
+
+    def update(self, task: str, pre: TabularPreprocessor, X: np.ndarray) -> None:
+        if not len(X):
+            return
+        with self._lock:
+            td = self._tasks.get(task)
+            if td is None:
+                td = self._tasks[task] = _TaskDrift(pre)
+            td.update(X)
+
+    def summary(self) -> dict[str, Any]:
+        with self._lock:
+            tasks = {t: td.summary() for t, td in self._tasks.items()}
+        return {"version": self.version, "since": self.started_at, "at": now_iso(), "tasks": tasks}
+
+    def close(self) -> Path | None:
+        """Stop the snapshot thread and write a final snapshot."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+        return self.maybe_snapshot(force=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(max(self.snapshot_every_s, 1.0)):
+            self.maybe_snapshot()
+
+    def maybe_snapshot(self, force: bool = False) -> Path | None:
+        if self.snapshot_dir is None:
+            return None
+        now = time.monotonic()
+        if not force and now - self._last_snapshot < self.snapshot_every_s:
+            return None
+        self._last_snapshot = now
+        try:
+            self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+            p = self.snapshot_dir / f"drift-{self.version}.json"
+            tmp = p.with_suffix(".json.tmp")
+            tmp.write_text(json.dumps(self.summary(), indent=2), encoding="utf-8")
+            tmp.replace(p)
+            return p
+        except OSError:  # read-only image / full disk must never fail a prediction
+            return None
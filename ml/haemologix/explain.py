@@ -0,0 +1,107 @@
+"""Per-row feature attributions for agent explanations.
+
+    python -m haemologix.explain [--version v] [--batch 1,16,64,256,1024] [--top 5] [--seconds 0.3]
+
+`/predict/batch` with `explain: k` (and `python -m haemologix.score --explain k`)
+returns, per row, the k matrix columns that moved that row's raw output most,
+signed, from `Predictor.attributions`:
+
+  mlp     gradient × input at the first layer, one backward pass per batch
+          (numeric columns against their training mean, one-hot / bool against
+          absent, embeddings against the zero vector)
+  gbdt    path contributions over every tree, all trees walked together; they sum
+          exactly to the row's raw output minus the ensemble's expected output
+  linear  weight × value per column, exactly the row's raw output minus the intercept
+
+Values are in the head's raw output space: log-odds for binary (divided by the
+MLP's calibration temperature), the predicted class's logit for multiclass,
+model space for regression (log1p minutes for log targets). The service computes them
+on the head pool within `ML_EXPLAIN_BUDGET_MS` (default 50) of the prediction and
+leaves them out when that runs out; this module's CLI times that overhead per
+backend and batch size for a checkpoint.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from typing import Any
+
+import numpy as np
+
+from .models import Predictor
+from .registry import LoadedModel, get_active_version, resolve_model_dir
+
+
+def top_attributions(contrib: np.ndarray, names: list[str], k: int) -> list[dict[str, float]]:
+    """Per row, the `k` largest |contributions| as {feature: signed value}, largest first."""
+    if k <= 0 or not len(contrib):
+        return [{} for _ in range(len(contrib))]
+    k = min(k, contrib.shape[1])
+    mag = np.abs(contrib)
+    top = np.argpartition(-mag, k - 1, axis=1)[:, :k]
+    top = np.take_along_axis(top, np.argsort(-np.take_along_axis(mag, top, axis=1), axis=1, kind="stable"), axis=1)
+    vals = np.take_along_axis(contrib, top, axis=1).tolist()
+    return [{names[j]: round(v, 5) for j, v in zip(cols, row) if v != 0.0} for cols, row in zip(top.tolist(), vals)]
+
+
+def row_attributions(predictor: Predictor, X: np.ndarray, names: list[str], k: int) -> list[dict[str, float]] | None:
+    """`top_attributions` of `predictor` over `X`; None for heads without attributions (rules)."""
+    contrib = predictor.attributions(X)
+    return None if contrib is None else top_attributions(contrib, names, k)
+
+
+def _time(fn: Any, seconds: float) -> float:
+    fn()  # warm-up (builds cached tree tables / float twins)
+    n, t0 = 0, time.perf_counter()
+    while True:
+        fn()
+        n += 1
+        if time.perf_counter() - t0 >= seconds:
+            return (time.perf_counter() - t0) / n * 1e3
+
+
+def benchmark(model: LoadedModel, batch_sizes: list[int], top: int = 5, seconds: float = 0.3) -> dict[str, Any]:
+    """Per task and batch size: mean ms of `predict` and of attributions + top-k (the extra work of `explain`)."""
+    rng = np.random.default_rng(0)
+    out: dict[str, Any] = {}
+    for task, lt in model.tasks.items():
+        rows = []
+        for b in batch_sizes:
+            X = rng.normal(size=(b, lt.pre.dim)).astype(np.float32)
+            for j in lt.pre.code_columns:
+                X[:, j] = rng.integers(0, max(1, lt.pre.cardinalities[lt.pre.code_columns.index(j)]), b)
+            predict_ms = _time(lambda: lt.predictor.predict(X), seconds)
+            explain_ms = _time(lambda: row_attributions(lt.predictor, X, lt.pre.feature_names, top), seconds)
+            rows.append({"batch": b, "predictMs": round(predict_ms, 3), "explainMs": round(explain_ms, 3),
+                         "overhead": round(explain_ms / max(predict_ms, 1e-9), 2)})
+        out[task] = {"backend": lt.backend, "batches": rows}
+    return out
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--version", default=None, help="registry version (default: active)")
+    ap.add_argument("--model-dir", default=None)
+    ap.add_argument("--batch", default="1,16,64,256,1024")
+    ap.add_argument("--top", type=int, default=5)
+    ap.add_argument("--seconds", type=float, default=0.3, help="timing window per measurement")
+    a = ap.parse_args(argv)
+    version = a.version or get_active_version(a.model_dir)
+    if not version:
+        print("[explain] no --version and no active version", file=sys.stderr)
+        return 2
+    model = LoadedModel.load(resolve_model_dir(a.model_dir) / version)
+    res = benchmark(model, [int(b) for b in a.batch.split(",")], a.top, a.seconds)
+    for task, r in res.items():
+        for row in r["batches"]:
+            print(f"[explain] {task:<22} {r['backend']:<5} batch={row['batch']:<5} predict {row['predictMs']:>8.2f} ms  "
+                  f"explain {row['explainMs']:>8.2f} ms  (×{row['overhead']})")
+    print(json.dumps({"version": version, "tasks": res}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
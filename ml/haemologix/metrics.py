@@ -1,31 +1,80 @@
-"""Evaluation metrics per task kind, plus calibration (ECE) and permutation importance."""
+"""Evaluation metrics per task kind, plus calibration (ECE) and permutation importance.
+
+Binary ranking metrics come from one sort and shared cumulative sums; ECE and the
+multiclass confusion matrix use `np.bincount`. Outputs match the sklearn
+definitions (roc_auc_score, average_precision_score, brier_score_loss, log_loss,
+f1_score(average="macro")) to float tolerance.
+
+`bootstrap_metrics` resamples whole groups (groupId) and evaluates every
+replicate as a weight row over the same sorted predictions, so a chunk of
+replicates is a handful of matrix ops; chunks run on a thread pool with seeds
+spawned from one SeedSequence (results do not depend on the worker count).
+"""
 
 from __future__ import annotations
 
+import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
 import numpy as np
-from sklearn.metrics import (
-    average_precision_score,
-    brier_score_loss,
-    f1_score,
-    log_loss,
-    mean_absolute_error,
-    roc_auc_score,
-)
 
 from .tasks import TaskSpec
 
+_EPS = 1e-6
+
+
+# ---------------------------------------------------------------------------
+# Vectorised engine (one sort per call; no sklearn re-validation)
+# ---------------------------------------------------------------------------
+
+def _ranking_curve(y: np.ndarray, p: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Cumulative (tp, fp) counts at each distinct threshold, scores sorted descending once."""
+    order = np.argsort(-p, kind="mergesort")
+    ps, ys = p[order], y[order]
+    last = np.r_[np.flatnonzero(np.diff(ps)), len(ps) - 1]  # last index of each tied score block
+    tps = np.cumsum(ys)[last]
+    fps = (last + 1) - tps
+    return tps, fps
+
+
+def auroc_auprc(y: np.ndarray, p: np.ndarray) -> tuple[float, float]:
+    """AUROC (trapezoid over the ROC curve) and AUPRC (step-wise average precision, as sklearn)."""
+    tps, fps = _ranking_curve(y.astype(np.float64), p)
+    pos, neg = tps[-1], fps[-1]
+    tpr = np.r_[0.0, tps / pos]
+    fpr = np.r_[0.0, fps / neg]
+    auroc = float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+    precision = tps / (tps + fps)
+    auprc = float(np.sum(np.diff(tpr) * precision))
+    return auroc, auprc
+
 
 def expected_calibration_error(p: np.ndarray, y: np.ndarray, bins: int = 10) -> float:
     edges = np.linspace(0, 1, bins + 1)
-    ece = 0.0
-    n = len(p)
-    for lo, hi in zip(edges[:-1], edges[1:]):
-        m = (p >= lo) & (p < hi) if hi < 1 else (p >= lo) & (p <= hi)
-        if m.any():
-            ece += (m.sum() / n) * abs(p[m].mean() - y[m].mean())
-    return float(ece)
+    # same bin membership as [lo, hi) with the last bin closed
+    b = np.clip(np.searchsorted(edges, p, side="right") - 1, 0, bins - 1)
+    n_b = np.bincount(b, minlength=bins)
+    p_b = np.bincount(b, weights=p, minlength=bins)
+    y_b = np.bincount(b, weights=y, minlength=bins)
+    m = n_b > 0
+    return float(np.sum(np.abs(p_b[m] - y_b[m]) / len(p)))
+
+
+def macro_f1(y: np.ndarray, yhat: np.ndarray, k: int) -> float:
+    cm = np.bincount(y * k + yhat, minlength=k * k).reshape(k, k)
+    tp = np.diag(cm).astype(np.float64)
+    denom = cm.sum(axis=0) + cm.sum(axis=1)  # 2tp + fp + fn
+    f1 = np.divide(2 * tp, denom, out=np.zeros(k), where=denom > 0)
+    return float(f1.mean())
+
+
+def _multiclass_log_loss(y: np.ndarray, pred: np.ndarray, k: int) -> float | None:
+    if pred.ndim != 2 or pred.shape[1] != k or y.min() < 0 or y.max() >= k:
+        return None
+    q = np.clip(pred, _EPS, 1).astype(np.float64)
+    q /= q.sum(axis=1, keepdims=True)
+    return float(-np.mean(np.log(q[np.arange(len(y)), y])))
 
 
 def compute_metrics(spec: TaskSpec, y_true_model_space: np.ndarray, pred: np.ndarray, y_true_natural: np.ndarray | None = None) -> dict[str, Any]:
@@ -35,16 +84,16 @@ def compute_metrics(spec: TaskSpec, y_true_model_space: np.ndarray, pred: np.nda
         return out
     if spec.kind == "binary":
         y = y_true_model_space.astype(int)
-        p = np.clip(pred, 1e-6, 1 - 1e-6)
-        out["positive_rate"] = float(y.mean())
-        if len(np.unique(y)) > 1:
-            out["auroc"] = float(roc_auc_score(y, p))
-            out["auprc"] = float(average_precision_score(y, p))
+        p = np.clip(pred, _EPS, 1 - _EPS).astype(np.float64)
+        pos = float(y.mean())
+        out["positive_rate"] = pos
+        if 0.0 < pos < 1.0:
+            out["auroc"], out["auprc"] = auroc_auprc(y, p)
         else:
             out["auroc"] = 0.5
-            out["auprc"] = float(y.mean())
-        out["brier"] = float(brier_score_loss(y, p))
-        out["log_loss"] = float(log_loss(y, p, labels=[0, 1]))
+            out["auprc"] = pos
+        out["brier"] = float(np.mean((p - y) ** 2))
+        out["log_loss"] = float(-np.mean(np.where(y == 1, np.log(p), np.log1p(-p))))
         out["ece"] = expected_calibration_error(p, y)
         out["accuracy@0.5"] = float(((p >= 0.5).astype(int) == y).mean())
     elif spec.kind == "regression":
@@ -52,7 +101,7 @@ def compute_metrics(spec: TaskSpec, y_true_model_space: np.ndarray, pred: np.nda
         yt = y_true_natural if y_true_natural is not None else (np.expm1(y_true_model_space) if spec.log_target else y_true_model_space)
         pn = np.expm1(pred) if spec.log_target else pred
         err = np.abs(pn - yt)
-        out["mae"] = float(mean_absolute_error(yt, pn))
+        out["mae"] = float(np.mean(err))
         out["p50_abs_err"] = float(np.percentile(err, 50))
         out["p90_abs_err"] = float(np.percentile(err, 90))
         out["mape"] = float(np.mean(err / np.clip(np.abs(yt), 1, None)))
@@ -62,13 +111,12 @@ def compute_metrics(spec: TaskSpec, y_true_model_space: np.ndarray, pred: np.nda
         y = y_true_model_space.astype(int)
         yhat = pred.argmax(axis=1)
         out["accuracy"] = float((yhat == y).mean())
-        out["macro_f1"] = float(f1_score(y, yhat, average="macro", labels=list(range(spec.num_classes)), zero_division=0))
+        out["macro_f1"] = macro_f1(y, yhat, spec.num_classes)
         # within-one-level accuracy matters operationally
         out["within_one"] = float((np.abs(yhat - y) <= 1).mean())
-        try:
-            out["log_loss"] = float(log_loss(y, np.clip(pred, 1e-6, 1), labels=list(range(spec.num_classes))))
-        except ValueError:
-            pass
+        ll = _multiclass_log_loss(y, pred, spec.num_classes)
+        if ll is not None:
+            out["log_loss"] = ll
     return out
 
 
@@ -77,7 +125,16 @@ def primary(spec: TaskSpec, m: dict[str, Any]) -> float | None:
     return None if v is None else float(v)
 
 
-def is_better(spec: TaskSpec, candidate: dict[str, Any], incumbent: dict[str, Any] | None, min_delta: float = 0.0) -> bool:
+def is_better(
+    spec: TaskSpec,
+    candidate: dict[str, Any],
+    incumbent: dict[str, Any] | None,
+    min_delta: float = 0.0,
+    mode: str = "point",
+) -> bool:
+    """`mode="point"` compares point estimates; `mode="significant"` requires the candidate's
+    bootstrap interval (`candidate["ci"]`) to clear the incumbent's point estimate, and
+    falls back to the point comparison when the candidate carries no interval."""
     c = primary(spec, candidate)
     if c is None:
         return False
@@ -86,26 +143,132 @@ def is_better(spec: TaskSpec, candidate: dict[str, Any], incumbent: dict[str, An
     i = primary(spec, incumbent)
     if i is None:
         return True
+    ci = (candidate.get("ci") or {}).get(spec.primary_metric) if mode == "significant" else None
+    if ci is not None:
+        lo, hi = ci
+        return (hi < i - min_delta) if spec.lower_is_better else (lo > i + min_delta)
     return (c < i - min_delta) if spec.lower_is_better else (c > i + min_delta)
 
 
+# ---------------------------------------------------------------------------
+# Group bootstrap
+# ---------------------------------------------------------------------------
+
+def _weighted_replicates(spec: TaskSpec, y: np.ndarray, pred: np.ndarray, yt_nat: np.ndarray | None, W: np.ndarray) -> dict[str, np.ndarray]:
+    """Metrics for each weight row of W [b, n] (row = one bootstrap replicate)."""
+    tot = W.sum(axis=1)
+    out: dict[str, np.ndarray] = {}
+    if spec.kind == "binary":
+        y = y.astype(np.float64)
+        p = np.clip(pred, _EPS, 1 - _EPS).astype(np.float64)
+        order = np.argsort(-p, kind="mergesort")
+        ps, ys, Ws = p[order], y[order], W[:, order]
+        last = np.r_[np.flatnonzero(np.diff(ps)), len(ps) - 1]
+        tps = np.cumsum(Ws * ys, axis=1)[:, last]
+        fps = np.cumsum(Ws, axis=1)[:, last] - tps
+        pos, neg = tps[:, -1:], fps[:, -1:]
+        ok = (pos[:, 0] > 0) & (neg[:, 0] > 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            tpr = np.nan_to_num(np.hstack([np.zeros_like(pos), tps]) / pos)
+            fpr = np.nan_to_num(np.hstack([np.zeros_like(neg), fps]) / neg)
+            precision = np.nan_to_num(tps / (tps + fps))
+        out["auroc"] = np.where(ok, np.sum(np.diff(fpr, axis=1) * (tpr[:, 1:] + tpr[:, :-1]) / 2, axis=1), 0.5)
+        out["auprc"] = np.where(ok, np.sum(np.diff(tpr, axis=1) * precision, axis=1), pos[:, 0] / tot)
+        out["brier"] = W @ ((p - y) ** 2) / tot
+        out["log_loss"] = W @ -np.where(y == 1, np.log(p), np.log1p(-p)) / tot
+        edges = np.linspace(0, 1, 11)
+        onehot = np.eye(10)[np.clip(np.searchsorted(edges, p, side="right") - 1, 0, 9)]
+        out["ece"] = np.abs(W @ (onehot * p[:, None]) - W @ (onehot * y[:, None])).sum(axis=1) / tot
+    elif spec.kind == "regression":
+        yt = yt_nat if yt_nat is not None else (np.expm1(y) if spec.log_target else y)
+        pn = np.expm1(pred) if spec.log_target else pred
+        err = np.abs(pn - yt).astype(np.float64)
+        out["mae"] = W @ err / tot
+        out["mape"] = W @ (err / np.clip(np.abs(yt), 1, None)) / tot
+    else:
+        k = spec.num_classes
+        y = y.astype(int)
+        yhat = pred.argmax(axis=1)
+        cm = (W @ np.eye(k * k)[y * k + yhat]).reshape(len(W), k, k)
+        tp = np.diagonal(cm, axis1=1, axis2=2)
+        denom = cm.sum(axis=1) + cm.sum(axis=2)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out["macro_f1"] = np.where(denom > 0, 2 * tp / denom, 0.0).mean(axis=1)
+        out["accuracy"] = tp.sum(axis=1) / tot
+        out["within_one"] = W @ (np.abs(yhat - y) <= 1).astype(np.float64) / tot
+    return out
+
+
+def bootstrap_metrics(
+    spec: TaskSpec,
+    y_true_model_space: np.ndarray,
+    pred: np.ndarray,
+    groups: np.ndarray,
+    y_true_natural: np.ndarray | None = None,
+    n_boot: int = 200,
+    alpha: float = 0.05,
+    seed: int = 7,
+    n_jobs: int | None = None,
+    chunk: int = 25,
+) -> dict[str, list[float]]:
+    """Percentile CIs {metric: [lo, hi]} from resampling whole groups with replacement.
+
+    `groups` holds a dense integer group code per row (see data.group_codes).
+    """
+    n = len(y_true_model_space)
+    if n == 0 or n_boot <= 0:
+        return {}
+    _, g = np.unique(groups, return_inverse=True)
+    n_groups = int(g.max()) + 1
+    sizes = [min(chunk, n_boot - i) for i in range(0, n_boot, chunk)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    def run(b: int, ss: np.random.SeedSequence) -> dict[str, np.ndarray]:
+        counts = np.random.default_rng(ss).multinomial(n_groups, np.full(n_groups, 1 / n_groups), size=b)
+        return _weighted_replicates(spec, y_true_model_space, pred, y_true_natural, counts[:, g].astype(np.float64))
+
+    workers = n_jobs or min(4, os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(sizes)))) as pool:
+        parts = list(pool.map(run, sizes, seeds))
+    q = [alpha / 2, 1 - alpha / 2]
+    return {k: [float(v) for v in np.quantile(np.concatenate([p[k] for p in parts]), q)] for k in parts[0]}
+
+
+def primary_score(spec: TaskSpec, y_true_model_space: np.ndarray, pred: np.ndarray) -> float | None:
+    """Just the primary metric (same value as `compute_metrics`), for hot loops."""
+    if len(y_true_model_space) == 0:
+        return None
+    if spec.kind == "binary" and spec.primary_metric == "auroc":
+        y = y_true_model_space.astype(int)
+        pos = y.mean()
+        return auroc_auprc(y, np.clip(pred, _EPS, 1 - _EPS).astype(np.float64))[0] if 0 < pos < 1 else 0.5
+    if spec.kind == "regression" and spec.primary_metric == "mae":
+        yt = np.expm1(y_true_model_space) if spec.log_target else y_true_model_space
+        pn = np.expm1(pred) if spec.log_target else pred
+        return float(np.mean(np.abs(pn - yt)))
+    if spec.kind == "multiclass" and spec.primary_metric == "macro_f1":
+        return macro_f1(y_true_model_space.astype(int), pred.argmax(axis=1), spec.num_classes)
+    return primary(spec, compute_metrics(spec, y_true_model_space, pred))
+
+
 def permutation_importance(predict_fn, X: np.ndarray, y_model: np.ndarray, spec: TaskSpec, n_repeats: int = 2, seed: int = 0, max_rows: int = 5000) -> np.ndarray:
     """Cheap permutation importance on the primary metric (drop in metric when a column is shuffled)."""
     rng = np.random.default_rng(seed)
     if len(X) > max_rows:
         idx = rng.choice(len(X), max_rows, replace=False)
         X, y_model = X[idx], y_model[idx]
-    base = primary(spec, compute_metrics(spec, y_model, predict_fn(X)))
+    base = primary_score(spec, y_model, predict_fn(X))
     if base is None:
         return np.zeros(X.shape[1])
     imp = np.zeros(X.shape[1])
+    Xp = X.copy()  # one working copy; each column is shuffled in place and restored
     for j in range(X.shape[1]):
         drops = []
         for _ in range(n_repeats):
-            Xp = X.copy()
-            Xp[:, j] = rng.permutation(Xp[:, j])
-            m = primary(spec, compute_metrics(spec, y_model, predict_fn(Xp)))
+            Xp[:, j] = rng.permutation(X[:, j])
+            m = primary_score(spec, y_model, predict_fn(Xp))
             drop = (m - base) if spec.lower_is_better else (base - m)
             drops.append(drop if m is not None else 0.0)
+        Xp[:, j] = X[:, j]
         imp[j] = max(0.0, float(np.mean(drops)))
     return imp
@@ -5,30 +5,42 @@
                                         # multiclass: probs [n, k]
     Predictor.save(dir) / Predictor.load(dir)
     Predictor.feature_importance(names) -> dict | None
+    Predictor.attributions(X) -> np.ndarray | None   # per-row, per-column contributions [n, d]
+
+An MLP head may additionally carry a post-training quantized copy (`mlp_int8.pt`:
+dynamic int8 `nn.Linear`; `mlp_fp16.pt`: float16 weight storage) that `train_task`
+writes only when it holds the primary metric; `MlpPredictor.load` serves it unless
+`ML_MLP_QUANT=0`.
 
 Backends:
   * MlpPredictor   – small PyTorch MLP per task (the "custom model" the user asked for)
   * GbdtPredictor  – scikit-learn HistGradientBoosting (strong tabular baseline that MLP must beat, or ship it)
+  * LinearPredictor – L2 logistic / softmax / ridge, one NumPy matmul per call (the cheap learned candidate)
   * RulesPredictor – what the deterministic agents effectively assume today (constant rate / rule ETA);
                      the floor every learned model must clear to be approvable
 """
 
 from __future__ import annotations
 
+import copy
 import json
 import math
+import os
+import warnings
 from pathlib import Path
 from typing import Any
 
 import joblib
 import numpy as np
+import sklearn
 import torch
 from sklearn.ensemble import HistGradientBoostingClassifier, HistGradientBoostingRegressor
 from torch import nn
 
 from .tasks import TaskSpec
 
-BACKENDS = ["mlp", "gbdt", "rules"]
+BACKENDS = ["mlp", "gbdt", "linear", "rules"]
+QUANT_MODES = ("int8", "fp16")
 
 
 class Predictor:
@@ -53,24 +65,68 @@ class Predictor:
     def feature_importance(self, names: list[str]) -> dict[str, float] | None:
         return None
 
+    def attributions(self, X: np.ndarray) -> np.ndarray | None:
+        """Contribution of each matrix column to each row's raw output (logit for classifiers,
+        model-space value for regression; multiclass: the row's predicted class). None if unsupported."""
+        return None
+
 
 # ---------------------------------------------------------------------------
 # PyTorch MLP
 # ---------------------------------------------------------------------------
 
+def _emb_dim(cardinality: int) -> int:
+    return min(16, 2 + cardinality // 2)
+
+
 class _Mlp(nn.Module):
-    def __init__(self, in_dim: int, out_dim: int, hidden: tuple[int, ...] = (128, 64), dropout: float = 0.1):
+    """MLP over the preprocessed matrix. `cat_cols` (code-encoded categoricals, see
+    TabularPreprocessor.encoding) are gathered out and looked up in per-column embeddings
+    whose last row stands for unknown / missing (NaN code); the rest feed the first layer as is."""
+
+    def __init__(self, in_dim: int, out_dim: int, hidden: tuple[int, ...] = (128, 64), dropout: float = 0.1,
+                 cat_cols: list[int] | None = None, cat_cards: list[int] | None = None):
         super().__init__()
+        cat_cols, cat_cards = list(cat_cols or []), list(cat_cards or [])
+        self.register_buffer("dense_idx", torch.tensor([j for j in range(in_dim) if j not in set(cat_cols)], dtype=torch.long), persistent=False)
+        self.register_buffer("cat_idx", torch.tensor(cat_cols, dtype=torch.long), persistent=False)
+        self.register_buffer("cat_unknown", torch.tensor(cat_cards, dtype=torch.float32), persistent=False)
+        self.emb = nn.ModuleList(nn.Embedding(card + 1, _emb_dim(card)) for card in cat_cards)
         layers: list[nn.Module] = []
-        d = in_dim
+        d = in_dim - len(cat_cols) + sum(_emb_dim(card) for card in cat_cards)
         for h in hidden:
             layers += [nn.Linear(d, h), nn.LayerNorm(h), nn.GELU(), nn.Dropout(dropout)]
             d = h
         layers.append(nn.Linear(d, out_dim))
         self.net = nn.Sequential(*layers)
 
+    def first_input(self, x: torch.Tensor) -> torch.Tensor:
+        """What the first Linear layer sees: dense columns, then the embedding vectors."""
+        if not len(self.emb):
+            return x
+        codes = x[:, self.cat_idx]
+        codes = torch.where(torch.isnan(codes), self.cat_unknown, codes).long()
+        return torch.cat([x[:, self.dense_idx]] + [e(codes[:, j]) for j, e in enumerate(self.emb)], dim=1)
+
     def forward(self, x: torch.Tensor) -> torch.Tensor:
-        return self.net(x)
+        return self.net(self.first_input(x))
+
+    def fold_inputs(self, v: np.ndarray) -> np.ndarray:
+        """Per-first-layer-input values (last axis) → per matrix column, embedding dims summed onto
+        their categorical, in matrix column order."""
+        k = len(self.dense_idx)
+        out = np.zeros(v.shape[:-1] + (k + len(self.emb),), dtype=np.float64)
+        out[..., :k] = v[..., :k]
+        i = k
+        for j, e in enumerate(self.emb):
+            out[..., k + j] = v[..., i:i + e.embedding_dim].sum(axis=-1)
+            i += e.embedding_dim
+        order = np.argsort(np.concatenate([self.dense_idx.cpu().numpy(), self.cat_idx.cpu().numpy()]), kind="stable")
+        return out[..., order]
+
+    def input_importance(self, first_weight: torch.Tensor) -> np.ndarray:
+        """|first-layer weight| summed per input column of the matrix, in matrix column order."""
+        return self.fold_inputs(first_weight.detach().abs().sum(dim=0).cpu().numpy())
 
 
 class MlpPredictor(Predictor):
@@ -88,6 +144,8 @@ class MlpPredictor(Predictor):
         patience: int = 8,
         seed: int = 7,
         device: str | None = None,
+        cat_cols: list[int] | None = None,
+        cat_cards: list[int] | None = None,
     ):
         super().__init__(spec)
         self.hidden = tuple(hidden)
@@ -99,10 +157,16 @@ class MlpPredictor(Predictor):
         self.patience = patience
         self.seed = seed
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.cat_cols = list(cat_cols or [])  # code-encoded categorical columns → embeddings
+        self.cat_cards = list(cat_cards or [])
         self.model: _Mlp | None = None
         self.in_dim = 0
         self.temperature = 1.0  # post-hoc calibration for binary/multiclass
         self.history: list[dict[str, float]] = []
+        self.quant: str | None = None  # mode of *this* model (None = float32)
+        self.quant_info: dict[str, Any] | None = None  # train-time quantization report, persisted in mlp.json
+        self.init_state: dict[str, torch.Tensor] | None = None  # warm start: (partial) weights to fine-tune from
+        self._float: _Mlp | None = None  # float32 twin of an int8 head, built on first `attributions`
 
     @property
     def out_dim(self) -> int:
@@ -113,24 +177,32 @@ class MlpPredictor(Predictor):
             return nn.functional.binary_cross_entropy_with_logits(logits.squeeze(-1), y)
         if self.spec.kind == "regression":
             return nn.functional.smooth_l1_loss(logits.squeeze(-1), y)
-        return nn.functional.cross_entropy(logits, y.long())
+        return nn.functional.cross_entropy(logits, y if y.dim() == 2 else y.long())  # [n, k] soft targets (distillation)
 
     def fit(self, X, y, X_val=None, y_val=None):
         torch.manual_seed(self.seed)
         np.random.seed(self.seed)
         self.in_dim = X.shape[1]
-        self.model = _Mlp(self.in_dim, self.out_dim, self.hidden, self.dropout).to(self.device)
+        self.model = _Mlp(self.in_dim, self.out_dim, self.hidden, self.dropout, self.cat_cols, self.cat_cards).to(self.device)
+        if self.init_state is not None:
+            self.model.load_state_dict(self.model.state_dict() | {k: v.to(self.device) for k, v in self.init_state.items()})
         opt = torch.optim.AdamW(self.model.parameters(), lr=self.lr, weight_decay=self.weight_decay)
         sched = torch.optim.lr_scheduler.CosineAnnealingLR(opt, T_max=max(1, self.epochs))
         Xt = torch.as_tensor(X, dtype=torch.float32, device=self.device)
-        yt = torch.as_tensor(y, dtype=torch.float32 if self.spec.kind != "multiclass" else torch.long, device=self.device)
+        target = lambda a: torch.float32 if self.spec.kind != "multiclass" or np.ndim(a) == 2 else torch.long  # noqa: E731
+        yt = torch.as_tensor(y, dtype=target(y), device=self.device)
         has_val = X_val is not None and len(X_val) > 0
         if has_val:
             Xv = torch.as_tensor(X_val, dtype=torch.float32, device=self.device)
-            yv = torch.as_tensor(y_val, dtype=torch.float32 if self.spec.kind != "multiclass" else torch.long, device=self.device)
+            yv = torch.as_tensor(y_val, dtype=target(y_val), device=self.device)
         best = math.inf
         best_state = None
         bad = 0
+        if has_val and self.init_state is not None:  # fine-tuning must beat where it started
+            self.model.eval()
+            with torch.no_grad():
+                best = float(self._loss(self.model(Xv), yv))
+            best_state = {k: v.detach().clone() for k, v in self.model.state_dict().items()}
         n = len(Xt)
         for epoch in range(self.epochs):
             self.model.train()
@@ -198,33 +270,137 @@ class MlpPredictor(Predictor):
         """Mean |∂output/∂input| over a probe batch stored at save time is expensive; use first-layer weight norms."""
         if self.model is None:
             return None
-        first = next(m for m in self.model.net if isinstance(m, nn.Linear))
-        w = first.weight.detach().abs().sum(dim=0).cpu().numpy()
+        first = self.model.net[0]
+        weight = first.weight() if callable(first.weight) else first.weight  # dynamic-int8 Linear exposes weight()
+        if weight.is_quantized:
+            weight = weight.dequantize()
+        w = self.model.input_importance(weight)
         w = w / (w.sum() + 1e-9)
         return {n: float(v) for n, v in sorted(zip(names, w), key=lambda kv: -kv[1])[:15]}
 
+    def attributions(self, X: np.ndarray) -> np.ndarray | None:
+        """Gradient × input at the first layer, one backward pass for the whole batch: numeric columns
+        against their training mean (z = 0), one-hot / bool against "absent", embeddings against the
+        zero vector. Binary / multiclass logits are divided by the calibration temperature."""
+        if self.model is None:
+            return None
+        model = self._float_model()
+        x = torch.as_tensor(X, dtype=torch.float32, device=next(model.parameters()).device)
+        h = model.first_input(x).detach().requires_grad_(True)
+        out = model.net(h)
+        if self.spec.kind == "multiclass":
+            out = out.gather(1, out.argmax(dim=1, keepdim=True))
+        out = out.squeeze(-1) / (self.temperature if self.spec.kind != "regression" else 1.0)
+        (grad,) = torch.autograd.grad(out.sum(), h)  # rows are independent, so d(sum)/dh_i = d(out_i)/dh_i
+        return model.fold_inputs((grad * h).detach().cpu().numpy()).astype(np.float32)
+
+    def _float_model(self) -> _Mlp:
+        """The network with float32 Linear layers (dynamic-int8 layers have no autograd), cached."""
+        assert self.model is not None
+        if self.quant != "int8":
+            return self.model
+        if self._float is None:
+            f = _Mlp(self.in_dim, self.out_dim, self.hidden, self.dropout, self.cat_cols, self.cat_cards)
+            state = {k: v for k, v in self.model.state_dict().items() if k in f.state_dict()}
+            for name, mod in self.model.named_modules():
+                if callable(getattr(mod, "weight", None)):  # dynamic-int8 Linear
+                    state[f"{name}.weight"], state[f"{name}.bias"] = mod.weight().dequantize(), mod.bias()
+            f.load_state_dict(state)
+            self._float = f.eval()
+        return self._float
+
+    # -- post-training quantization -------------------------------------------
+
+    def quantized(self, mode: str) -> "MlpPredictor":
+        """A CPU copy of this head as it would be served in `mode` (see QUANT_MODES)."""
+        assert self.model is not None, "model not fitted"
+        if mode not in QUANT_MODES:
+            raise ValueError(f"unknown quantization mode {mode!r}; expected one of {QUANT_MODES}")
+        q = copy.copy(self)
+        q.device, q.quant, q.quant_info = "cpu", mode, None
+        q.model = _quantize(copy.deepcopy(self.model).cpu().eval(), mode)
+        if mode == "fp16":  # serve exactly what the half-precision file round-trips to
+            q.model.load_state_dict({k: v.half().float() for k, v in q.model.state_dict().items()})
+        return q
+
+    def quant_state(self) -> dict[str, torch.Tensor]:
+        assert self.model is not None and self.quant is not None
+        state = self.model.state_dict()
+        return {k: v.half() for k, v in state.items()} if self.quant == "fp16" else state
+
+    def save_quantized(self, d: Path) -> Path:
+        assert self.quant is not None, "not a quantized head"
+        p = Path(d) / f"mlp_{self.quant}.pt"
+        torch.save(self.quant_state(), p)
+        return p
+
+    # -- persistence -------------------------------------------------------------
+
+    def config(self) -> dict[str, Any]:
+        cfg = {
+            "in_dim": self.in_dim, "out_dim": self.out_dim, "hidden": list(self.hidden), "dropout": self.dropout,
+            "temperature": self.temperature, "history": self.history[-5:],
+        }
+        if self.cat_cols:
+            cfg["cat_cols"], cfg["cat_cards"] = self.cat_cols, self.cat_cards
+        if self.quant_info is not None:
+            cfg["quantized"] = self.quant_info
+        return cfg
+
     def save(self, d: Path) -> None:
         d = Path(d)
         d.mkdir(parents=True, exist_ok=True)
         assert self.model is not None
         torch.save(self.model.state_dict(), d / "mlp.pt")
-        (d / "mlp.json").write_text(json.dumps({
-            "in_dim": self.in_dim, "out_dim": self.out_dim, "hidden": list(self.hidden), "dropout": self.dropout,
-            "temperature": self.temperature, "history": self.history[-5:],
-        }), encoding="utf-8")
+        self.save_config(d)
+
+    def save_config(self, d: Path) -> None:
+        """Rewrite mlp.json only (e.g. after `quant_info` changed); the weights stay as saved."""
+        (Path(d) / "mlp.json").write_text(json.dumps(self.config()), encoding="utf-8")
 
     @classmethod
-    def load(cls, d: Path, spec: TaskSpec) -> "MlpPredictor":
-        d = Path(d)
-        cfg = json.loads((d / "mlp.json").read_text(encoding="utf-8"))
-        p = cls(spec, hidden=tuple(cfg["hidden"]), dropout=cfg["dropout"])
+    def from_state(cls, spec: TaskSpec, cfg: dict[str, Any], state: dict[str, torch.Tensor], quant: str | None = None) -> "MlpPredictor":
+        p = cls(spec, hidden=tuple(cfg["hidden"]), dropout=cfg["dropout"], cat_cols=cfg.get("cat_cols"), cat_cards=cfg.get("cat_cards"))
         p.in_dim = cfg["in_dim"]
         p.temperature = cfg.get("temperature", 1.0)
-        p.model = _Mlp(p.in_dim, p.out_dim, p.hidden, p.dropout).to(p.device)
-        p.model.load_state_dict(torch.load(d / "mlp.pt", map_location=p.device))
+        p.quant_info = cfg.get("quantized")
+        p.model = _Mlp(p.in_dim, p.out_dim, p.hidden, p.dropout, p.cat_cols, p.cat_cards)
+        if quant is None:
+            p.model.to(p.device).load_state_dict(state)
+        else:
+            p.device, p.quant = "cpu", quant
+            p.model = _quantize(p.model.eval(), quant)
+            p.model.load_state_dict({k: v.float() for k, v in state.items()} if quant == "fp16" else state)
         p.model.eval()
         return p
 
+    @classmethod
+    def load(cls, d: Path, spec: TaskSpec) -> "MlpPredictor":
+        d = Path(d)
+        cfg = json.loads((d / "mlp.json").read_text(encoding="utf-8"))
+        mode = serving_quant(cfg)
+        if mode and (d / f"mlp_{mode}.pt").exists():
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                return cls.from_state(spec, cfg, torch.load(d / f"mlp_{mode}.pt", map_location="cpu"), quant=mode)
+        return cls.from_state(spec, cfg, torch.load(d / "mlp.pt", map_location="cpu"))
+
+
+def _quantize(model: nn.Module, mode: str) -> nn.Module:
+    if mode == "fp16":
+        return model  # storage-only: weights live as float16 on disk, compute stays float32
+    with warnings.catch_warnings():  # torch.ao.quantization deprecation notices
+        warnings.simplefilter("ignore")
+        return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+def serving_quant(cfg: dict[str, Any]) -> str | None:
+    """The quantized mode to serve for an mlp.json config, or None for the float32 head."""
+    q = cfg.get("quantized") or {}
+    if not q.get("accepted") or os.environ.get("ML_MLP_QUANT", "1").strip() == "0":
+        return None
+    return q.get("mode")
+
 
 # ---------------------------------------------------------------------------
 # Gradient boosting baseline
@@ -233,22 +409,37 @@ class MlpPredictor(Predictor):
 class GbdtPredictor(Predictor):
     backend = "gbdt"
 
-    def __init__(self, spec: TaskSpec, seed: int = 7, max_iter: int = 300, learning_rate: float = 0.06):
+    def __init__(self, spec: TaskSpec, seed: int = 7, max_iter: int = 300, learning_rate: float = 0.06,
+                 cat_cols: list[int] | None = None, cat_cards: list[int] | None = None):
         super().__init__(spec)
         self.seed = seed
         self.max_iter = max_iter
         self.learning_rate = learning_rate
+        # code-encoded columns split natively as categories; HistGB bins them, so cardinality
+        # must fit under max_bins (255) — wider vocabularies stay ordinal codes
+        self.cat_cols = [j for j, card in zip(cat_cols or [], cat_cards or []) if card < 255]
         self.est: Any = None
         self._importance: np.ndarray | None = None
+        self.init_est: Any = None  # warm start: a fitted estimator to keep boosting (`max_iter` more rounds)
+        self._tables: list[dict[str, np.ndarray]] | None = None  # tree arrays for `attributions`, built on first use
+        # the tree walk reads HistGB internals: its first batches are checked against the public raw output
+        self._offsets: dict[int, float] = {}  # per output: raw output minus summed contributions
+        self._checked_rows = 0
+        self._attr_error: str | None = None  # set once the walk is found not to reproduce the estimator
 
     def fit(self, X, y, X_val=None, y_val=None):
         common = dict(max_iter=self.max_iter, learning_rate=self.learning_rate, random_state=self.seed,
-                      early_stopping=True, validation_fraction=0.1, n_iter_no_change=20, l2_regularization=0.5)
-        if self.spec.kind == "regression":
+                      early_stopping=True, validation_fraction=0.1, n_iter_no_change=20, l2_regularization=0.5,
+                      categorical_features=self.cat_cols or None)
+        if self.init_est is not None:
+            self.est = copy.deepcopy(self.init_est)
+            self.est.set_params(warm_start=True, max_iter=self.est.n_iter_ + self.max_iter)
+        elif self.spec.kind == "regression":
             self.est = HistGradientBoostingRegressor(**common)
         else:
             self.est = HistGradientBoostingClassifier(**common)
         self.est.fit(X, y)
+        self._tables, self._offsets, self._checked_rows, self._attr_error = None, {}, 0, None
         return self
 
     def predict(self, X: np.ndarray) -> np.ndarray:
@@ -266,12 +457,57 @@ class GbdtPredictor(Predictor):
         return out
 
     def feature_importance(self, names: list[str]) -> dict[str, float] | None:
-        # HistGB has no native importances; use permutation importance lazily computed at eval time (see evaluate.py)
+        # HistGB has no native importances; train.py stores permutation importance (metrics.permutation_importance)
         if self._importance is None:
             return None
         imp = self._importance / (self._importance.sum() + 1e-9)
         return {n: float(v) for n, v in sorted(zip(names, imp), key=lambda kv: -kv[1])[:15]}
 
+    def attributions(self, X: np.ndarray) -> np.ndarray | None:
+        """Path contributions (Saabas): every split on a row's path credits its feature with the change in
+        the expected leaf value below it, so a row's contributions sum to its raw output minus the
+        ensemble's expected output. All trees of an output are walked together, one depth level per step.
+
+        The walk reads fitted-HistGB internals, so until `_SELF_CHECK_ROWS` rows have passed, every batch
+        is checked against the public raw output; on a mismatch (or missing internals after a
+        scikit-learn upgrade) this head stops explaining (None) and says so once."""
+        if self.est is None or self._attr_error is not None:
+            return None
+        try:
+            if self._tables is None:
+                self._tables = _tree_tables(self.est)
+            pre = getattr(self.est, "_preprocessor", None)
+            Xp = np.asarray(pre.transform(X) if pre is not None else X, dtype=np.float64)
+        except (AttributeError, KeyError, ValueError, TypeError) as e:
+            return self._disable_attributions(f"unsupported estimator internals: {e!r}")
+        raw = self.est.predict(X) if self.spec.kind == "regression" else self.est.decision_function(X)
+        pick = np.zeros(len(X), dtype=np.int64)
+        if self.spec.kind == "multiclass" and len(self._tables) > 1:
+            pick = raw.argmax(axis=1)
+            raw = raw[np.arange(len(X)), pick]
+            out = np.zeros(X.shape, dtype=np.float32)
+            for k, tables in enumerate(self._tables):
+                rows = np.flatnonzero(pick == k)
+                if len(rows):
+                    out[rows] = _path_contributions(tables, Xp[rows], X.shape[1])
+        else:
+            out = _path_contributions(self._tables[0], Xp, X.shape[1])
+        if self._checked_rows < _SELF_CHECK_ROWS:
+            gap = np.asarray(raw, dtype=np.float64) - out.sum(axis=1, dtype=np.float64)
+            for k in np.unique(pick):
+                g = gap[pick == k]
+                ref = self._offsets.setdefault(int(k), float(g[0]))
+                if not np.allclose(g, ref, rtol=1e-4, atol=1e-4):
+                    return self._disable_attributions(f"contributions do not sum to raw output minus the expected value "
+                                                      f"(gap spread {float(np.ptp(g - ref)):.3g})")
+            self._checked_rows += len(X)
+        return out
+
+    def _disable_attributions(self, why: str) -> None:
+        self._attr_error = why
+        print(f"[models] {self.spec.name}: gbdt attributions disabled ({why}); sklearn {sklearn.__version__}")
+        return None
+
     def save(self, d: Path) -> None:
         d = Path(d)
         d.mkdir(parents=True, exist_ok=True)
@@ -279,15 +515,332 @@ class GbdtPredictor(Predictor):
         if self._importance is not None:
             np.save(d / "gbdt_importance.npy", self._importance)
 
+    @classmethod
+    def from_estimator(cls, spec: TaskSpec, est: Any, importance: np.ndarray | None = None) -> "GbdtPredictor":
+        p = cls(spec)
+        p.est = est
+        p._importance = importance
+        return p
+
     @classmethod
     def load(cls, d: Path, spec: TaskSpec) -> "GbdtPredictor":
         d = Path(d)
-        p = cls(spec)
-        p.est = joblib.load(d / "gbdt.joblib")
-        if (d / "gbdt_importance.npy").exists():
-            p._importance = np.load(d / "gbdt_importance.npy")
+        imp = np.load(d / "gbdt_importance.npy") if (d / "gbdt_importance.npy").exists() else None
+        return cls.from_estimator(spec, joblib.load(d / "gbdt.joblib"), imp)
+
+
+_SELF_CHECK_ROWS = 64  # rows whose gbdt attributions are checked against the estimator before they are trusted
+
+
+def _tree_tables(est: Any) -> list[dict[str, np.ndarray]]:
+    """Per output, every node of every tree of a fitted HistGB in flat arrays (children as global node
+    ids, tree t's root at `roots[t]`). `dleft` / `dright` are the change in expected leaf value
+    (training-count weighted mean; HistGB only stores leaf values) from a node to each child."""
+    out = []
+    cols = _column_map(est)
+    for k in range(est.n_trees_per_iteration_):
+        trees = [it[k] for it in est._predictors]
+        nodes = [t.nodes for t in trees]
+        base = np.cumsum([0] + [len(nd) for nd in nodes])[:-1]
+        n_bitsets = np.cumsum([0] + [len(t.raw_left_cat_bitsets) for t in trees])[:-1]
+        means = []
+        for nd in nodes:
+            mean, count = nd["value"].astype(np.float64), nd["count"].astype(np.float64)
+            for i in range(len(nd) - 1, -1, -1):  # children come after their parent
+                if not nd["is_leaf"][i]:
+                    lc, rc = nd["left"][i], nd["right"][i]
+                    mean[i] = (mean[lc] * count[lc] + mean[rc] * count[rc]) / max(count[lc] + count[rc], 1.0)
+            means.append(mean)
+        nd = np.concatenate(nodes)
+        mean = np.concatenate(means)
+        leaf = nd["is_leaf"] == 1
+        off = np.repeat(base, [len(x) for x in nodes])
+        left = np.where(leaf, 0, nd["left"] + off)
+        right = np.where(leaf, 0, nd["right"] + off)
+        out.append({
+            "roots": base.astype(np.int64),
+            "feature": nd["feature_idx"].astype(np.int64),
+            "column": cols[nd["feature_idx"]],
+            "threshold": nd["num_threshold"].astype(np.float64),
+            "missing_left": nd["missing_go_to_left"] == 1,
+            "leaf": leaf,
+            "categorical": nd["is_categorical"] == 1,
+            "bitset": (nd["bitset_idx"] + np.repeat(n_bitsets, [len(x) for x in nodes])).astype(np.int64),
+            "bitsets": np.concatenate([np.asarray(t.raw_left_cat_bitsets, dtype=np.uint32).reshape(-1, 8) for t in trees]),
+            "left": left,
+            "right": right,
+            "dleft": np.where(leaf, 0.0, mean[left] - mean),
+            "dright": np.where(leaf, 0.0, mean[right] - mean),
+        })
+    return out
+
+
+def _column_map(est: Any) -> np.ndarray:
+    """Tree feature index → matrix column (HistGB moves native categoricals to the front)."""
+    cat = getattr(est, "is_categorical_", None)
+    if getattr(est, "_preprocessor", None) is None or cat is None:
+        return np.arange(est.n_features_in_)
+    return np.concatenate([np.flatnonzero(cat), np.flatnonzero(~cat)])
+
+
+def _path_contributions(tab: dict[str, np.ndarray], Xp: np.ndarray, d: int) -> np.ndarray:
+    """Walk every (row, tree) pair down one level per step, dropping pairs that reached a leaf."""
+    n, n_trees = len(Xp), len(tab["roots"])
+    node = np.tile(tab["roots"], n)
+    row = np.repeat(np.arange(n), n_trees)
+    flat = Xp.ravel()
+    contrib = np.zeros(n * d, dtype=np.float64)
+    while True:
+        inner = ~tab["leaf"][node]
+        node, row = node[inner], row[inner]
+        if not len(node):
+            break
+        x = flat[row * Xp.shape[1] + tab["feature"][node]]
+        nan = np.isnan(x)
+        go_left = np.where(nan, tab["missing_left"][node], x <= tab["threshold"][node])
+        cat = tab["categorical"][node] & ~nan
+        if cat.any():
+            c = x[cat].astype(np.int64)
+            known = (c >= 0) & (c < 256)  # anything else is treated as missing, like sklearn
+            c = np.clip(c, 0, 255)
+            hit = (tab["bitsets"][tab["bitset"][node[cat]], c >> 5] >> (c & 31)) & 1 == 1
+            go_left[cat] = np.where(known, hit, tab["missing_left"][node[cat]])
+        contrib += np.bincount(row * d + tab["column"][node], weights=np.where(go_left, tab["dleft"][node], tab["dright"][node]),
+                               minlength=n * d)
+        node = np.where(go_left, tab["left"][node], tab["right"][node])
+    return contrib.reshape(n, d).astype(np.float32)
+
+
+# ---------------------------------------------------------------------------
+# Linear / logistic / softmax / ridge
+# ---------------------------------------------------------------------------
+
+#: L2 strengths tried on the validation split (penalty l2/2·‖W‖² on the mean loss; bias unpenalised)
+L2_GRID = (1e-4, 1e-3, 1e-2, 1e-1)
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 0.5 * (1.0 + np.tanh(0.5 * z))  # no overflow for large |z|
+
+
+class LinearPredictor(Predictor):
+    """One affine map of the matrix, served as a single NumPy matmul. Code-encoded categoricals are
+    expanded to one-hot inside the head (unknown / NaN code → all zeros), so both encodings work.
+
+    binary      L2 logistic regression      L-BFGS on the mean log-loss
+    multiclass  L2 softmax regression       L-BFGS on the mean cross-entropy
+    regression  ridge                       closed form (normal equations), model space
+
+    Targets may be soft (P(1) in [0, 1], or [n, k] class distributions) for distillation. With a
+    validation split the L2 strength is picked from `L2_GRID` by validation loss, and classifiers get
+    the same temperature calibration as the MLP."""
+
+    backend = "linear"
+
+    def __init__(self, spec: TaskSpec, l2: float | None = None, max_iter: int = 300,
+                 cat_cols: list[int] | None = None, cat_cards: list[int] | None = None):
+        super().__init__(spec)
+        self.l2 = l2  # None: pick from L2_GRID on the validation split (1e-3 without one)
+        self.max_iter = max_iter
+        self.cat_cols = list(cat_cols or [])
+        self.cat_cards = list(cat_cards or [])
+        self.in_dim = 0
+        self.W: np.ndarray | None = None  # [design dim, out_dim] float32
+        self.b: np.ndarray | None = None  # [out_dim]
+        self.temperature = 1.0
+        self.fit_info: dict[str, Any] = {}
+
+    @property
+    def out_dim(self) -> int:
+        return self.spec.num_classes if self.spec.kind == "multiclass" else 1
+
+    @property
+    def _dense(self) -> np.ndarray:
+        cat = set(self.cat_cols)
+        return np.asarray([j for j in range(self.in_dim) if j not in cat], dtype=np.int64)
+
+    def _design(self, X: np.ndarray) -> np.ndarray:
+        """The matrix with code columns expanded to one-hot blocks (appended after the dense columns)."""
+        X = np.asarray(X, dtype=np.float32)
+        if not self.cat_cols:
+            return X
+        dense = self._dense
+        A = np.zeros((len(X), len(dense) + sum(self.cat_cards)), dtype=np.float32)
+        A[:, :len(dense)] = X[:, dense]
+        off = len(dense)
+        for c, card in zip(self.cat_cols, self.cat_cards):
+            code = X[:, c]
+            rows = np.flatnonzero((code >= 0) & (code < card))  # NaN compares False
+            A[rows, off + code[rows].astype(np.int64)] = 1.0
+            off += card
+        return A
+
+    def _targets(self, y: np.ndarray) -> np.ndarray:
+        """[n, out_dim] float32 targets: hard multiclass labels become one-hot rows."""
+        y = np.asarray(y, dtype=np.float32)
+        if self.spec.kind == "multiclass" and y.ndim == 1:
+            return np.eye(self.out_dim, dtype=np.float32)[y.astype(np.int64)]
+        return y.reshape(len(y), -1)
+
+    def _loss_grad(self, theta: np.ndarray, A: np.ndarray, Y: np.ndarray, l2: float) -> tuple[float, np.ndarray]:
+        d, k = A.shape[1], Y.shape[1]
+        W, b = theta[:d * k].reshape(d, k), theta[d * k:]
+        Z = A @ W.astype(np.float32) + b.astype(np.float32)
+        n = len(A)
+        if self.spec.kind == "binary":
+            loss = float(np.logaddexp(0.0, Z).sum() - (Y * Z).sum()) / n
+            G = (_sigmoid(Z) - Y) / n
+        else:
+            zmax = Z.max(axis=1, keepdims=True)
+            E = np.exp(Z - zmax)
+            S = E.sum(axis=1, keepdims=True)
+            loss = float((np.log(S) + zmax).sum() - (Y * Z).sum()) / n
+            G = (E / S - Y) / n
+        loss += 0.5 * l2 * float((W * W).sum())
+        gW = (A.T @ G).astype(np.float64) + l2 * W
+        return loss, np.concatenate([gW.ravel(), G.sum(axis=0).astype(np.float64)])
+
+    def _solve(self, A: np.ndarray, Y: np.ndarray, l2: float, theta0: np.ndarray | None) -> np.ndarray:
+        d, k = A.shape[1], Y.shape[1]
+        if self.spec.kind == "regression":
+            A1 = np.hstack([A, np.ones((len(A), 1), dtype=np.float32)]).astype(np.float64)
+            G = A1.T @ A1 / len(A)
+            G[np.arange(d), np.arange(d)] += l2
+            G[d, d] += 1e-9
+            sol = np.linalg.solve(G, A1.T @ Y.astype(np.float64) / len(A))
+            return np.concatenate([sol[:d].ravel(), sol[d]])
+        from scipy.optimize import minimize  # scikit-learn's own dependency
+
+        res = minimize(self._loss_grad, np.zeros(d * k + k) if theta0 is None else theta0, args=(A, Y, l2), jac=True,
+                       method="L-BFGS-B", options={"maxiter": self.max_iter})
+        return res.x
+
+    def _logits(self, A: np.ndarray, theta: np.ndarray) -> np.ndarray:
+        d, k = A.shape[1], self.out_dim
+        return A @ theta[:d * k].reshape(d, k).astype(np.float32) + theta[d * k:].astype(np.float32)
+
+    def _val_loss(self, Z: np.ndarray, Y: np.ndarray) -> float:
+        if self.spec.kind == "regression":
+            return float(np.mean((Z - Y) ** 2))
+        if self.spec.kind == "binary":
+            return float(np.mean(np.logaddexp(0.0, Z) - Y * Z))
+        zmax = Z.max(axis=1, keepdims=True)
+        return float(np.mean(np.log(np.exp(Z - zmax).sum(axis=1)) + zmax[:, 0] - (Y * Z).sum(axis=1)))
+
+    def fit(self, X, y, X_val=None, y_val=None):
+        self.in_dim = X.shape[1]
+        A, Y = self._design(X), self._targets(y)
+        has_val = X_val is not None and len(X_val) > 0
+        Av, Yv = (self._design(X_val), self._targets(y_val)) if has_val else (None, None)
+        grid = [self.l2] if self.l2 is not None else list(L2_GRID) if has_val else [1e-3]
+        best: tuple[float, float, np.ndarray] | None = None
+        theta = None
+        for l2 in sorted(grid, reverse=True):  # strongest first; each solve warm-starts the next
+            theta = self._solve(A, Y, l2, theta)
+            vl = self._val_loss(self._logits(Av, theta), Yv) if has_val else 0.0
+            if best is None or vl < best[0]:
+                best = (vl, l2, theta)
+        assert best is not None
+        self.l2, theta = best[1], best[2]
+        d = A.shape[1]
+        self.W = theta[:d * self.out_dim].reshape(d, self.out_dim).astype(np.float32)
+        self.b = theta[d * self.out_dim:].astype(np.float32)
+        self.fit_info = {"l2": self.l2, "val_loss": best[0] if has_val else None, "design_dim": d}
+        if has_val and self.spec.kind in ("binary", "multiclass"):
+            self._fit_temperature(Av, Yv)
+        return self
+
+    def _fit_temperature(self, Av: np.ndarray, Yv: np.ndarray) -> None:
+        """Temperature scaling on the validation set, over the MLP's grid."""
+        Z = self._raw(Av)
+        best_t, best_nll = 1.0, math.inf
+        for t in np.linspace(0.5, 3.0, 26):
+            nll = self._val_loss(Z / t, Yv)
+            if nll < best_nll:
+                best_nll, best_t = nll, float(t)
+        self.temperature = best_t
+
+    def _raw(self, A: np.ndarray) -> np.ndarray:
+        assert self.W is not None and self.b is not None, "model not fitted"
+        return A @ self.W + self.b
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        if len(X) == 0:
+            return np.zeros((0, self.out_dim) if self.spec.kind == "multiclass" else (0,), dtype=np.float32)
+        Z = self._raw(self._design(X))
+        if self.spec.kind == "regression":
+            return Z[:, 0]
+        Z = Z / self.temperature
+        if self.spec.kind == "binary":
+            return _sigmoid(Z[:, 0]).astype(np.float32)
+        E = np.exp(Z - Z.max(axis=1, keepdims=True))
+        return (E / E.sum(axis=1, keepdims=True)).astype(np.float32)
+
+    def _fold(self, V: np.ndarray) -> np.ndarray:
+        """Per design column (last axis) → per matrix column, one-hot blocks summed onto their code column."""
+        dense = self._dense
+        out = np.zeros(V.shape[:-1] + (self.in_dim,), dtype=np.float32)
+        out[..., dense] = V[..., :len(dense)]
+        off = len(dense)
+        for c, card in zip(self.cat_cols, self.cat_cards):
+            out[..., c] = V[..., off:off + card].sum(axis=-1)
+            off += card
+        return out
+
+    def feature_importance(self, names: list[str]) -> dict[str, float] | None:
+        """|weight| summed over outputs per matrix column (a code column sums its category weights)."""
+        if self.W is None:
+            return None
+        w = self._fold(np.abs(self.W).sum(axis=1))
+        w = w / (w.sum() + 1e-9)
+        return {n: float(v) for n, v in sorted(zip(names, w), key=lambda kv: -kv[1])[:15]}
+
+    def attributions(self, X: np.ndarray) -> np.ndarray | None:
+        """Exact: weight × value per column (numerics against their training mean, one-hot / bool /
+        code against "absent"); classifiers' logits divided by the temperature, multiclass for the
+        row's predicted class."""
+        if self.W is None:
+            return None
+        A = self._design(X)
+        if self.spec.kind == "multiclass":
+            E = A * self.W[:, self._raw(A).argmax(axis=1)].T
+        else:
+            E = A * self.W[:, 0]
+        if self.spec.kind != "regression":
+            E = E / self.temperature
+        return self._fold(E)
+
+    # -- persistence -------------------------------------------------------------
+
+    def config(self) -> dict[str, Any]:
+        cfg = {"in_dim": self.in_dim, "out_dim": self.out_dim, "l2": self.l2, "temperature": self.temperature, "fit": self.fit_info}
+        if self.cat_cols:
+            cfg["cat_cols"], cfg["cat_cards"] = self.cat_cols, self.cat_cards
+        return cfg
+
+    def save(self, d: Path) -> None:
+        d = Path(d)
+        d.mkdir(parents=True, exist_ok=True)
+        assert self.W is not None and self.b is not None
+        np.savez(d / "linear.npz", W=self.W, b=self.b)
+        (d / "linear.json").write_text(json.dumps(self.config()), encoding="utf-8")
+
+    @classmethod
+    def from_arrays(cls, spec: TaskSpec, cfg: dict[str, Any], W: np.ndarray, b: np.ndarray) -> "LinearPredictor":
+        p = cls(spec, l2=cfg.get("l2"), cat_cols=cfg.get("cat_cols"), cat_cards=cfg.get("cat_cards"))
+        p.in_dim = cfg["in_dim"]
+        p.temperature = cfg.get("temperature", 1.0)
+        p.fit_info = cfg.get("fit") or {}
+        p.W, p.b = np.array(W, dtype=np.float32), np.array(b, dtype=np.float32)
         return p
 
+    @classmethod
+    def load(cls, d: Path, spec: TaskSpec) -> "LinearPredictor":
+        d = Path(d)
+        cfg = json.loads((d / "linear.json").read_text(encoding="utf-8"))
+        with np.load(d / "linear.npz") as z:
+            return cls.from_arrays(spec, cfg, z["W"], z["b"])
+
 
 # ---------------------------------------------------------------------------
 # Rules baseline (what the agents implicitly assume today)
@@ -333,17 +886,23 @@ class RulesPredictor(Predictor):
             return np.log1p(np.clip(eta, 0, None)).astype(np.float32) if self.spec.log_target else eta.astype(np.float32)
         return np.full(n, float(self.constant), dtype=np.float32)
 
+    def config(self) -> dict[str, Any]:
+        return {
+            "constant": self.constant.tolist() if isinstance(self.constant, np.ndarray) else self.constant,
+            "eta_col": self.eta_col, "eta_mean": self.eta_mean, "eta_std": self.eta_std,
+        }
+
     def save(self, d: Path) -> None:
         d = Path(d)
         d.mkdir(parents=True, exist_ok=True)
-        (d / "rules.json").write_text(json.dumps({
-            "constant": self.constant.tolist() if isinstance(self.constant, np.ndarray) else self.constant,
-            "eta_col": self.eta_col, "eta_mean": self.eta_mean, "eta_std": self.eta_std,
-        }), encoding="utf-8")
+        (d / "rules.json").write_text(json.dumps(self.config()), encoding="utf-8")
 
     @classmethod
     def load(cls, d: Path, spec: TaskSpec) -> "RulesPredictor":
-        cfg = json.loads((Path(d) / "rules.json").read_text(encoding="utf-8"))
+        return cls.from_config(spec, json.loads((Path(d) / "rules.json").read_text(encoding="utf-8")))
+
+    @classmethod
+    def from_config(cls, spec: TaskSpec, cfg: dict[str, Any]) -> "RulesPredictor":
         p = cls(spec)
         p.constant = np.asarray(cfg["constant"], dtype=np.float32) if isinstance(cfg["constant"], list) else cfg["constant"]
         p.eta_col, p.eta_mean, p.eta_std = cfg.get("eta_col"), cfg.get("eta_mean", 0.0), cfg.get("eta_std", 1.0)
@@ -354,11 +913,24 @@ def make_predictor(backend: str, spec: TaskSpec, **kw) -> Predictor:
     if backend == "mlp":
         return MlpPredictor(spec, **kw)
     if backend == "gbdt":
-        return GbdtPredictor(spec, **{k: v for k, v in kw.items() if k in ("seed", "max_iter", "learning_rate")})
+        return GbdtPredictor(spec, **{k: v for k, v in kw.items() if k in ("seed", "max_iter", "learning_rate", "cat_cols", "cat_cards")})
+    if backend == "linear":
+        return LinearPredictor(spec, **{k: v for k, v in kw.items() if k in ("l2", "max_iter", "cat_cols", "cat_cards")})
     if backend == "rules":
         return RulesPredictor(spec)
     raise ValueError(f"unknown backend {backend}")
 
 
 def load_predictor(backend: str, d: Path, spec: TaskSpec) -> Predictor:
-    return {"mlp": MlpPredictor, "gbdt": GbdtPredictor, "rules": RulesPredictor}[backend].load(d, spec)
+    return {"mlp": MlpPredictor, "gbdt": GbdtPredictor, "linear": LinearPredictor, "rules": RulesPredictor}[backend].load(d, spec)
+
+
+def confidence(spec_kind: str, pred: np.ndarray, task_metrics: dict[str, Any]) -> np.ndarray:
+    """Per-row confidence of raw head output `pred` (shared by the service and offline scoring)."""
+    if spec_kind == "binary":
+        return np.clip(np.abs(pred - 0.5) * 2, 0, 1)
+    if spec_kind == "multiclass":
+        return np.clip(pred.max(axis=1), 0, 1)
+    # regression: shrink with the model's own p90 error relative to its prediction
+    p90 = float(task_metrics.get("metrics", {}).get("p90_abs_err", 0) or 0)
+    return np.clip(1 - p90 / np.clip(np.abs(pred) + 1e-6, 1, None), 0.05, 0.99)
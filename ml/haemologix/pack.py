@@ -0,0 +1,289 @@
+"""Packed single-file version artifact.
+
+    python -m haemologix.pack --version haemologix-model-1.2 [--model-dir ml/checkpoints] [--verify]
+
+`<version>/model.hpack` holds every task head of a version so the service loads
+it with one open + mmap instead of walking ~6 files and three deserialisers per
+task:
+
+    b"HXPACK01" | u64 index length | u32 index crc32 | index JSON | pad to 64
+    data blocks, each 64-byte aligned
+
+The index carries, per task, the backend, the preprocessor (everything
+`TabularPreprocessor` needs to transform — the serving plan), metrics, the
+rules-baseline config, and block descriptors {offset, nbytes, dtype, shape,
+crc32}. MLP weights are raw little-endian float32 blocks read straight from the
+map, like a linear head's weight matrix and bias; an accepted quantized MLP head
+and a GBDT estimator are stored as their serialised bytes, and a distilled
+student (distill.py) as raw float32 blocks next to its teacher. Every block's
+crc32 is checked at load, and `trained_at` per task must match
+model_card.json, so a pack left behind by a retrain into the same directory is
+ignored. The directory layout stays the source of truth; `train_version` packs
+after training and `LoadedModel.load` falls back to the directory whenever the
+pack is missing, stale or corrupt.
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import mmap
+import struct
+import sys
+import warnings
+import zlib
+from pathlib import Path
+from typing import Any
+
+import joblib
+import numpy as np
+import torch
+
+from .data import TabularPreprocessor
+from .models import GbdtPredictor, LinearPredictor, MlpPredictor, RulesPredictor, serving_quant
+from .tasks import TASKS, TaskSpec, get_task
+
+PACK_NAME = "model.hpack"
+MAGIC = b"HXPACK01"
+_HEAD = struct.Struct("<8sQI")
+_ALIGN = 64
+
+
+class PackError(ValueError):
+    """The pack is missing, malformed, stale or fails its checksum."""
+
+
+def _pad(n: int) -> int:
+    return (-n) % _ALIGN
+
+
+class _Writer:
+    def __init__(self) -> None:
+        self.blocks: list[bytes] = []
+        self.offset = 0
+
+    def add(self, data: bytes, **meta: Any) -> dict[str, Any]:
+        desc = {"offset": self.offset, "nbytes": len(data), "crc32": zlib.crc32(data)} | meta
+        self.blocks.append(data + b"\0" * _pad(len(data)))
+        self.offset += len(data) + _pad(len(data))
+        return desc
+
+    def array(self, a: np.ndarray) -> dict[str, Any]:
+        a = np.ascontiguousarray(a).astype(a.dtype.newbyteorder("<"), copy=False)
+        return self.add(a.tobytes(), dtype=a.dtype.str, shape=list(a.shape))
+
+
+def _linear_blocks(w: _Writer, d: Path) -> dict[str, Any]:
+    with np.load(d / "linear.npz") as z:
+        return {"linear": json.loads((d / "linear.json").read_text(encoding="utf-8")),
+                "arrays": {k: w.array(z[k].astype(np.float32)) for k in ("W", "b")}}
+
+
+def pack_version(version_dir: Path) -> Path:
+    """Write `<version_dir>/model.hpack` from the directory layout; returns its path."""
+    version_dir = Path(version_dir)
+    card = json.loads((version_dir / "model_card.json").read_text(encoding="utf-8"))
+    w = _Writer()
+    tasks: dict[str, Any] = {}
+    for name in TASKS:
+        td = version_dir / name
+        if not (td / "backend.txt").exists():
+            continue
+        backend = (td / "backend.txt").read_text(encoding="utf-8").strip()
+        metrics = json.loads((td / "metrics.json").read_text(encoding="utf-8")) if (td / "metrics.json").exists() else {}
+        entry: dict[str, Any] = {
+            "backend": backend,
+            "trained_at": (card.get("tasks", {}).get(name) or {}).get("trained_at"),
+            "preprocessor": json.loads((td / "preprocessor.json").read_text(encoding="utf-8")),
+            "metrics": metrics,
+        }
+        if (td / "rules_baseline" / "rules.json").exists():
+            entry["rules"] = json.loads((td / "rules_baseline" / "rules.json").read_text(encoding="utf-8"))
+        if backend == "mlp":
+            state = torch.load(td / "mlp.pt", map_location="cpu")
+            entry["mlp"] = json.loads((td / "mlp.json").read_text(encoding="utf-8"))
+            entry["tensors"] = {k: w.array(v.detach().cpu().numpy().astype(np.float32)) for k, v in state.items()}
+            mode = (entry["mlp"].get("quantized") or {}).get("mode")
+            if (entry["mlp"].get("quantized") or {}).get("accepted") and (td / f"mlp_{mode}.pt").exists():
+                entry["quant"] = w.add((td / f"mlp_{mode}.pt").read_bytes())  # torch-serialised (int8 packs its own params)
+        elif backend == "gbdt":
+            entry["gbdt"] = w.add((td / "gbdt.joblib").read_bytes())
+            if (td / "gbdt_importance.npy").exists():
+                entry["importance"] = w.array(np.load(td / "gbdt_importance.npy"))
+        elif backend == "linear":
+            entry |= _linear_blocks(w, td)
+        elif backend != "rules":
+            raise PackError(f"{name}: cannot pack backend {backend!r}")
+        sd = td / "student"
+        if (metrics.get("distillation") or {}).get("accepted") and (sd / "backend.txt").exists():
+            sb = (sd / "backend.txt").read_text(encoding="utf-8").strip()
+            if sb == "mlp":
+                entry["student"] = {"backend": sb, "mlp": json.loads((sd / "mlp.json").read_text(encoding="utf-8")),
+                                    "tensors": {k: w.array(v.detach().cpu().numpy().astype(np.float32))
+                                                for k, v in torch.load(sd / "mlp.pt", map_location="cpu").items()}}
+            elif sb == "linear":
+                entry["student"] = {"backend": sb} | _linear_blocks(w, sd)
+            else:
+                raise PackError(f"{name}: cannot pack student backend {sb!r}")
+        tasks[name] = entry
+    index = json.dumps({"format": 1, "version": card.get("version", version_dir.name), "tasks": tasks}).encode("utf-8")
+    head = _HEAD.pack(MAGIC, len(index), zlib.crc32(index))
+    out = version_dir / PACK_NAME
+    tmp = out.with_suffix(".tmp")
+    with tmp.open("wb") as fh:
+        fh.write(head + index + b"\0" * _pad(len(head) + len(index)))
+        for b in w.blocks:
+            fh.write(b)
+    tmp.replace(out)
+    return out
+
+
+class PackReader:
+    """Memory-mapped view of a pack; blocks are checksummed as they are read."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with self.path.open("rb") as fh:
+            self._mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mm) < _HEAD.size:
+            raise PackError(f"{path}: truncated")
+        magic, n, crc = _HEAD.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise PackError(f"{path}: not a pack (magic {magic!r})")
+        raw = self._mm[_HEAD.size:_HEAD.size + n]
+        if zlib.crc32(raw) != crc:
+            raise PackError(f"{path}: index checksum mismatch")
+        self.index: dict[str, Any] = json.loads(raw)
+        self._base = _HEAD.size + n + _pad(_HEAD.size + n)
+
+    def _view(self, desc: dict[str, Any]) -> memoryview:
+        start = self._base + desc["offset"]
+        view = memoryview(self._mm)[start:start + desc["nbytes"]]
+        if len(view) != desc["nbytes"] or zlib.crc32(view) != desc["crc32"]:
+            raise PackError(f"{self.path}: block at {desc['offset']} fails its checksum")
+        return view
+
+    def array(self, desc: dict[str, Any]) -> np.ndarray:
+        return np.frombuffer(self._view(desc), dtype=np.dtype(desc["dtype"])).reshape(desc["shape"])
+
+    def blob(self, desc: dict[str, Any]) -> bytes:
+        return bytes(self._view(desc))
+
+    def close(self) -> None:
+        try:
+            self._mm.close()
+        except BufferError:  # an array still views the map; it is unmapped when that array goes away
+            pass
+
+
+def _packed_mlp(r: PackReader, spec: TaskSpec, entry: dict[str, Any]) -> MlpPredictor:
+    with warnings.catch_warnings():  # read-only map; load_state_dict copies into the parameters
+        warnings.simplefilter("ignore", UserWarning)
+        state = {k: torch.from_numpy(r.array(d)) for k, d in entry["tensors"].items()}
+    return MlpPredictor.from_state(spec, entry["mlp"], state)  # parameters own copies; the views die here
+
+
+def _packed_linear(r: PackReader, spec: TaskSpec, entry: dict[str, Any]) -> LinearPredictor:
+    return LinearPredictor.from_arrays(spec, entry["linear"], r.array(entry["arrays"]["W"]), r.array(entry["arrays"]["b"]))  # copies
+
+
+def load_packed_tasks(version_dir: Path, card: dict[str, Any], tasks: list[str] | None = None) -> dict[str, Any]:
+    """task → LoadedTask from `model.hpack`; raises PackError if it cannot be trusted."""
+    from .registry import LoadedTask, serving_student  # registry imports this module; avoid the cycle at import time
+
+    path = Path(version_dir) / PACK_NAME
+    if not path.exists():
+        raise PackError(f"{path}: missing")
+    r = PackReader(path)
+    try:
+        out: dict[str, Any] = {}
+        packed = r.index.get("tasks", {})
+        for name, entry in packed.items():
+            if (card.get("tasks", {}).get(name) or {}).get("trained_at") != entry.get("trained_at"):
+                raise PackError(f"{path}: {name} is stale (retrained after packing)")
+            if tasks is not None and name not in tasks:
+                continue
+            spec = get_task(name)
+            backend = entry["backend"]
+            pre = TabularPreprocessor.from_dict(entry["preprocessor"])
+            if backend == "mlp" and "quant" in entry and serving_quant(entry["mlp"]):
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")
+                    state = torch.load(io.BytesIO(r.blob(entry["quant"])), map_location="cpu")
+                predictor = MlpPredictor.from_state(spec, entry["mlp"], state, quant=serving_quant(entry["mlp"]))
+            elif backend == "mlp":
+                predictor: Any = _packed_mlp(r, spec, entry)
+            elif backend == "gbdt":
+                imp = np.array(r.array(entry["importance"])) if "importance" in entry else None
+                predictor = GbdtPredictor.from_estimator(spec, joblib.load(io.BytesIO(r.blob(entry["gbdt"]))), imp)
+            elif backend == "linear":
+                predictor = _packed_linear(r, spec, entry)
+            else:
+                predictor = RulesPredictor.from_config(spec, entry["rules"])
+            rules = RulesPredictor.from_config(spec, entry["rules"]) if "rules" in entry else None
+            out[name] = LoadedTask(spec, pre, predictor, backend, entry.get("metrics", {}), rules)
+            if "student" in entry and serving_student(entry.get("metrics", {})):
+                student = entry["student"]
+                out[name].with_student((_packed_linear if student["backend"] == "linear" else _packed_mlp)(r, spec, student))
+        trained = {t for t, res in card.get("tasks", {}).items() if res.get("trained_at") and (Path(version_dir) / t / "backend.txt").exists()}
+        if trained - set(packed):
+            raise PackError(f"{path}: missing tasks {sorted(trained - set(packed))}")
+        return out
+    finally:
+        r.close()
+
+
+def _probe_features(pre: TabularPreprocessor, n: int, rng: np.random.Generator) -> list[dict[str, Any]]:
+    """`n` feature dicts the preprocessor can score: numerics around their training mean, every
+    vocabulary value (plus an unseen one) for categoricals, so code columns hold valid codes or NaN."""
+    rows: list[dict[str, Any]] = [{} for _ in range(n)]
+    for c in pre.numeric_cols:
+        for r, v in zip(rows, rng.normal(pre.num_mean[c], pre.num_std[c], n)):
+            r[c] = float(v)
+    for b in pre.bool_cols:
+        for r, v in zip(rows, rng.random(n) < 0.5):
+            r[b] = bool(v)
+    for c in pre.cat_cols:
+        values = pre.cat_vocab[c] + ["<unseen>"]
+        for r, j in zip(rows, rng.integers(0, len(values), n)):
+            r[c] = values[j]
+    return rows
+
+
+def verify_pack(version_dir: Path, rows: int = 16, seed: int = 0) -> list[str]:
+    """Tasks whose packed head answers differently from the directory layout on synthetic rows."""
+    from .registry import LoadedModel, ModelCard
+
+    packed, plain = load_packed_tasks(version_dir, ModelCard.load(version_dir)), LoadedModel.load(version_dir, packed=False)
+    rng = np.random.default_rng(seed)
+    bad = []
+    for t, lt in plain.tasks.items():
+        X = lt.pre.transform_features(_probe_features(lt.pre, rows, rng))
+        if t not in packed or not np.allclose(lt.predictor.predict(X), packed[t].predictor.predict(X), atol=1e-6, equal_nan=True):
+            bad.append(t)
+    return bad
+
+
+def main(argv: list[str] | None = None) -> int:
+    from .registry import resolve_model_dir
+
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--version", required=True)
+    ap.add_argument("--model-dir", default=None)
+    ap.add_argument("--verify", action="store_true", help="load the pack and compare it with the directory layout")
+    a = ap.parse_args(argv)
+    vd = resolve_model_dir(Path(a.model_dir) if a.model_dir else None) / a.version
+    p = pack_version(vd)
+    print(f"[pack] {p} ({p.stat().st_size / 1e6:.1f} MB)")
+    if a.verify:
+        bad = verify_pack(vd)
+        if bad:
+            print(f"[pack] {p}: packed heads disagree with the directories for {bad}", file=sys.stderr)
+            return 1
+        print(f"[pack] verified {p}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""Asynchronous prediction log for later harvesting.
+
+The request path only appends finished records to a bounded in-memory buffer;
+a daemon thread drains it in bulk into gzip-compressed JSONL segments
+
+    $ML_PREDICTION_LOG_DIR/predictions-<utc start>-<pid>-<seq>.jsonl.gz
+
+one record per scored row:
+
+    {"ts", "version", "task", "ref", "features", "prediction", "confidence", "backend", "latencyMs", "raw"?}
+
+`raw` is the head's output before the calibration overlay (calib.py), present
+only when the overlay changed the prediction.
+
+Segments rotate once their compressed size passes `ML_PREDICTION_LOG_SEGMENT_MB`.
+When the buffer is full (writer behind, disk slow) new records are dropped and
+counted — logging never blocks or fails a prediction.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, BinaryIO
+
+
+class PredictionLog:
+    def __init__(self, directory: Path, max_queue: int = 20_000, segment_bytes: int = 64 << 20, flush_every_s: float = 1.0):
+        self.directory = Path(directory)
+        self.max_queue = max_queue
+        self.segment_bytes = segment_bytes
+        self.flush_every_s = flush_every_s
+        self.written = 0
+        self.dropped = 0
+        self.segments = 0
+        self.errors = 0
+        self._buf: deque[dict[str, Any]] = deque()
+        self._cv = threading.Condition()
+        self._closed = False
+        self._raw: BinaryIO | None = None
+        self._gz: gzip.GzipFile | None = None
+        self._stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        self._thread = threading.Thread(target=self._run, name="prediction-log", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_env(cls) -> "PredictionLog | None":
+        d = os.environ.get("ML_PREDICTION_LOG_DIR", "").strip()
+        if not d:
+            return None
+        return cls(
+            Path(d),
+            max_queue=int(os.environ.get("ML_PREDICTION_LOG_QUEUE", "20000")),
+            segment_bytes=int(float(os.environ.get("ML_PREDICTION_LOG_SEGMENT_MB", "64")) * (1 << 20)),
+        )
+
+    # -- request path ----------------------------------------------------------
+
+    def log(self, records: list[dict[str, Any]]) -> int:
+        """Enqueue records; returns how many were accepted (the rest are dropped)."""
+        with self._cv:
+            if self._closed:
+                self.dropped += len(records)
+                return 0
+            room = max(0, self.max_queue - len(self._buf))
+            accepted = records[:room]
+            self._buf.extend(accepted)
+            self.dropped += len(records) - len(accepted)
+            if len(self._buf) >= self.max_queue // 2:
+                self._cv.notify()
+        return len(accepted)
+
+    def stats(self) -> dict[str, Any]:
+        return {"dir": str(self.directory), "queued": len(self._buf), "written": self.written, "dropped": self.dropped,
+                "segments": self.segments, "errors": self.errors}
+
+    def close(self, timeout: float = 5.0) -> None:
+        with self._cv:
+            self._closed = True
+            self._cv.notify()
+        self._thread.join(timeout)
+
+    # -- writer thread ---------------------------------------------------------
+
+    def _run(self) -> None:
+        while True:
+            with self._cv:
+                if not self._buf and not self._closed:
+                    self._cv.wait(self.flush_every_s)
+                batch = list(self._buf)
+                self._buf.clear()
+                closing = self._closed
+            if batch:
+                self._write(batch)
+            if closing:
+                self._close_segment()
+                return
+
+    def _write(self, batch: list[dict[str, Any]]) -> None:
+        try:
+            gz = self._segment()
+            gz.write("".join(json.dumps(r, separators=(",", ":"), default=str) + "\n" for r in batch).encode("utf-8"))
+            gz.flush()
+            self.written += len(batch)
+            assert self._raw is not None
+            if self._raw.tell() >= self.segment_bytes:
+                self._close_segment()
+        except Exception:  # disk trouble: count it, drop the batch, retry on a fresh segment next time
+            self.errors += 1
+            self.dropped += len(batch)
+            self._close_segment()
+
+    def _segment(self) -> gzip.GzipFile:
+        if self._gz is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self.segments += 1
+            self._raw = (self.directory / f"predictions-{self._stamp}-{os.getpid()}-{self.segments:05d}.jsonl.gz").open("ab")
+            self._gz = gzip.GzipFile(fileobj=self._raw, mode="ab")
+        return self._gz
+
+    def _close_segment(self) -> None:
+        for f in (self._gz, self._raw):
+            try:
+                if f is not None:
+                    f.close()
+            except OSError:
+                pass
+        self._gz = self._raw = None
+
+
+def make_records(version: str, latency_ms: float, rows: list[tuple[dict[str, Any], Any]],
+                 raw: list[Any] | None = None) -> list[dict[str, Any]]:
+    """(resolved features, result) pairs from /predict/batch → log records; `raw[i]` (pre-calibration
+    output, or None) is added to row i when given."""
+    ts = time.time()
+    out = [
+        {"ts": ts, "version": version, "task": res.task, "ref": res.ref, "features": features,
+         "prediction": res.prediction, "confidence": res.confidence, "backend": res.backend, "latencyMs": latency_ms}
+        for features, res in rows
+    ]
+    for rec, r in zip(out, raw or []):
+        if r is not None:
+            rec["raw"] = r
+    return out
+
+
+def iter_log(directory: Path):
+    """Read back every record from a log directory, oldest segment first (for the harvester / tests)."""
+    for p in sorted(Path(directory).glob("predictions-*.jsonl.gz")):
+        with gzip.open(p, "rt", encoding="utf-8") as fh:
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
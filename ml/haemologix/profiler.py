@@ -0,0 +1,150 @@
+"""In-process sampling profiler behind `GET /debug/profile`.
+
+    curl -H "X-ML-Secret: $S" 'localhost:8000/debug/profile?seconds=10&format=collapsed' > api.folded
+    flamegraph.pl api.folded > api.svg        # or drop the file on speedscope.app
+
+Nothing runs until a profile is asked for. Then a daemon thread wakes every
+`intervalMs`, reads every other thread's Python stack from `sys._current_frames()`
+and counts it; the workers are never paused or instrumented, so the cost is one
+stack walk per thread per tick, on the sampler's own time slice. One profile
+runs at a time per worker.
+
+Frames are `module:qualname`, rooted at the thread name (`ml-head-0`,
+`prediction-log`, `MainThread` …). Native code cannot be walked from Python, so
+when the innermost Python frame belongs to torch / sklearn / numpy / scipy /
+joblib the stack gets a synthetic `[native <package>]` leaf: time spent inside
+their kernels shows up under the call that entered them.
+
+Samples are attributed to a task when the stack passes through a frame that
+scores one (the service's per-task `score` coroutine and `_run_head`,
+`score_lines` offline) — read from that frame's `task` / `lt` locals. Idle
+samples (leaf waiting on a condition, a selector or a queue) are dropped unless
+`idle=true`.
+
+    format=json       {seconds, intervalMs, ticks, samples, idleSamples, threads, top, tasks:{task: {samples, top}},
+                       collapsed}    top = [{function, self, total}] by self samples
+    format=collapsed  text/plain "frame;frame;… count" lines (flamegraph.pl / speedscope)
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from collections import Counter
+from types import FrameType
+from typing import Any
+
+NATIVE = ("torch", "sklearn", "numpy", "scipy", "joblib")
+#: (module, function) leaves that mean the thread is waiting, not working
+IDLE_LEAVES = {("threading", "Condition.wait"), ("threading", "Event.wait"), ("selectors", "EpollSelector.select"),
+               ("selectors", "KqueueSelector.select"), ("selectors", "PollSelector.select"),
+               ("selectors", "SelectSelector.select"), ("queue", "Queue.get"), ("concurrent.futures.thread", "_worker")}
+#: frames whose locals name the task being scored
+TASK_FRAMES = {"_run_head", "predict_batch.<locals>.score", "score_lines"}
+TOP = 15
+
+_busy = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """Another profile is already running in this worker."""
+
+
+def _label(f: FrameType) -> tuple[str, str]:
+    code = f.f_code
+    return f.f_globals.get("__name__", "?"), getattr(code, "co_qualname", code.co_name)
+
+
+def _task_of(f: FrameType) -> str | None:
+    loc = f.f_locals
+    task = loc.get("task")
+    if isinstance(task, str):
+        return task
+    spec = getattr(loc.get("lt"), "spec", None)
+    return getattr(spec, "name", None)
+
+
+def _walk(leaf: FrameType) -> tuple[list[tuple[str, str]], str | None]:
+    """(root → leaf frame labels, innermost task being scored)."""
+    frames: list[tuple[str, str]] = []
+    task = None
+    f: FrameType | None = leaf
+    while f is not None:
+        mod, fn = _label(f)
+        frames.append((mod, fn))
+        if task is None and fn in TASK_FRAMES and mod.startswith("haemologix."):
+            task = _task_of(f)
+        f = f.f_back
+    frames.reverse()
+    return frames, task
+
+
+def sample(seconds: float, interval_s: float = 0.005, idle: bool = False) -> dict[str, Any]:
+    """Sample every other thread's stack for `seconds`; raises ProfilerBusy if a profile is running."""
+    if not _busy.acquire(blocking=False):
+        raise ProfilerBusy("a profile is already running")
+    try:
+        me = threading.get_ident()
+        stacks: Counter[tuple[str | None, tuple[str, ...]]] = Counter()
+        ticks = idle_n = 0
+        names: dict[int, str] = {}
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            t0 = time.perf_counter()
+            ticks += 1
+            for ident, leaf in sys._current_frames().items():
+                if ident == me:
+                    continue
+                frames, task = _walk(leaf)
+                if frames and frames[-1] in IDLE_LEAVES and not idle:
+                    idle_n += 1
+                    continue
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate() if t.ident is not None}
+                labels = [names.get(ident, f"thread-{ident}")] + [f"{m}:{fn}" for m, fn in frames]
+                pkg = frames[-1][0].split(".")[0] if frames else ""
+                if pkg in NATIVE:
+                    labels.append(f"[native {pkg}]")
+                stacks[(task, tuple(labels))] += 1
+            del leaf
+            time.sleep(max(0.0, interval_s - (time.perf_counter() - t0)))
+        return summarize(stacks, seconds, interval_s, ticks, idle_n)
+    finally:
+        _busy.release()
+
+
+def _top(stacks: Counter[tuple[str | None, tuple[str, ...]]]) -> list[dict[str, Any]]:
+    self_n: Counter[str] = Counter()
+    total_n: Counter[str] = Counter()
+    for (_, labels), n in stacks.items():
+        frames = labels[1:]  # drop the thread root
+        if frames:
+            self_n[frames[-1]] += n
+        for fn in set(frames):
+            total_n[fn] += n
+    return [{"function": fn, "self": n, "total": total_n[fn]} for fn, n in self_n.most_common(TOP)]
+
+
+def collapsed(stacks: Counter[tuple[str | None, tuple[str, ...]]]) -> str:
+    """Brendan Gregg's folded format, one `a;b;c count` line per distinct stack."""
+    folded: Counter[str] = Counter()
+    for (_, labels), n in stacks.items():
+        folded[";".join(labels)] += n
+    return "".join(f"{k} {n}\n" for k, n in sorted(folded.items()))
+
+
+def summarize(stacks: Counter[tuple[str | None, tuple[str, ...]]], seconds: float, interval_s: float, ticks: int,
+              idle_n: int) -> dict[str, Any]:
+    by_task: dict[str, Counter[tuple[str | None, tuple[str, ...]]]] = {}
+    for key, n in stacks.items():
+        if key[0] is not None:
+            by_task.setdefault(key[0], Counter())[key] = n
+    return {
+        "seconds": seconds, "intervalMs": round(interval_s * 1000, 3), "ticks": ticks,
+        "samples": sum(stacks.values()), "idleSamples": idle_n,
+        "threads": sorted({labels[0] for _, labels in stacks}),
+        "top": _top(stacks),
+        "tasks": {t: {"samples": sum(c.values()), "top": _top(c)} for t, c in sorted(by_task.items())},
+        "collapsed": collapsed(stacks),
+    }
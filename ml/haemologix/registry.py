@@ -5,25 +5,37 @@
         model_card.json                version, tasks, dataset lineage, metrics, limitations
         <task>/
           preprocessor.json
-          backend.txt                  mlp | gbdt | rules
-          mlp.pt + mlp.json  |  gbdt.joblib  |  rules.json
+          backend.txt                  mlp | gbdt | linear | rules
+          mlp.pt + mlp.json  |  gbdt.joblib  |  linear.npz + linear.json  |  rules.json
+          rules_baseline/rules.json    the task's rules baseline (served as the fallback)
+          student/                     optional distilled student of a GBDT head (distill.py), served
+                                       in its place unless ML_DISTILLED=0
           metrics.json
+        model.hpack                    optional packed copy of all heads (pack.py), preferred at load
+        calibration/overlay-<seq>.json optional outcome-fed calibration revisions (calib.py)
       active                           text file containing the active version name
+      index.json                       derived listing (status, tasks, backends, artifact bytes, load
+                                       seconds per version); written by train / activate only, patched
+                                       in memory by readers when stale (not tracked by git)
 
 The DB (CustomModel) mirrors model_card.json for the app; the disk is the source
-of truth for what the API serves. `ML_ACTIVE_VERSION` env overrides the pointer.
+of truth for what the API serves. `ML_ACTIVE_VERSION` env overrides the pointer;
+`ML_TASKS` (comma list) makes the service load only those heads (one shard of a
+task-sharded deployment, see router.py).
 """
 
 from __future__ import annotations
 
 import json
 import os
+import time
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
 from .data import TabularPreprocessor
-from .models import Predictor, load_predictor
+from .models import Predictor, RulesPredictor, load_predictor
+from .pack import PACK_NAME, PackError, load_packed_tasks
 from .tasks import TASKS, TaskSpec, get_task
 
 def default_model_dir() -> Path:
@@ -72,12 +84,38 @@ class ModelCard(dict):
 
 
 class LoadedTask:
-    def __init__(self, spec: TaskSpec, pre: TabularPreprocessor, predictor: Predictor, backend: str, metrics: dict[str, Any]):
+    def __init__(self, spec: TaskSpec, pre: TabularPreprocessor, predictor: Predictor, backend: str, metrics: dict[str, Any],
+                 rules: RulesPredictor | None = None):
         self.spec = spec
         self.pre = pre
         self.predictor = predictor
         self.backend = backend
         self.metrics = metrics
+        self.rules = rules  # the task's rules baseline: the service's degraded path when the head is late or fails
+        self.teacher: Predictor | None = None  # set when `predictor` is a distilled student: the head it was distilled from
+        self.teacher_backend: str | None = None
+        self.teacher_metrics: dict[str, Any] | None = None
+
+    def with_student(self, student: Predictor) -> "LoadedTask":
+        """Serve `student` (see distill.py) and keep the current head as its teacher; metrics for
+        confidence become the student's own test metrics."""
+        self.teacher, self.teacher_backend, self.teacher_metrics = self.predictor, self.backend, self.metrics
+        self.predictor, self.backend = student, student.backend
+        self.metrics = self.metrics | {"metrics": self.metrics["distillation"]["metrics"]}
+        return self
+
+
+def serving_tasks() -> list[str] | None:
+    """The `ML_TASKS` allow-list of heads this service instance loads; None = every task."""
+    raw = os.environ.get("ML_TASKS", "").strip()
+    if not raw or raw == "*":
+        return None
+    return [get_task(t.strip()).name for t in raw.split(",") if t.strip()]
+
+
+def serving_student(metrics: dict[str, Any]) -> bool:
+    """Whether a task's accepted distilled student should answer instead of its teacher."""
+    return bool((metrics.get("distillation") or {}).get("accepted")) and os.environ.get("ML_DISTILLED", "1").strip() != "0"
 
 
 class LoadedModel:
@@ -90,11 +128,23 @@ class LoadedModel:
         self.tasks = tasks
 
     @classmethod
-    def load(cls, version_dir: Path) -> "LoadedModel":
+    def load(cls, version_dir: Path, packed: bool | None = None, tasks: list[str] | None = None) -> "LoadedModel":
+        """Load from `model.hpack` when present and valid (`packed=None`: unless ML_PACKED=0),
+        else from the per-task directories. `tasks` restricts loading to those heads."""
         version_dir = Path(version_dir)
         card = ModelCard.load(version_dir)
-        tasks: dict[str, LoadedTask] = {}
+        if packed is None:
+            packed = os.environ.get("ML_PACKED", "1").strip() != "0"
+        if packed:
+            try:
+                return cls(card.get("version", version_dir.name), version_dir, card, load_packed_tasks(version_dir, card, tasks))
+            except PackError as e:
+                if (version_dir / PACK_NAME).exists():
+                    print(f"[registry] ignoring pack: {e}")
+        loaded: dict[str, LoadedTask] = {}
         for name in TASKS:
+            if tasks is not None and name not in tasks:
+                continue
             td = version_dir / name
             if not (td / "backend.txt").exists():
                 continue
@@ -103,32 +153,155 @@ class LoadedModel:
             pre = TabularPreprocessor.load(td / "preprocessor.json")
             predictor = load_predictor(backend, td, spec)
             metrics = json.loads((td / "metrics.json").read_text(encoding="utf-8")) if (td / "metrics.json").exists() else {}
-            tasks[name] = LoadedTask(spec, pre, predictor, backend, metrics)
-        return cls(card.get("version", version_dir.name), version_dir, card, tasks)
+            rules = RulesPredictor.load(td / "rules_baseline", spec) if (td / "rules_baseline" / "rules.json").exists() else None
+            loaded[name] = LoadedTask(spec, pre, predictor, backend, metrics, rules)
+            if serving_student(metrics) and (td / "student" / "backend.txt").exists():
+                sb = (td / "student" / "backend.txt").read_text(encoding="utf-8").strip()
+                loaded[name].with_student(load_predictor(sb, td / "student", spec))
+        return cls(card.get("version", version_dir.name), version_dir, card, loaded)
 
 
-def list_versions(model_dir: Path | None = None) -> list[dict[str, Any]]:
+# ---------------------------------------------------------------------------
+# Registry index + in-process listing cache
+# ---------------------------------------------------------------------------
+
+INDEX_NAME = "index.json"
+_LISTED = ("version", "status", "createdAt", "tasks", "datasetVersion", "backends", "artifactBytes", "packed", "loadSeconds")
+_cache: dict[Path, dict[str, Any]] = {}
+
+
+def _poll_seconds() -> float:
+    return float(os.environ.get("ML_REGISTRY_POLL_S", "2"))
+
+
+def _mtime(p: Path) -> int | None:
+    try:
+        return p.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def _version_entry(d: Path, prev: dict[str, Any] | None = None, sizes: bool = True) -> dict[str, Any]:
+    card = ModelCard.load(d)
+    tasks = card.get("tasks", {})
+    e = {
+        "version": card.get("version", d.name), "status": card.get("status"), "createdAt": card.get("createdAt"),
+        "tasks": sorted(tasks.keys()), "datasetVersion": card.get("datasetVersion"),
+        "backends": {t: r["backend"] for t, r in tasks.items() if r.get("backend")},
+        "packed": (d / PACK_NAME).exists(),
+        "cardMtimeNs": _mtime(d / "model_card.json"),
+    }
+    if sizes:  # walks every artifact file: writers only, never a request
+        e["artifactBytes"] = sum(f.stat().st_size for f in d.rglob("*") if f.is_file())
+    if prev and prev.get("loadSeconds") is not None:
+        e["loadSeconds"] = prev["loadSeconds"]
+    return e
+
+
+def _read_index(root: Path) -> dict[str, Any]:
+    try:
+        return json.loads((root / INDEX_NAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {"versions": {}}
+
+
+def _write_index(root: Path, index: dict[str, Any]) -> None:
+    index["updatedAt"] = now_iso()
+    try:
+        tmp = root / (INDEX_NAME + ".tmp")
+        tmp.write_text(json.dumps(index, indent=2), encoding="utf-8")
+        tmp.replace(root / INDEX_NAME)
+    except OSError:  # read-only image: the in-process cache still works
+        pass
+
+
+def _version_dirs(root: Path) -> dict[str, Path]:
+    return {d.name: d for d in sorted(root.iterdir()) if d.is_dir() and (d / "model_card.json").exists()}
+
+
+def _refresh_entries(root: Path, entries: dict[str, Any], version: str | None = None,
+                     sizes: bool = True) -> dict[str, Any]:
+    """`entries` with vanished versions dropped and `version` plus every new or re-carded one rebuilt."""
+    dirs = _version_dirs(root) if root.exists() else {}
+    out = {n: e for n, e in entries.items() if n in dirs}
+    for name, d in dirs.items():
+        prev = out.get(name)
+        if name == version or prev is None or prev.get("cardMtimeNs") != _mtime(d / "model_card.json"):
+            out[name] = _version_entry(d, prev, sizes=sizes)
+    return out
+
+
+def update_index(model_dir: Path | None = None, version: str | None = None, load_seconds: float | None = None) -> dict[str, Any]:
+    """Refresh `index.json` (one version, or every stale entry) and drop the listing cache. Only the
+    writers call this (train_version, set_active_version); reads never write."""
     root = resolve_model_dir(model_dir)
-    out = []
+    index = _read_index(root)
+    entries = _refresh_entries(root, index.get("versions", {}), version)
+    if version in entries and load_seconds is not None:
+        entries[version]["loadSeconds"] = round(load_seconds, 3)
+    index["versions"] = entries
+    index["active"] = _read_active(root)
+    if root.exists():
+        _write_index(root, index)
+    _cache.pop(root, None)
+    return index
+
+
+def _read_active(root: Path) -> str | None:
+    try:
+        return (root / "active").read_text(encoding="utf-8").strip() or None
+    except OSError:
+        return None
+
+
+def _registry_view(root: Path) -> dict[str, Any]:
+    """Cached {versions, active}. Re-validated at most every ML_REGISTRY_POLL_S seconds by stat-ing
+    the root, `active`, `index.json` and each model card — edits by the TS scripts show up within one
+    poll; in-process writes (train_version, set_active_version) invalidate immediately. A missing or
+    stale `index.json` is patched in memory only (without artifactBytes, which only the writers
+    measure), so listing never writes into the checkpoint dir. The active pointer itself is read
+    uncached by `get_active_version`."""
+    now = time.monotonic()
+    hit = _cache.get(root)
+    if hit and now - hit["checkedAt"] < _poll_seconds():
+        return hit
     if not root.exists():
-        return out
-    for d in sorted(root.iterdir()):
-        if d.is_dir() and (d / "model_card.json").exists():
-            card = ModelCard.load(d)
-            out.append({"version": card.get("version", d.name), "status": card.get("status"), "createdAt": card.get("createdAt"),
-                        "tasks": sorted(card.get("tasks", {}).keys()), "datasetVersion": card.get("datasetVersion")})
-    return out
+        return {"versions": [], "active": None, "checkedAt": now}
+    dirs = _version_dirs(root)
+    cards = {n: _mtime(d / "model_card.json") for n, d in dirs.items()}
+    fingerprint = lambda: (_mtime(root), _mtime(root / "active"), _mtime(root / INDEX_NAME), tuple(cards.items()))  # noqa: E731
+    fp = fingerprint()
+    if hit and hit["fingerprint"] == fp:
+        hit["checkedAt"] = now
+        return hit
+    entries = _read_index(root).get("versions", {})
+    if set(entries) != set(dirs) or any(entries[n].get("cardMtimeNs") != m for n, m in cards.items()):
+        # start from what this process already patched so a stale file costs one rebuild, not one per poll
+        known = hit["entries"] if hit else {}
+        fresh = {n: e for n, e in entries.items() if e.get("cardMtimeNs") == cards.get(n)}
+        entries = _refresh_entries(root, known | fresh, sizes=False)
+    view = {
+        "versions": [{k: entries[n].get(k) for k in _LISTED if k in entries[n]} for n in dirs],
+        "active": _read_active(root),
+        "entries": entries,
+        "fingerprint": fp,
+        "checkedAt": now,
+    }
+    _cache[root] = view
+    return view
+
+
+def list_versions(model_dir: Path | None = None) -> list[dict[str, Any]]:
+    return _registry_view(resolve_model_dir(model_dir))["versions"]
 
 
 def get_active_version(model_dir: Path | None = None) -> str | None:
+    """The served version: ML_ACTIVE_VERSION, else the `active` pointer — always read from disk,
+    never from the listing cache, so `/reload` right after activateModel sees the new pointer."""
     env = os.environ.get("ML_ACTIVE_VERSION", "").strip()
     if env:
         return env
-    p = resolve_model_dir(model_dir) / "active"
-    if p.exists():
-        v = p.read_text(encoding="utf-8").strip()
-        return v or None
-    return None
+    return _read_active(resolve_model_dir(model_dir))
 
 
 def set_active_version(version: str, model_dir: Path | None = None) -> None:
@@ -140,11 +313,12 @@ def set_active_version(version: str, model_dir: Path | None = None) -> None:
     card["status"] = "active"
     card["activatedAt"] = now_iso()
     card.save(root / version)
+    update_index(root, version)
 
 
-def load_active(model_dir: Path | None = None) -> LoadedModel | None:
+def load_active(model_dir: Path | None = None, tasks: list[str] | None = None) -> LoadedModel | None:
     v = get_active_version(model_dir)
     if not v:
         return None
     d = resolve_model_dir(model_dir) / v
-    return LoadedModel.load(d) if (d / "model_card.json").exists() else None
+    return LoadedModel.load(d, tasks=tasks) if (d / "model_card.json").exists() else None
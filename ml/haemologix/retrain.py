@@ -1,11 +1,15 @@
 """Controlled retraining pipeline.
 
     python -m haemologix.retrain --version haemologix-model-1.1 \
-        --sim ml/data/sim/v1 [--real ml/data/real/v1] [--min-real-rows 200] [--max-rows 400000]
+        --sim ml/data/sim/v1 [--real ml/data/real/v1] [--min-real-rows 200] [--max-rows 400000] [--ingest-jobs N] \
+        [--warm-start [--warm-compare]] [--distill auto|mlp|linear]
 
 Steps (plan §11): validated data → training → offline evaluation vs rules baseline
 AND vs the currently active version → model card. It never activates anything;
 that is a human step (scripts/ml/approveModel.ts + activateModel.ts).
+`--warm-start` fine-tunes each task from the active version's head (warm.py)
+instead of fitting from scratch; `--distill` adds a student head for GBDT winners
+(distill.py).
 """
 
 from __future__ import annotations
@@ -16,15 +20,19 @@ import sys
 from pathlib import Path
 
 from .data import load_manifest
+from .distill import STUDENTS
 from .metrics import is_better
 from .registry import ModelCard, get_active_version, resolve_model_dir
 from .tasks import get_task
+from .threads import apply_thread_budget
 from .train import train_version
 
 
-def compare_to_active(card: ModelCard, model_dir: Path | None = None) -> dict:
+def compare_to_active(card: ModelCard, model_dir: Path | None = None, mode: str = "point") -> dict:
+    """Per-task candidate vs active. In `significant` mode a task only counts as a regression
+    when the active head's bootstrap interval clears the candidate's estimate."""
     active = get_active_version(model_dir)
-    out = {"activeVersion": active, "perTask": {}, "regressions": []}
+    out = {"activeVersion": active, "mode": mode, "perTask": {}, "regressions": []}
     if not active:
         return out
     ad = resolve_model_dir(model_dir) / active
@@ -36,7 +44,12 @@ def compare_to_active(card: ModelCard, model_dir: Path | None = None) -> dict:
             continue
         spec = get_task(task)
         inc = active_card.get("tasks", {}).get(task, {}).get("metrics")
-        better = is_better(spec, res["metrics"], inc, min_delta=0.0) if inc else True
+        if not inc:
+            better = True
+        elif mode == "significant":
+            better = not is_better(spec, inc, res["metrics"], mode="significant")
+        else:
+            better = is_better(spec, res["metrics"], inc, min_delta=0.0)
         out["perTask"][task] = {"candidate": res["metrics"].get(spec.primary_metric), "active": (inc or {}).get(spec.primary_metric), "betterOrEqual": better}
         if inc and not better:
             out["regressions"].append(task)
@@ -50,12 +63,26 @@ def main(argv: list[str] | None = None) -> int:
     ap.add_argument("--real", action="append", default=[], help="harvested real dataset dir(s)")
     ap.add_argument("--min-real-rows", type=int, default=0, help="refuse to retrain unless real data has at least this many rows (guardrail)")
     ap.add_argument("--max-rows", type=int, default=400_000)
+    ap.add_argument("--ingest-jobs", type=int, default=1, help="processes reading each task's JSONL (0 = all cores)")
     ap.add_argument("--epochs", type=int, default=30)
     ap.add_argument("--backend", default="auto")
     ap.add_argument("--tasks", default=None)
     ap.add_argument("--model-dir", default=None)
     ap.add_argument("--quick", action="store_true")
+    ap.add_argument("--bootstrap", type=int, default=200, help="group-bootstrap replicates for metric CIs (0 = off)")
+    ap.add_argument("--compare", default="point", choices=["point", "significant"])
+    ap.add_argument("--quantize", default=None, choices=["int8", "fp16"])
+    ap.add_argument("--quant-tolerance", type=float, default=0.005)
+    ap.add_argument("--threads", type=int, default=None)
+    ap.add_argument("--encoding", default=None, choices=["onehot", "codes"])
+    ap.add_argument("--warm-start", action="store_true", help="fine-tune from the active version's heads instead of fitting cold")
+    ap.add_argument("--warm-from", default=None, help="warm-start from this version instead of the active one")
+    ap.add_argument("--warm-compare", action="store_true", help="also fit cold and record time saved / metric delta in the card")
+    ap.add_argument("--distill", default=None, choices=["auto", *STUDENTS], help="distill GBDT winners into a student head")
+    ap.add_argument("--distill-tolerance", type=float, default=0.01)
+    ap.add_argument("--latency-tolerance", type=float, default=0.0, help="auto: prefer the fastest head within this relative metric distance")
     a = ap.parse_args(argv)
+    apply_thread_budget("train", threads=a.threads)
 
     real_rows = sum(int(sum(load_manifest(Path(d)).get("rows", {}).values())) for d in a.real)
     if a.min_real_rows and real_rows < a.min_real_rows:
@@ -65,14 +92,19 @@ def main(argv: list[str] | None = None) -> int:
     if not data_dirs:
         print("[retrain] no data dirs given")
         return 2
+    warm_from = a.warm_from or (get_active_version(Path(a.model_dir) if a.model_dir else None) if a.warm_start else None)
     card = train_version(
         a.version, data_dirs, a.tasks.split(",") if a.tasks else None, a.backend, a.max_rows, a.epochs,
         Path(a.model_dir) if a.model_dir else None, notes=f"retrain: sim={a.sim} real={a.real} realRows={real_rows}", quick=a.quick,
+        n_boot=a.bootstrap, compare=a.compare, quantize=a.quantize, quant_tol=a.quant_tolerance, encoding=a.encoding,
+        warm_from=warm_from, warm_compare=a.warm_compare, ingest_jobs=a.ingest_jobs or None, distill=a.distill,
+        distill_tol=a.distill_tolerance, latency_tol=a.latency_tolerance,
     )
-    cmp = compare_to_active(card, Path(a.model_dir) if a.model_dir else None)
+    cmp = compare_to_active(card, Path(a.model_dir) if a.model_dir else None, mode=a.compare)
     card["comparedToActive"] = cmp
     card.save(resolve_model_dir(Path(a.model_dir) if a.model_dir else None) / a.version)
-    print(json.dumps({"version": a.version, "allBeatBaseline": card.get("allBeatBaseline"), "comparedToActive": cmp}, indent=2))
+    print(json.dumps({"version": a.version, "allBeatBaseline": card.get("allBeatBaseline"), "comparedToActive": cmp,
+                      "warmStart": {k: v for k, v in (card.get("warmStart") or {}).items() if k != "tasks"} or None}, indent=2))
     print("[retrain] done. Next: npm run ml:register -- --version", a.version, " -> ml:approve -> ml:activate")
     return 0
 
@@ -0,0 +1,227 @@
+"""Routing front for a task-sharded deployment of the model service.
+
+    ML_ROUTES=routes.json uvicorn haemologix.router:app --port 8080   (from ml/)
+    python -m haemologix.router --routes routes.json                  (check a table: task → shard)
+
+Each shard is an ordinary `haemologix.api` instance started with `ML_TASKS`
+(its task allow-list) and `ML_SHARD` (its name), so the hot donor heads can be
+scaled on their own instances while the rest share one. The table names them:
+
+    {"shards": {"donor": {"url": "http://ml-donor:8000", "tasks": ["donor_accept", "donor_show", "donor_eta"]},
+                "rest":  {"url": "http://ml-rest:8000",  "tasks": "*"}}}
+
+`"*"` takes every task no other shard lists; a task listed twice is an error.
+
+The front speaks the service's own API, so `lib/ml/modelClient.ts` only needs
+`ML_API_URL` pointed at it:
+
+    POST /predict/batch   split by task into one sub-batch per shard (with only the
+                          entities those requests read, the caller's remaining
+                          `budgetMs`, `modelVersion` and `explain`), sent concurrently,
+                          results merged back in request order. A shard's error status
+                          is passed through; shards answering from different versions
+                          are a 502.
+    GET  /health          the shards' /health merged (model_loaded only when all are),
+                          plus each shard's own summary under `shards`
+    GET  /routes          {tasks: {task: shard}, shards: {shard: url}} — the table, for
+                          clients that call shards directly
+
+The front loads no model; it imports FastAPI and httpx only. `X-ML-Secret` is
+checked against ML_API_SECRET and forwarded. Shard calls time out after the
+caller's budget, else `ML_ROUTER_TIMEOUT_MS` (default 3000).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+import httpx
+from fastapi import FastAPI, Header, HTTPException, Request
+
+from .tasks import TASK_NAMES
+
+app = FastAPI(title="Haemologix ML router", version="1.0.0")
+
+_state: dict[str, Any] = {"routes": None, "client": None}
+
+
+def load_routes(table: dict[str, Any]) -> tuple[dict[str, str], dict[str, str]]:
+    """Routing table → ({task: shard}, {shard: base url}); every task maps to exactly one shard."""
+    tasks: dict[str, str] = {}
+    urls: dict[str, str] = {}
+    rest: str | None = None
+    for name, shard in table.get("shards", {}).items():
+        urls[name] = str(shard["url"]).rstrip("/")
+        if shard.get("tasks", "*") == "*":
+            if rest is not None:
+                raise ValueError(f"shards {rest} and {name} both take '*'")
+            rest = name
+            continue
+        for t in shard["tasks"]:
+            if t not in TASK_NAMES:
+                raise ValueError(f"shard {name}: unknown task {t}")
+            if t in tasks:
+                raise ValueError(f"task {t} is routed to both {tasks[t]} and {name}")
+            tasks[t] = name
+    if rest is not None:
+        for t in TASK_NAMES:
+            tasks.setdefault(t, rest)
+    return tasks, urls
+
+
+def _routes() -> tuple[dict[str, str], dict[str, str]]:
+    if _state["routes"] is None:
+        path = os.environ.get("ML_ROUTES", "").strip()
+        if not path:
+            raise HTTPException(status_code=503, detail="ML_ROUTES is not set")
+        _state["routes"] = load_routes(json.loads(Path(path).read_text(encoding="utf-8")))
+    return _state["routes"]
+
+
+def _client() -> httpx.AsyncClient:
+    if _state["client"] is None:
+        _state["client"] = httpx.AsyncClient(timeout=float(os.environ.get("ML_ROUTER_TIMEOUT_MS", "3000")) / 1000)
+    return _state["client"]
+
+
+def require_secret(x_ml_secret: str | None) -> dict[str, str]:
+    """Check the caller's secret like the service does; the headers to forward to shards."""
+    secret = os.environ.get("ML_API_SECRET", "").strip()
+    if secret and x_ml_secret != secret:
+        raise HTTPException(status_code=401, detail="invalid or missing X-ML-Secret")
+    return {"X-ML-Secret": x_ml_secret} if x_ml_secret else {}
+
+
+def split_batch(body: dict[str, Any], task_shard: dict[str, str]) -> dict[str, tuple[list[int], dict[str, Any]]]:
+    """shard → (indices into body.requests, its sub-batch) for a /predict/batch body."""
+    entities = body.get("entities") or {}
+    parts: dict[str, tuple[list[int], dict[str, Any]]] = {}
+    for i, r in enumerate(body.get("requests") or []):
+        task = r.get("task") if isinstance(r, dict) else None
+        if task not in task_shard:
+            raise HTTPException(status_code=400, detail=f"unknown task {task}")
+        shard = task_shard[task]
+        if shard not in parts:
+            sub = {k: v for k, v in body.items() if k not in ("requests", "entities")}
+            parts[shard] = ([], sub | {"requests": [], "entities": {}})
+        idxs, sub = parts[shard]
+        idxs.append(i)
+        sub["requests"].append(r)
+        if r.get("entity") in entities:
+            sub["entities"][r["entity"]] = entities[r["entity"]]
+    return parts
+
+
+@app.get("/routes")
+async def routes() -> dict[str, Any]:
+    tasks, urls = _routes()
+    return {"tasks": tasks, "shards": urls}
+
+
+@app.get("/health")
+async def health() -> dict[str, Any]:
+    tasks, urls = _routes()
+
+    async def one(url: str) -> dict[str, Any]:
+        try:
+            r = await _client().get(f"{url}/health")
+            return r.json() if r.status_code == 200 else {"status": "down", "error": f"http_{r.status_code}"}
+        except httpx.HTTPError as e:
+            return {"status": "down", "error": repr(e)}
+
+    shards = dict(zip(urls, await asyncio.gather(*(one(u) for u in urls.values()))))
+    versions = {h.get("activeVersion") for h in shards.values()}
+    loaded = all(h.get("model_loaded") is True for h in shards.values())
+    return {
+        "status": "healthy" if loaded and len(versions) == 1 else "degraded",
+        "model_loaded": loaded,
+        "activeVersion": versions.pop() if len(versions) == 1 else None,
+        "tasks": {t: b for name, h in shards.items() for t, b in (h.get("tasks") or {}).items() if tasks.get(t) == name},
+        "shards": {name: {"url": urls[name]} | {k: h.get(k) for k in ("status", "activeVersion", "shard", "tasks", "error")}
+                   for name, h in shards.items()},
+    }
+
+
+@app.post("/predict/batch")
+async def predict_batch(request: Request, x_ml_secret: str | None = Header(default=None)) -> dict[str, Any]:
+    t0 = time.perf_counter()
+    headers = require_secret(x_ml_secret)
+    body = await request.json()
+    if not isinstance(body, dict):
+        raise HTTPException(status_code=400, detail="expected a PredictBatchRequest object")
+    task_shard, urls = _routes()
+    parts = split_batch(body, task_shard)
+    budget = body.get("budgetMs")
+    if budget is not None and budget <= 0:
+        raise HTTPException(status_code=504, detail="deadline already passed")
+
+    async def forward(shard: str, sub: dict[str, Any]) -> dict[str, Any]:
+        timeout = None
+        if budget is not None:  # what is left of the caller's budget after the split
+            left = budget - (time.perf_counter() - t0) * 1000
+            sub["budgetMs"] = max(1, int(left))
+            timeout = max(left, 1) / 1000
+        try:
+            r = await _client().post(f"{urls[shard]}/predict/batch", json=sub, headers=headers,
+                                     **({"timeout": timeout} if timeout is not None else {}))
+        except httpx.TimeoutException:
+            raise HTTPException(status_code=504, detail=f"shard {shard} did not answer in time")
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=502, detail=f"shard {shard}: {e!r}")
+        if r.status_code != 200:
+            try:
+                detail = r.json().get("detail", r.text)
+            except ValueError:
+                detail = r.text
+            raise HTTPException(status_code=r.status_code, detail=f"shard {shard}: {detail}")
+        return r.json()
+
+    names = list(parts)
+    answers = await asyncio.gather(*(forward(s, parts[s][1]) for s in names))
+    versions = {a["modelVersion"] for a in answers}
+    if len(versions) > 1:
+        raise HTTPException(status_code=502, detail=f"shards answered from different versions: {sorted(versions)}")
+    results: list[Any] = [None] * len(body.get("requests") or [])
+    for s, a in zip(names, answers):
+        for i, res in zip(parts[s][0], a["results"]):
+            results[i] = res
+    return {"modelVersion": versions.pop() if versions else body.get("modelVersion") or "none", "results": results,
+            "latencyMs": int((time.perf_counter() - t0) * 1000)}
+
+
+@app.on_event("shutdown")
+async def _shutdown() -> None:
+    if _state["client"] is not None:
+        await _state["client"].aclose()
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--routes", default=os.environ.get("ML_ROUTES"), help="routing table JSON (default: $ML_ROUTES)")
+    a = ap.parse_args(argv)
+    if not a.routes:
+        print("[router] no --routes and no ML_ROUTES", file=sys.stderr)
+        return 2
+    try:
+        tasks, urls = load_routes(json.loads(Path(a.routes).read_text(encoding="utf-8")))
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[router] bad routing table: {e}", file=sys.stderr)
+        return 2
+    for name, url in urls.items():
+        print(f"[router] {name:<12} {url:<32} {','.join(t for t, s in tasks.items() if s == name)}")
+    unrouted = [t for t in TASK_NAMES if t not in tasks]
+    if unrouted:
+        print(f"[router] unrouted tasks (400 at the front): {','.join(unrouted)}")
+    print(json.dumps({"tasks": tasks, "shards": urls}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
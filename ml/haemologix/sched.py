@@ -0,0 +1,88 @@
+"""Earliest-deadline-first worker pool for the service's task heads.
+
+`/predict/batch` submits each task head with the time by which its answer is
+still useful. Workers always take the job with the earliest deadline, so under
+saturation a request whose caller is about to give up is served before one with
+slack, and a job whose deadline has passed while it waited is dropped without
+running (its future fails with `DeadlineExceeded`) instead of burning a core on
+an answer nobody will read. Jobs without a deadline sort last. A job whose
+future was cancelled while queued (the request stopped waiting) is skipped.
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import math
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable
+
+
+class DeadlineExceeded(Exception):
+    """The job's deadline passed before a worker picked it up."""
+
+
+class DeadlineExecutor:
+    def __init__(self, workers: int = 4, name: str = "ml-head"):
+        self._heap: list[tuple[float, int, Callable[..., Any], tuple[Any, ...], Future]] = []
+        self._seq = itertools.count()
+        self._cv = threading.Condition()
+        self._closed = False
+        self.running = 0
+        self.completed = 0
+        self.shed = 0
+        self._threads = [threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True) for i in range(max(1, workers))]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, deadline: float | None, fn: Callable[..., Any], *args: Any) -> Future:
+        """Run `fn(*args)` no later than `deadline` (time.perf_counter() seconds), or not at all."""
+        fut: Future = Future()
+        with self._cv:
+            if self._closed:
+                raise RuntimeError("executor is shut down")
+            heapq.heappush(self._heap, (math.inf if deadline is None else deadline, next(self._seq), fn, args, fut))
+            self._cv.notify()
+        return fut
+
+    def stats(self) -> dict[str, int]:
+        with self._cv:
+            return {"queued": len(self._heap), "running": self.running, "completed": self.completed, "shed": self.shed}
+
+    def shutdown(self) -> None:
+        with self._cv:
+            self._closed = True
+            for *_, fut in self._heap:
+                fut.cancel()
+            self._heap.clear()
+            self._cv.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            with self._cv:
+                while not self._heap and not self._closed:
+                    self._cv.wait()
+                if self._closed:
+                    return
+                deadline, _, fn, args, fut = heapq.heappop(self._heap)
+                # claim the future first: the awaiting request may have cancelled it (asyncio timeout)
+                if not fut.set_running_or_notify_cancel():
+                    continue
+                if time.perf_counter() > deadline:
+                    self.shed += 1
+                    fut.set_exception(DeadlineExceeded())
+                    continue
+                self.running += 1
+            try:
+                fut.set_result(fn(*args))
+            except BaseException as e:  # surfaced to the awaiting request
+                try:
+                    fut.set_exception(e)
+                except Exception:  # the future is already settled; never let the worker die
+                    pass
+            finally:
+                with self._cv:
+                    self.running -= 1
+                    self.completed += 1
@@ -0,0 +1,233 @@
+"""Offline bulk scoring: backfills and what-if replays without the HTTP service.
+
+    python -m haemologix.score --in data/real/v7 --out preds.jsonl.gz [--version haemologix-model-1.2]
+                               [--tasks donor_accept,donor_eta] [--keep ref,groupId,eventTime,label]
+                               [--explain 5] [--jobs 8] [--chunk-rows 50000] [--model-dir D]
+
+Inputs are JSONL files (plain or .gz) or directories of them — training /
+harvest datasets (`<task>.jsonl`) and prediction-log segments alike; every row
+needs a `features` dict. Rows are read in chunks of `--chunk-rows` lines and each
+chunk is scored in one of `--jobs` worker processes that load the version once
+(`LoadedModel.load`, packed artifact when present), build one `FeatureColumns`
+per chunk and run each task's preprocessor and head vectorised over it — the
+`/predict/batch` path without the request overhead. Confidence is computed by
+`models.confidence`, the function the service uses, after the version's
+calibration overlay (calib.py; `ML_CALIBRATION=0` for raw head outputs) as in
+the service. At most two chunks per worker are in flight, so memory stays
+bounded however large the input is.
+
+Without `--tasks` each row is scored for its own `task`; with it every row is
+scored for every listed task (what-if). One output line per (row, task), in input
+order:
+
+    {<--keep fields of the input row>, "task", "prediction", "confidence", "backend", "attributions"?}
+
+`--explain k` adds each row's top-k signed feature attributions (explain.py).
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import multiprocessing
+import sys
+import time
+from collections import deque
+from pathlib import Path
+from typing import IO, Any, Iterator
+
+import numpy as np
+
+from .calib import CalibrationOverlay
+from .data import FeatureColumns, inverse_label
+from .explain import row_attributions
+from .ingest import _loads
+from .models import confidence
+from .registry import LoadedModel, get_active_version, resolve_model_dir
+from .tasks import get_task
+from .threads import apply_thread_budget, cpu_count
+
+DEFAULT_KEEP = ("ref", "groupId", "eventTime", "label")
+
+try:
+    import orjson
+
+    def _dumps(rec: dict[str, Any]) -> bytes:
+        return orjson.dumps(rec)
+except ImportError:  # optional, see ingest.py
+    def _dumps(rec: dict[str, Any]) -> bytes:
+        return json.dumps(rec, separators=(",", ":")).encode("utf-8")
+
+
+def _new_stats() -> dict[str, Any]:
+    return {"rows": 0, "records": 0, "tasks": {}, "skipped": {"bad_json": 0, "no_features": 0, "no_head": 0}}
+
+
+def _merge_stats(into: dict[str, Any], part: dict[str, Any]) -> None:
+    into["rows"] += part["rows"]
+    into["records"] += part["records"]
+    for t, n in part["tasks"].items():
+        into["tasks"][t] = into["tasks"].get(t, 0) + n
+    for k, n in part["skipped"].items():
+        into["skipped"][k] += n
+
+
+def score_lines(model: LoadedModel, lines: list[bytes], tasks: list[str] | None = None,
+                keep: tuple[str, ...] = DEFAULT_KEEP, explain: int = 0,
+                calibration: CalibrationOverlay | None = None) -> tuple[bytes, dict[str, Any]]:
+    """Score one chunk of JSONL lines; (output JSONL bytes, counts)."""
+    st = _new_stats()
+    rows: list[dict[str, Any]] = []
+    for ln in lines:
+        if not ln.strip():
+            continue
+        try:
+            r = _loads(ln)
+        except ValueError:
+            st["skipped"]["bad_json"] += 1
+            continue
+        if not isinstance(r, dict) or not isinstance(r.get("features"), dict):
+            st["skipped"]["no_features"] += 1
+            continue
+        rows.append(r)
+    st["rows"] = len(rows)
+    by_task: dict[str, list[int]] = {}
+    for i, r in enumerate(rows):
+        for t in tasks or [r.get("task")]:
+            if t in model.tasks:
+                by_task.setdefault(t, []).append(i)
+            else:
+                st["skipped"]["no_head"] += 1
+
+    cols = FeatureColumns([r["features"] for r in rows])
+    out: list[list[bytes]] = [[] for _ in rows]
+    for task in (tasks or sorted(by_task)):
+        idxs = by_task.get(task)
+        if not idxs:
+            continue
+        lt, spec = model.tasks[task], get_task(task)
+        X = lt.pre.transform_columns(cols, np.asarray(idxs))
+        raw = lt.predictor.predict(X)
+        if calibration is not None and spec.kind != "regression":
+            raw = calibration.apply(task, raw)
+        conf = confidence(spec.kind, raw, lt.metrics).tolist()
+        attributions = row_attributions(lt.predictor, X, lt.pre.feature_names, explain) if explain else None
+        pred = (inverse_label(raw, spec) if spec.kind == "regression" else raw).tolist()
+        for j, i in enumerate(idxs):
+            r = rows[i]
+            rec = {k: r[k] for k in keep if k in r}
+            rec.update(task=task, prediction=pred[j], confidence=conf[j], backend=lt.backend)
+            if attributions is not None:
+                rec["attributions"] = attributions[j]
+            out[i].append(_dumps(rec))
+        st["tasks"][task] = len(idxs)
+        st["records"] += len(idxs)
+    return b"".join(ln + b"\n" for recs in out for ln in recs), st
+
+
+# -- worker processes ----------------------------------------------------------
+
+_worker: dict[str, Any] = {}
+
+
+def _init_worker(version_dir: str, tasks: list[str] | None, keep: tuple[str, ...], explain: int, threads: int) -> None:
+    apply_thread_budget("train", threads=threads)
+    _worker.update(model=LoadedModel.load(Path(version_dir), tasks=tasks), tasks=tasks, keep=keep, explain=explain,
+                   calibration=CalibrationOverlay.from_env(Path(version_dir)))
+
+
+def _score_chunk(lines: list[bytes]) -> tuple[bytes, dict[str, Any]]:
+    return score_lines(_worker["model"], lines, _worker["tasks"], _worker["keep"], _worker["explain"], _worker["calibration"])
+
+
+# -- driver --------------------------------------------------------------------
+
+def input_files(paths: list[Path]) -> list[Path]:
+    files: list[Path] = []
+    for p in map(Path, paths):
+        files += sorted([*p.glob("*.jsonl"), *p.glob("*.jsonl.gz")]) if p.is_dir() else [p]
+    return files
+
+
+def _open(p: Path, mode: str) -> IO[bytes]:
+    return gzip.open(p, mode) if p.suffix == ".gz" else p.open(mode)  # type: ignore[return-value]
+
+
+def iter_chunks(files: list[Path], chunk_rows: int) -> Iterator[list[bytes]]:
+    for p in files:
+        with _open(p, "rb") as fh:
+            chunk: list[bytes] = []
+            for ln in fh:
+                chunk.append(ln)
+                if len(chunk) >= chunk_rows:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+
+
+def score_files(inputs: list[Path], out: Path, version_dir: Path, tasks: list[str] | None = None,
+                keep: tuple[str, ...] = DEFAULT_KEEP, jobs: int | None = 1, chunk_rows: int = 50_000,
+                explain: int = 0) -> dict[str, Any]:
+    """Score every row of `inputs` with the version at `version_dir` into `out`; returns the run summary."""
+    for t in tasks or []:
+        get_task(t)
+    files = input_files(inputs)
+    jobs = jobs or cpu_count()
+    t0 = time.perf_counter()
+    st = _new_stats()
+    out = Path(out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(out.name + ".tmp")
+    with gzip.open(tmp, "wb", compresslevel=3) if out.suffix == ".gz" else tmp.open("wb") as fh:
+        def emit(res: tuple[bytes, dict[str, Any]]) -> None:
+            fh.write(res[0])
+            _merge_stats(st, res[1])
+
+        if jobs <= 1:
+            model = LoadedModel.load(Path(version_dir), tasks=tasks)
+            calibration = CalibrationOverlay.from_env(Path(version_dir))
+            for chunk in iter_chunks(files, chunk_rows):
+                emit(score_lines(model, chunk, tasks, keep, explain, calibration))
+        else:
+            ctx = multiprocessing.get_context("spawn")
+            with ctx.Pool(jobs, _init_worker, (str(version_dir), tasks, keep, explain, max(1, cpu_count() // jobs))) as pool:
+                pending: deque[Any] = deque()
+                for chunk in iter_chunks(files, chunk_rows):
+                    pending.append(pool.apply_async(_score_chunk, (chunk,)))
+                    if len(pending) >= 2 * jobs:  # bounded read-ahead; results leave in input order
+                        emit(pending.popleft().get())
+                while pending:
+                    emit(pending.popleft().get())
+    tmp.replace(out)
+    seconds = time.perf_counter() - t0
+    return {"version": Path(version_dir).name, "inputs": [str(p) for p in files], "out": str(out), "jobs": jobs,
+            "seconds": round(seconds, 3), "rows_s": round(st["rows"] / max(seconds, 1e-9))} | st
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--in", dest="inputs", action="append", required=True, help="JSONL(.gz) file or directory (repeatable)")
+    ap.add_argument("--out", required=True, help="output JSONL (.gz to compress)")
+    ap.add_argument("--version", default=None, help="registry version (default: active)")
+    ap.add_argument("--model-dir", default=None)
+    ap.add_argument("--tasks", default=None, help="comma list: score every row for each (default: the row's own task)")
+    ap.add_argument("--keep", default=",".join(DEFAULT_KEEP), help="input fields copied to each output line")
+    ap.add_argument("--explain", type=int, default=0, help="top-k per-row feature attributions (0 = off)")
+    ap.add_argument("--jobs", type=int, default=1, help="worker processes (0 = all cores)")
+    ap.add_argument("--chunk-rows", type=int, default=50_000)
+    a = ap.parse_args(argv)
+    version = a.version or get_active_version(a.model_dir)
+    if not version:
+        print("[score] no --version and no active version", file=sys.stderr)
+        return 2
+    res = score_files([Path(p) for p in a.inputs], Path(a.out), resolve_model_dir(a.model_dir) / version,
+                      a.tasks.split(",") if a.tasks else None, tuple(k for k in a.keep.split(",") if k),
+                      a.jobs or None, a.chunk_rows, a.explain)
+    print(json.dumps(res, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
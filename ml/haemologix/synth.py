@@ -0,0 +1,610 @@
+"""Deterministic synthetic datasets for scale testing (no Node, no simulator).
+
+    python -m haemologix.synth --out data/synth/s1m --rows 1000000 [--tasks donor_accept,...]
+                               [--seed 0] [--chunk 100000] [--jobs 4] [--version synth-v1]
+
+Writes the simulator's on-disk format — `<task>.jsonl` rows of {task, features,
+label, source, groupId, eventTime} plus `manifest.json` with rows / features /
+labelMeans — for every task in `TASKS`, so `train`, `retrain`, the benchmarks and
+the service load it exactly like `npm run sim:run` output. Feature names and
+types follow the builders in `lib/ml/features.ts`; labels come from simple
+logistic / log-normal models of those features plus a per-group latent, so the
+heads have something to learn and rows sharing a `groupId` (one alert, one
+hospital-day, one donor) are correlated the way the group split assumes.
+
+Rows are generated and written in vectorised chunks of `--chunk` rows, so memory
+stays flat at any size; `--jobs` writes tasks in parallel processes. Group-level
+values are hashed from (seed, task, group), never drawn from a stream, so a group
+straddling two chunks stays consistent. Same seed, rows and chunk size give
+byte-identical files. This is *not* a substitute for the simulator: the label
+models are deliberately crude and there is no policy in the loop — use it to
+measure the pipeline, not the models.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+
+from .registry import now_iso
+from .tasks import TASK_NAMES, URGENCY_CLASSES, get_task
+
+GENERATOR_VERSION = 1
+
+BLOOD_TYPES = ["O-", "O+", "A-", "A+", "B-", "B+", "AB-", "AB+"]
+BLOOD_FREQ = np.asarray([0.07, 0.37, 0.06, 0.36, 0.015, 0.09, 0.005, 0.03])
+#: lib/ml/features.ts BLOOD_RARITY, in BLOOD_TYPES order
+BLOOD_RARITY = np.asarray([10, 3, 7, 4, 9, 5, 10, 8])
+#: relative alert volume per local hour (daytime-heavy, like the simulator's scenarios)
+HOUR_PROFILE = np.asarray([1, 1, 1, 1, 1, 2, 3, 4, 5, 6, 6, 6, 6, 6, 6, 6, 5, 5, 4, 4, 3, 2, 2, 1], dtype=np.float64)
+URGENCY_FREQ = np.asarray([0.2, 0.4, 0.28, 0.12])
+
+#: mean rows per groupId — a notification batch, the accepted donors of an alert, a hospital-day, ...
+GROUP_ROWS = {
+    "donor_accept": 12, "donor_show": 4, "donor_response_time": 6, "donor_eta": 4,
+    "inventory_delivery_ok": 3, "delivery_time": 3, "urgency_priority": 8,
+    "alert_resolves_in_window": 3, "eligibility_needs_review": 2, "expansion_yield": 3,
+}
+
+_EPOCH = np.datetime64("2026-01-01T00:00", "ms")  # a Thursday
+_M64 = (1 << 64) - 1
+
+
+# ---------------------------------------------------------------------------
+# Group-level values: counter-based, so chunk boundaries never split a group's draws
+# ---------------------------------------------------------------------------
+
+def _splitmix(x: np.ndarray) -> np.ndarray:
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+class _Groups:
+    """Per-row views of group-level draws for the rows' group ids."""
+
+    def __init__(self, seed: int, task: str, gid: np.ndarray):
+        self.gid = gid
+        self._key = int.from_bytes(hashlib.blake2b(f"{seed}:{task}".encode(), digest_size=8).digest(), "little")
+
+    def uniform(self, salt: str) -> np.ndarray:
+        k = (self._key ^ int.from_bytes(hashlib.blake2b(salt.encode(), digest_size=8).digest(), "little")) & _M64
+        with np.errstate(over="ignore"):
+            h = _splitmix(_splitmix(self.gid.astype(np.uint64) ^ np.uint64(k)))
+        return (h >> np.uint64(11)).astype(np.float64) * 2.0**-53
+
+    def normal(self, salt: str) -> np.ndarray:
+        u1, u2 = self.uniform(salt + ".a"), self.uniform(salt + ".b")
+        return np.sqrt(-2.0 * np.log1p(-u1)) * np.cos(2.0 * np.pi * u2)
+
+    def integers(self, salt: str, low: int, high: int) -> np.ndarray:
+        return (low + np.floor(self.uniform(salt) * (high - low))).astype(np.int64)
+
+    def pick(self, salt: str, p: np.ndarray) -> np.ndarray:
+        return np.minimum(np.searchsorted(np.cumsum(p / p.sum()), self.uniform(salt), side="right"), len(p) - 1)
+
+
+def _pick(rng: np.random.Generator, p: np.ndarray, n: int) -> np.ndarray:
+    return rng.choice(len(p), size=n, p=p / p.sum())
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+def _bernoulli(rng: np.random.Generator, logit: np.ndarray) -> np.ndarray:
+    return (rng.random(len(logit)) < _sigmoid(logit)).astype(np.int64)
+
+
+def _traffic(hour: np.ndarray) -> np.ndarray:
+    """lib/agents/logisticsAgent.getTrafficMultiplier."""
+    rush = ((hour >= 7) & (hour < 9)) | ((hour >= 17) & (hour < 19))
+    return np.where(rush, 1.5, np.where((hour >= 19) | (hour < 7), 0.8, 1.0))
+
+
+def _night(hour: np.ndarray) -> np.ndarray:
+    return (hour >= 21) | (hour < 6)
+
+
+# ---------------------------------------------------------------------------
+# Feature blocks (same names, order and rounding as lib/ml/features.ts)
+# ---------------------------------------------------------------------------
+
+Cols = dict[str, tuple[str, np.ndarray]]  # name → (kind, values); kind: "f<dp>" | "i" | "b" | "s"
+
+
+def _time(g: _Groups) -> tuple[Cols, np.ndarray]:
+    day = g.integers("day", 0, 365)
+    hour = g.pick("hour", HOUR_PROFILE)
+    minute = day * 1440 + hour * 60 + g.integers("minute", 0, 60)
+    dow = (day + 4) % 7
+    return {
+        "hour": ("i", hour),
+        "dayOfWeek": ("i", dow),
+        "isNight": ("b", _night(hour)),
+        "isWeekend": ("b", (dow == 0) | (dow == 6)),
+        "trafficMultiplier": ("f3", _traffic(hour)),
+    }, minute
+
+
+def _alert(g: _Groups) -> dict[str, np.ndarray]:
+    """What every row of one alert shares: blood type, urgency, size, radius."""
+    bt = g.pick("bloodType", BLOOD_FREQ)
+    urg = g.pick("urgency", URGENCY_FREQ)
+    return {
+        "bt": bt,
+        "urg": urg,
+        "units": 1 + g.integers("units", 0, 4) + (urg >= 2) * g.integers("units.x", 0, 4),
+        "radius": np.asarray([10.0, 15.0, 25.0, 50.0])[g.pick("radius", np.asarray([0.3, 0.35, 0.25, 0.1]))],
+        "busy": np.floor(-np.log1p(-g.uniform("busy")) * 1.5).astype(np.int64),  # activeAlertsSameType
+    }
+
+
+def _cat(values: list[str], idx: np.ndarray) -> tuple[str, np.ndarray]:
+    return "s", np.asarray(values, dtype=object)[idx]
+
+
+def _donor(rng: np.random.Generator, g: _Groups, show: bool) -> tuple[Cols, dict[str, np.ndarray]]:
+    n = len(g.gid)
+    a = _alert(g)
+    tcols, minute = _time(g)
+    hour = tcols["hour"][1]
+    night = _night(hour)
+    area = g.normal("area")  # how responsive this neighbourhood is
+    dbt = np.where(rng.random(n) < 0.55, a["bt"], _pick(rng, BLOOD_FREQ, n))
+    dist = a["radius"] * np.sqrt(rng.uniform(0.01, 1.0, n))
+    notified = 3 + g.integers("notified", 0, 25)
+    eligible = notified + g.integers("eligible", 0, 60)
+    rank = 1 + np.floor(rng.random(n) * notified).astype(np.int64)
+    never = rng.random(n) < 0.2
+    days = np.where(never, 365, rng.integers(56, 720, n))
+    propensity = rng.beta(2.0, 2.5, n)
+    alerts = rng.poisson(4.0, n)
+    accepted = rng.binomial(alerts, propensity)
+    arrived = rng.binomial(accepted, 0.8)
+    no_shows = accepted - arrived
+    releases = rng.binomial(no_shows, 0.3)
+    accept_rate = np.where(alerts > 0, accepted / np.maximum(alerts, 1), 0.5)
+    show_rate = np.where(accepted > 0, arrived / np.maximum(accepted, 1), 0.75)
+    avg_resp = np.where(accepted > 0, np.round(rng.lognormal(np.log(12.0), 0.5, n), 1), 10.0)
+    fatigue = rng.poisson(1.2, n)
+    unscreened = rng.random(n) < 0.1
+    s_dist = np.clip(100 * (1 - dist / a["radius"]), 0, 100).round(1)
+    s_hist = np.round(100 * (0.6 * accept_rate + 0.4 * show_rate), 1)
+    s_resp = np.clip(100 * (1 - avg_resp / 60), 0, 100).round(1)
+    s_tod = np.where(night, 60.0, 100.0)
+    s_health = np.where(unscreened, 60.0, 100.0) - np.minimum(fatigue * 5, 30)
+    s_final = np.round(0.3 * s_dist + 0.25 * s_hist + 0.2 * s_resp + 0.1 * s_tod + 0.15 * s_health, 1)
+    cols: Cols = {
+        "distanceKm": ("f2", dist),
+        "searchRadiusKm": ("f3", a["radius"]),
+        "distanceRatio": ("f3", dist / a["radius"]),
+        "urgency": _cat(URGENCY_CLASSES, a["urg"]),
+        "alertBloodType": _cat(BLOOD_TYPES, a["bt"]),
+        "donorBloodType": _cat(BLOOD_TYPES, dbt),
+        "exactMatch": ("b", dbt == a["bt"]),
+        "rarity": ("i", BLOOD_RARITY[a["bt"]]),
+        "unitsNeeded": ("i", a["units"]),
+        "notifiedCount": ("i", notified),
+        "eligibleCount": ("i", eligible),
+        "rank": ("i", rank),
+        "daysSinceLastDonation": ("i", days),
+        "neverDonated": ("b", never),
+        "priorAlerts": ("i", alerts),
+        "priorAcceptRate": ("f3", accept_rate),
+        "priorShowRate": ("f3", show_rate),
+        "priorNoShows": ("i", no_shows),
+        "priorReleases": ("i", releases),
+        "avgResponseMinutes": ("f3", avg_resp),
+        "alertsLast7Days": ("i", fatigue),
+        "unscreened": ("b", unscreened),
+        "scoreDistance": ("f3", s_dist),
+        "scoreHistory": ("f3", s_hist),
+        "scoreResponsiveness": ("f3", s_resp),
+        "scoreTimeOfDay": ("f3", s_tod),
+        "scoreHealth": ("f3", s_health),
+        "scoreFinal": ("f3", s_final),
+        **tcols,
+    }
+    resp = np.exp(np.log(6.0 + 0.3 * dist) - 0.15 * a["urg"] + 0.3 * night - 0.2 * area + rng.normal(0, 0.5, n))
+    aux = {"minute": minute, "area": area, "urg": a["urg"], "night": night, "dist": dist, "ratio": dist / a["radius"],
+           "accept_rate": accept_rate, "show_rate": show_rate, "fatigue": fatigue, "unscreened": unscreened,
+           "rank": rank, "resp": resp}
+    if show:
+        traffic = tcols["trafficMultiplier"][1]
+        eta = np.round(8 + dist * 1.6 * traffic).astype(np.int64)
+        accept_hour = (hour + (g.integers("minute", 0, 60) + resp).astype(np.int64) // 60) % 24
+        cols |= {
+            "responseMinutes": ("f1", resp),
+            "etaMinutes": ("i", eta),
+            "acceptHour": ("i", accept_hour),
+            "acceptIsNight": ("b", _night(accept_hour)),
+        }
+        aux["eta"] = eta
+    return cols, aux
+
+
+def _donor_accept(rng, g):
+    cols, x = _donor(rng, g, show=False)
+    logit = (0.2 - 2.2 * x["ratio"] + 2.0 * (x["accept_rate"] - 0.45) + 0.35 * x["urg"] - 0.6 * x["night"]
+             - 0.25 * x["fatigue"] - 0.5 * x["unscreened"] - 0.03 * x["rank"] + 0.5 * x["area"])
+    return cols, _bernoulli(rng, logit), x["minute"]
+
+
+def _donor_response_time(rng, g):
+    cols, x = _donor(rng, g, show=False)
+    return cols, np.round(x["resp"], 2), x["minute"] + x["resp"]
+
+
+def _donor_show(rng, g):
+    cols, x = _donor(rng, g, show=True)
+    logit = 1.6 - 0.03 * x["eta"] + 2.5 * (x["show_rate"] - 0.75) - 0.5 * x["night"] + 0.2 * x["urg"] + 0.4 * x["area"]
+    return cols, _bernoulli(rng, logit), x["minute"] + x["resp"]
+
+
+def _donor_eta(rng, g):
+    cols, x = _donor(rng, g, show=True)
+    eta = x["eta"] * np.exp(0.05 - 0.1 * x["area"] + rng.normal(0, 0.25, len(g.gid)))
+    return cols, np.round(np.maximum(eta, 3.0), 2), x["minute"] + x["resp"]
+
+
+TRANSPORT = ["ambulance", "courier", "scheduled"]
+_TRANSPORT_SPEED = np.asarray([0.9, 1.3, 2.0])  # minutes per km
+_TRANSPORT_BASE = np.asarray([8.0, 15.0, 45.0])
+
+
+def _inventory(rng, g):
+    n = len(g.gid)
+    a = _alert(g)
+    tcols, minute = _time(g)
+    traffic = tcols["trafficMultiplier"][1]
+    route = g.normal("route")  # how reliable transfers into this hospital are
+    bank = rng.random(n) < 0.4
+    dist = np.round(rng.gamma(2.0, 12.0, n) + 1.0, 2)
+    available = rng.integers(1, 40, n)
+    requested = np.minimum(available, a["units"])
+    expiry = rng.integers(1, 43, n)
+    ubt = np.where(rng.random(n) < 0.7, a["bt"], _pick(rng, BLOOD_FREQ, n))
+    method = np.where((a["urg"] >= 2) & (dist < 30), 0, np.where(dist < 60, 1, 2))
+    method = np.where(rng.random(n) < 0.1, rng.integers(0, 3, n), method)
+    eta = np.round(_TRANSPORT_BASE[method] + dist * _TRANSPORT_SPEED[method] * traffic).astype(np.int64)
+    candidates = 1 + g.integers("candidates", 0, 8)
+    rank = 1 + np.floor(rng.random(n) * candidates).astype(np.int64)
+    agreement = rng.random(n) < 0.7
+    cold = rng.random(n) < 0.85
+    s_prox = np.clip(100 - dist, 0, 100).round(1)
+    s_exp = np.clip(expiry / 42 * 100, 0, 100).round(1)
+    s_qty = np.round(100 * requested / np.maximum(a["units"], 1), 1)
+    s_feas = np.where(agreement, 100.0, 50.0) * np.where(cold, 1.0, 0.7)
+    s_final = np.round(0.35 * s_prox + 0.2 * s_exp + 0.25 * s_qty + 0.2 * s_feas, 1)
+    cols: Cols = {
+        "sourceType": _cat(["hospital", "blood_bank"], bank.astype(np.int64)),
+        "distanceKm": ("f2", dist),
+        "unitsAvailable": ("i", available),
+        "unitsNeeded": ("i", a["units"]),
+        "unitsRequested": ("i", requested),
+        "coverageRatio": ("f3", requested / np.maximum(a["units"], 1)),
+        "daysToExpiry": ("i", expiry),
+        "unitBloodType": _cat(BLOOD_TYPES, ubt),
+        "alertBloodType": _cat(BLOOD_TYPES, a["bt"]),
+        "exactMatch": ("b", ubt == a["bt"]),
+        "urgency": _cat(URGENCY_CLASSES, a["urg"]),
+        "transportMethod": _cat(TRANSPORT, method),
+        "etaMinutes": ("i", eta),
+        "scoreProximity": ("f3", s_prox),
+        "scoreExpiry": ("f3", s_exp),
+        "scoreQuantity": ("f3", s_qty),
+        "scoreFeasibility": ("f3", s_feas),
+        "scoreFinal": ("f3", s_final),
+        "rank": ("i", rank),
+        "candidateCount": ("i", candidates),
+        "networkAgreement": ("b", agreement),
+        "coldStorage": ("b", cold),
+        **tcols,
+    }
+    return cols, {"minute": minute, "route": route, "eta": eta, "cold": cold, "agreement": agreement, "expiry": expiry}
+
+
+def _inventory_delivery_ok(rng, g):
+    cols, x = _inventory(rng, g)
+    logit = 2.2 - 0.015 * x["eta"] + 0.8 * x["cold"] + 0.5 * x["agreement"] - 1.5 * (x["expiry"] < 3) + 0.5 * x["route"]
+    return cols, _bernoulli(rng, logit), x["minute"]
+
+
+def _delivery_time(rng, g):
+    cols, x = _inventory(rng, g)
+    t = 10.0 + x["eta"] * np.exp(0.1 - 0.15 * x["route"] + rng.normal(0, 0.3, len(g.gid)))
+    return cols, np.round(t, 2), x["minute"] + t
+
+
+def _urgency_priority(rng, g):
+    n = len(g.gid)
+    tcols, minute = _time(g)
+    bt = _pick(rng, BLOOD_FREQ, n)
+    usage = np.round(rng.gamma(2.0, 1.5, n) * (1 + g.uniform("size") * 3), 2)
+    current = rng.poisson(usage * rng.uniform(0.2, 12.0, n))
+    remaining = np.round(current / np.maximum(usage, 0.1), 2)
+    has_min = rng.random(n) < 0.8
+    minimum = np.where(has_min, np.ceil(usage * 3), 0).astype(np.int64)
+    busy = rng.poisson(0.5 + g.uniform("busy") * 2, n)
+    pressure = remaining / (1 + BLOOD_RARITY[bt] / 20) * np.exp(rng.normal(0, 0.3, n)) / (1 + 0.2 * busy)
+    label = np.select([pressure < 0.8, pressure < 2.5, pressure < 6.0], [3, 2, 1], 0)
+    cols: Cols = {
+        "bloodType": _cat(BLOOD_TYPES, bt),
+        "rarity": ("i", BLOOD_RARITY[bt]),
+        "currentUnits": ("i", current),
+        "dailyUsage": ("f2", usage),
+        "daysRemaining": ("f2", remaining),
+        "minimumRequired": ("i", minimum),
+        "stockRatio": ("f3", np.where(minimum > 0, current / np.maximum(minimum, 1), 1.0)),
+        "activeAlertsSameType": ("i", busy),
+        "hospitalIsBloodBank": ("b", g.uniform("bank") < 0.15),
+        **tcols,
+    }
+    return cols, label.astype(np.int64), minute
+
+
+_RADIUS_TIERS = np.asarray([10.0, 25.0, 50.0, 100.0, 150.0])
+
+
+def _alert_resolves_in_window(rng, g, pos):
+    n = len(g.gid)
+    a = _alert(g)
+    tcols, minute = _time(g)
+    rung = np.minimum(pos, 3)
+    radius = np.maximum(a["radius"], _RADIUS_TIERS[rung])
+    density = np.exp(g.normal("density") - 1.0)  # eligible donors per km² (urban vs rural)
+    eligible = rng.poisson(density * np.pi * radius**2 * 0.02)
+    notified = np.minimum(eligible, 3 + 2 * a["units"] + rng.integers(0, 8, n))
+    prev = np.where(rung > 0, rng.poisson(3 * rung), 0)
+    sum_score = notified * rng.uniform(40, 80, n)
+    network = rng.poisson(2.0 + 6 * g.uniform("stock"), n)
+    nearest = np.where(network > 0, np.round(rng.gamma(2.0, 15.0, n), 2), 999.0)
+    window = np.asarray([24, 12, 6, 2])[a["urg"]]
+    since = rung * 30 + rng.integers(0, 15, n)
+    cols: Cols = {
+        "bloodType": _cat(BLOOD_TYPES, a["bt"]),
+        "rarity": ("i", BLOOD_RARITY[a["bt"]]),
+        "urgency": _cat(URGENCY_CLASSES, a["urg"]),
+        "unitsNeeded": ("i", a["units"]),
+        "searchRadiusKm": ("f3", radius),
+        "eligibleDonors": ("i", eligible),
+        "notifiedDonors": ("i", notified),
+        "donorsPerUnit": ("f3", notified / np.maximum(a["units"], 1)),
+        "sumScoreFinal": ("f1", sum_score),
+        "networkUnitsAvailable": ("i", network),
+        "nearestInventoryKm": ("f3", nearest),
+        "hasInventoryOption": ("b", network > 0),
+        "bloodBanksInRange": ("i", rng.poisson(1.0 + radius / 40)),
+        "activeAlertsSameType": ("i", a["busy"]),
+        "windowHours": ("i", window),
+        "escalationRung": ("i", rung),
+        "minutesSinceAlert": ("i", since),
+        "previouslyNotified": ("i", prev),
+        **tcols,
+    }
+    logit = (-1.0 + 0.35 * np.minimum(notified / np.maximum(a["units"], 1), 6) + 1.0 * (network >= a["units"])
+             - 0.4 * rung - 0.12 * BLOOD_RARITY[a["bt"]] + 0.05 * window - 0.2 * a["busy"])
+    return cols, _bernoulli(rng, logit), minute + since
+
+
+def _expansion_yield(rng, g, pos):
+    n = len(g.gid)
+    a = _alert(g)
+    tcols, minute = _time(g)
+    rung = 1 + np.minimum(pos, 3)
+    cur = _RADIUS_TIERS[rung - 1]
+    nxt = _RADIUS_TIERS[rung]
+    density = np.exp(g.normal("density") - 3.5)
+    match = BLOOD_FREQ[a["bt"]] / BLOOD_FREQ.max()
+    eligible = rng.poisson(density * match * np.pi * cur**2 * 0.05)
+    notified = np.minimum(eligible, rng.integers(0, 20, n))
+    accepted = rng.binomial(notified, 0.3)
+    ring = np.pi * (nxt**2 - cur**2)
+    since = 20 + rung * 25 + rng.integers(0, 20, n)
+    cols: Cols = {
+        "bloodType": _cat(BLOOD_TYPES, a["bt"]),
+        "rarity": ("i", BLOOD_RARITY[a["bt"]]),
+        "urgency": _cat(URGENCY_CLASSES, a["urg"]),
+        "unitsNeeded": ("i", a["units"]),
+        "currentRadiusKm": ("f3", cur),
+        "nextRadiusKm": ("f3", nxt),
+        "radiusRatio": ("f3", nxt / cur),
+        "ringAreaKm2": ("i", np.round(ring)),
+        "eligibleSoFar": ("i", eligible),
+        "notifiedSoFar": ("i", notified),
+        "acceptedSoFar": ("i", accepted),
+        "eligiblePerKm2": ("f4", eligible / (np.pi * cur**2)),
+        "escalationRung": ("i", rung),
+        "minutesSinceAlert": ("i", since),
+        "activeAlertsSameType": ("i", a["busy"]),
+        **tcols,
+    }
+    found = 1.0 - np.exp(-density * match * ring * 0.05 * np.exp(rng.normal(0, 0.5, n)))
+    return cols, (rng.random(n) < found).astype(np.int64), minute + since
+
+
+def _eligibility_needs_review(rng, g):
+    n = len(g.gid)
+    _, minute = _time(g)
+    age = rng.integers(16, 72, n)
+    weight = np.round(rng.normal(72, 14, n), 1)
+    has_bmi = rng.random(n) < 0.85
+    height = rng.normal(1.71, 0.09, n)
+    bmi = np.where(has_bmi, np.round(weight / height**2, 1), 0.0)
+    has_hb = rng.random(n) < 0.75
+    gender = _pick(rng, np.asarray([0.49, 0.49, 0.02]), n)  # male, female, other
+    hb = np.where(has_hb, np.round(rng.normal(np.where(gender == 0, 14.8, 13.4), 1.2), 1), 0.0)
+    never = rng.random(n) < 0.3
+    days = np.where(never, 365, rng.integers(20, 720, n))
+    min_hb = np.where(gender == 0, 13.0, 12.5)
+    min_gap = np.where(gender == 0, 90, 120)
+    fail_age = (age < 18) | (age > 65)
+    fail_weight = weight < 50
+    fail_hb = has_hb & (hb < min_hb)
+    fail_gap = ~never & (days < min_gap)
+    failed = fail_age.astype(np.int64) + fail_weight + fail_hb + fail_gap
+    hard = fail_age | fail_weight | fail_hb
+    margins = np.stack([
+        np.minimum(np.abs(age - 18), np.abs(65 - age)) / 47,
+        np.abs(weight - 50) / 50,
+        np.where(has_bmi, np.abs(bmi - 18.5) / 18.5, np.inf),
+        np.where(has_hb, np.abs(hb - min_hb) / min_hb, np.inf),
+        np.where(never, np.inf, np.abs(days - min_gap) / min_gap),
+    ])
+    margin = margins.min(axis=0)
+    cols: Cols = {
+        "age": ("i", age),
+        "weightKg": ("f1", weight),
+        "bmi": ("f3", bmi),
+        "bmiMissing": ("b", ~has_bmi),
+        "hemoglobin": ("f3", hb),
+        "hemoglobinMissing": ("b", ~has_hb),
+        "gender": _cat(["male", "female", "other"], gender),
+        "daysSinceLastDonation": ("i", days),
+        "neverDonated": ("b", never),
+        "passed": ("b", failed == 0),
+        "failedCount": ("i", failed),
+        "hardFailure": ("b", hard),
+        "minMarginRatio": ("f4", margin),
+    }
+    logit = -2.6 + 3.0 * (margin < 0.05) + 0.8 * ~has_hb + 0.6 * (gender == 2) + 0.8 * g.normal("reviewer")
+    return cols, _bernoulli(rng, logit), minute
+
+
+_GENERATORS: dict[str, Callable[..., tuple[Cols, np.ndarray, np.ndarray]]] = {
+    "donor_accept": _donor_accept,
+    "donor_show": _donor_show,
+    "donor_response_time": _donor_response_time,
+    "donor_eta": _donor_eta,
+    "inventory_delivery_ok": _inventory_delivery_ok,
+    "delivery_time": _delivery_time,
+    "urgency_priority": _urgency_priority,
+    "alert_resolves_in_window": _alert_resolves_in_window,
+    "eligibility_needs_review": _eligibility_needs_review,
+    "expansion_yield": _expansion_yield,
+}
+_BY_POSITION = {"alert_resolves_in_window", "expansion_yield"}  # rows are successive ladder rungs of one alert
+
+
+# ---------------------------------------------------------------------------
+# Chunked JSONL writer
+# ---------------------------------------------------------------------------
+
+def _literals(kind: str, v: np.ndarray) -> list[Any]:
+    """Column values whose `%s` is their JSON text (vectorised; the row loop only splices strings)."""
+    if kind == "b":
+        return np.where(v, "true", "false").tolist()
+    if kind == "i":
+        return np.asarray(v).astype(np.int64).tolist()
+    if kind == "s":
+        uniq, inv = np.unique(v.astype(str), return_inverse=True)
+        return np.asarray([json.dumps(u) for u in uniq], dtype=object)[inv].tolist()
+    return np.round(np.asarray(v, dtype=np.float64), int(kind[1:])).tolist()  # str(float) is the shortest round-trip repr
+
+
+def generate_chunk(task: str, start: int, n: int, seed: int = 0) -> tuple[Cols, np.ndarray, np.ndarray, np.ndarray]:
+    """Rows [start, start+n) of `task`: (feature columns, labels, group ids, event minutes since 2026-01-01)."""
+    idx = np.arange(start, start + n, dtype=np.int64)
+    size = GROUP_ROWS[task]
+    gid = idx // size
+    rng = np.random.default_rng(np.random.SeedSequence([seed, TASK_NAMES.index(task), start]))
+    g = _Groups(seed, task, gid)
+    gen = _GENERATORS[task]
+    cols, label, minute = gen(rng, g, idx % size) if task in _BY_POSITION else gen(rng, g)
+    return cols, label, gid, np.asarray(minute, dtype=np.float64)
+
+
+def write_task(out: Path, task: str, rows: int, seed: int = 0, chunk_rows: int = 100_000) -> dict[str, Any]:
+    """Stream `rows` rows of `task` to `<out>/<task>.jsonl`; returns {rows, features, labelSum, seconds}."""
+    t0 = time.perf_counter()
+    kind = get_task(task).kind
+    label_sum = 0.0
+    names: list[str] = []
+    with (Path(out) / f"{task}.jsonl").open("w", encoding="utf-8", newline="\n") as fh:
+        for start in range(0, rows, chunk_rows):
+            n = min(chunk_rows, rows - start)
+            cols, label, gid, minute = generate_chunk(task, start, n, seed)
+            names = list(cols)
+            body = ",".join(f'"{c}":%s' for c in names)
+            template = f'{{"task":"{task}","features":{{{body}}},"label":%s,"source":"sim","groupId":"syn{seed}-%s","eventTime":"%sZ"}}\n'
+            label_lit = _literals("f2" if kind == "regression" else "i", label)
+            when = (_EPOCH + np.round(minute * 60_000).astype("timedelta64[ms]")).astype(str)
+            lits = [_literals(k, v) for k, v in cols.values()] + [label_lit, gid.tolist(), when.tolist()]
+            fh.write("".join(template % r for r in zip(*lits)))
+            label_sum += float(np.sum(label))
+    return {"rows": rows, "features": sorted(names), "labelSum": label_sum, "seconds": time.perf_counter() - t0}
+
+
+def generate_dataset(
+    out: Path,
+    rows: int | dict[str, int],
+    tasks: list[str] | None = None,
+    seed: int = 0,
+    chunk_rows: int = 100_000,
+    jobs: int = 1,
+    dataset_version: str | None = None,
+) -> dict[str, Any]:
+    """Write one JSONL per task plus manifest.json under `out`; returns the manifest."""
+    out = Path(out)
+    out.mkdir(parents=True, exist_ok=True)
+    tasks = tasks or TASK_NAMES
+    counts = rows if isinstance(rows, dict) else {t: int(rows) for t in tasks}
+    counts = {t: counts[t] for t in tasks if counts.get(t)}
+    if jobs > 1 and len(counts) > 1:
+        with ProcessPoolExecutor(min(jobs, len(counts))) as ex:
+            futs = {t: ex.submit(write_task, out, t, n, seed, chunk_rows) for t, n in counts.items()}
+            done = {t: f.result() for t, f in futs.items()}
+    else:
+        done = {t: write_task(out, t, n, seed, chunk_rows) for t, n in counts.items()}
+    params = {"generator": GENERATOR_VERSION, "seed": seed, "groupRows": {t: GROUP_ROWS[t] for t in counts}}
+    manifest = {
+        "datasetVersion": dataset_version or out.name,
+        "createdAt": now_iso(),
+        "source": "sim",
+        "rows": {t: r["rows"] for t, r in done.items()},
+        "features": {t: r["features"] for t, r in done.items()},
+        "labelMeans": {t: round(r["labelSum"] / r["rows"], 4) for t, r in done.items()},
+        "seed": seed,
+        "priorsHash": "synth-" + hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12],
+        "priorsVersion": f"haemologix.synth/{GENERATOR_VERSION}",
+        "notes": f"haemologix.synth: chunk={chunk_rows}, group rows {params['groupRows']}",
+        "generateSeconds": {t: round(r["seconds"], 3) for t, r in done.items()},
+    }
+    (out / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--out", required=True)
+    ap.add_argument("--rows", type=int, default=100_000, help="rows per task")
+    ap.add_argument("--tasks", default=None, help="comma list (default: all)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--chunk", type=int, default=100_000, help="rows generated and written per step")
+    ap.add_argument("--jobs", type=int, default=1, help="tasks written in parallel processes")
+    ap.add_argument("--version", default=None, help="datasetVersion (default: the --out directory name)")
+    a = ap.parse_args(argv)
+    tasks = a.tasks.split(",") if a.tasks else None
+    for t in tasks or []:
+        get_task(t)
+    t0 = time.perf_counter()
+    m = generate_dataset(Path(a.out), a.rows, tasks, a.seed, a.chunk, a.jobs, a.version)
+    total = sum(m["rows"].values())
+    dt = time.perf_counter() - t0
+    print(f"[synth] {total:,} rows in {dt:.1f}s ({total / max(dt, 1e-9):,.0f} rows/s) → {a.out}")
+    print(json.dumps({"rows": m["rows"], "labelMeans": m["labelMeans"]}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
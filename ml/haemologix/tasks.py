@@ -21,6 +21,9 @@ class TaskSpec:
     log_target: bool = False
     num_classes: int = 1
     description: str = ""
+    #: categorical encoding fed to the models: "onehot" (dense indicator columns) or "codes"
+    #: (one vocab-index column per categorical; native categories in GBDT, embeddings in the MLP)
+    encoding: str = "onehot"
 
 
 TASKS: dict[str, TaskSpec] = {
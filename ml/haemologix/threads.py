@@ -0,0 +1,177 @@
+"""Thread budget for torch, OpenMP (scikit-learn HistGradientBoosting) and BLAS.
+
+    python -m haemologix.threads [--version v] [--threads 1,2,4] [--batch 1,64,512] [--workers 2]
+
+Left alone, every library sizes its pool to the whole machine, so with
+`API_WORKERS>1` each uvicorn worker runs GBDT `predict_proba` and torch matmuls
+on all cores at once. One budget per process, resolved from env (CLI flags win):
+
+    ML_THREADS          threads per process; default cores (train) or cores // API_WORKERS (serve)
+    ML_TORCH_THREADS    torch intra-op pool (MLP heads)           default ML_THREADS
+    ML_OMP_THREADS      OpenMP pool (GBDT fit / predict_proba)    default ML_THREADS
+    ML_BLAS_THREADS     BLAS pool (numpy / sklearn linear algebra) default ML_THREADS
+    ML_HEAD_WORKERS     serve: threads scoring heads at once      default min(4, ML_THREADS)
+
+Each thread that calls into torch / OpenMP / BLAS gets a team of its own, so in
+the service the pools are sized to the budget divided by `ML_HEAD_WORKERS`:
+workers × threads per head stays within `ML_THREADS`.
+
+`serve.py` exports the OpenMP/BLAS env vars before the workers start (pools read
+them at import), and both entry points call `apply_thread_budget` at startup,
+which also resizes pools that are already running via threadpoolctl. Run this
+module to time each backend of a checkpoint across thread counts and print the
+settings to use.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+_ENV_POOLS = {"omp": ("OMP_NUM_THREADS",), "blas": ("OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")}
+
+
+def cpu_count() -> int:
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:  # macOS / Windows
+        return max(1, os.cpu_count() or 1)
+
+
+def _env_int(name: str) -> int | None:
+    v = os.environ.get(name, "").strip()
+    return int(v) if v else None
+
+
+def resolve_thread_budget(role: str = "serve", threads: int | None = None, torch_threads: int | None = None,
+                          omp_threads: int | None = None, blas_threads: int | None = None) -> dict[str, int]:
+    """{torch, omp, blas} thread counts for one process of `role` ("serve" | "train")."""
+    total = threads or _env_int("ML_THREADS")
+    if total is None:
+        workers = max(1, int(os.environ.get("API_WORKERS", "1"))) if role == "serve" else 1
+        total = max(1, cpu_count() // workers)
+    return {
+        "torch": torch_threads or _env_int("ML_TORCH_THREADS") or total,
+        "omp": omp_threads or _env_int("ML_OMP_THREADS") or total,
+        "blas": blas_threads or _env_int("ML_BLAS_THREADS") or total,
+    }
+
+
+def head_workers(budget: dict[str, int]) -> int:
+    """Head-pool threads for one serving process: ML_HEAD_WORKERS, default min(4, the largest pool)."""
+    n = _env_int("ML_HEAD_WORKERS")
+    return max(1, n if n is not None else min(4, max(budget.values())))
+
+
+def share(budget: dict[str, int], workers: int) -> dict[str, int]:
+    """Each pool's share of `budget` when `workers` threads call into it at once (at least 1)."""
+    return {k: max(1, v // max(1, workers)) for k, v in budget.items()}
+
+
+def export_thread_env(budget: dict[str, int]) -> None:
+    """Set the pool env vars for processes that have not imported numpy/torch yet (uvicorn workers)."""
+    for pool, names in _ENV_POOLS.items():
+        for name in names:
+            os.environ[name] = str(budget[pool])
+
+
+def apply_thread_budget(role: str = "serve", workers: int = 1, **overrides: int | None) -> dict[str, int]:
+    """Resolve the budget and size the torch, OpenMP and BLAS pools of this process to it, split
+    across `workers` threads that score concurrently."""
+    budget = share(resolve_thread_budget(role, **overrides), workers)
+    _set_pools(budget)
+    return budget
+
+
+def _set_pools(budget: dict[str, int]) -> None:
+    import torch
+
+    torch.set_num_threads(budget["torch"])
+    try:
+        from threadpoolctl import threadpool_limits  # installed with scikit-learn
+    except ImportError:  # pragma: no cover
+        return
+    threadpool_limits(budget["omp"], user_api="openmp")
+    threadpool_limits(budget["blas"], user_api="blas")
+
+
+# ---------------------------------------------------------------------------
+# Calibration
+# ---------------------------------------------------------------------------
+
+def calibrate(model: Any, thread_counts: list[int], batch_sizes: list[int], seconds: float = 0.3) -> dict[str, Any]:
+    """Time `predictor.predict` per backend of a LoadedModel; p50 ms per batch and rows/s."""
+    rng = np.random.default_rng(0)
+    by_backend: dict[str, list[Any]] = {}
+    for lt in model.tasks.values():
+        by_backend.setdefault(lt.backend, []).append(lt)
+    out: dict[str, Any] = {}
+    for backend, tasks in sorted(by_backend.items()):
+        rows = []
+        for n in thread_counts:
+            _set_pools({"torch": n, "omp": n, "blas": n})
+            for b in batch_sizes:
+                times = []
+                for lt in tasks:
+                    X = rng.normal(size=(b, lt.pre.dim)).astype(np.float32)
+                    lt.predictor.predict(X)  # warm-up
+                    t_end = time.perf_counter() + seconds
+                    while time.perf_counter() < t_end or len(times) < 5:
+                        t0 = time.perf_counter()
+                        lt.predictor.predict(X)
+                        times.append((time.perf_counter() - t0) * 1e3)
+                p50 = float(np.median(times)) * len(tasks)  # one batch through every head of this backend
+                rows.append({"threads": n, "batch": b, "p50Ms": round(p50, 3), "rowsPerS": round(b / p50 * 1e3, 1)})
+        out[backend] = rows
+    return out
+
+
+def recommend(results: dict[str, Any], tolerance: float = 0.1) -> dict[str, int]:
+    """Per backend, the fewest threads whose latency at every batch size is within `tolerance` of the best."""
+    rec: dict[str, int] = {}
+    for backend, rows in results.items():
+        best = {b: min(r["p50Ms"] for r in rows if r["batch"] == b) for b in {r["batch"] for r in rows}}
+        for n in sorted({r["threads"] for r in rows}):
+            if all(r["p50Ms"] <= best[r["batch"]] * (1 + tolerance) for r in rows if r["threads"] == n):
+                rec[backend] = n
+                break
+    return rec
+
+
+def main(argv: list[str] | None = None) -> int:
+    from .registry import LoadedModel, get_active_version, resolve_model_dir
+
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--version", default=None, help="default: the active version")
+    ap.add_argument("--model-dir", default=None)
+    ap.add_argument("--threads", default=None, help="comma list of thread counts (default 1,2,4,.. up to the cores)")
+    ap.add_argument("--batch", default="1,64,512", help="comma list of batch sizes")
+    ap.add_argument("--workers", type=int, default=int(os.environ.get("API_WORKERS", "1")), help="planned API_WORKERS")
+    ap.add_argument("--seconds", type=float, default=0.3, help="timing window per (threads, batch, task)")
+    a = ap.parse_args(argv)
+    root = resolve_model_dir(Path(a.model_dir) if a.model_dir else None)
+    version = a.version or get_active_version(root)
+    if not version:
+        print("[threads] no --version and no active version")
+        return 2
+    cores = cpu_count()
+    counts = [int(x) for x in a.threads.split(",")] if a.threads else sorted({min(2**i, cores) for i in range(cores.bit_length())} | {cores})
+    results = calibrate(LoadedModel.load(root / version), counts, [int(x) for x in a.batch.split(",")], a.seconds)
+    rec = recommend(results)
+    per_worker = max(1, cores // max(1, a.workers))
+    env = {"ML_TORCH_THREADS": min(rec.get("mlp", per_worker), per_worker), "ML_OMP_THREADS": min(rec.get("gbdt", per_worker), per_worker)}
+    print(json.dumps({"version": version, "cores": cores, "workers": a.workers, "results": results, "recommended": rec, "env": env}, indent=2))
+    for k, v in env.items():
+        print(f"{k}={v}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,34 @@
 """Train + evaluate one or all tasks into a versioned checkpoint directory.
 
     python -m haemologix.train --version haemologix-model-1.0 --data ml/data/sim/v1 [--data ml/data/real/v1 ...]
-                               [--tasks donor_accept,donor_show] [--backend auto|mlp|gbdt]
-                               [--max-rows 300000] [--epochs 40]
+                               [--tasks donor_accept,donor_show] [--backend auto|mlp|gbdt|linear]
+                               [--latency-tolerance 0.0]
+                               [--max-rows 300000] [--epochs 40] [--stratify source,label]
+                               [--bootstrap 200] [--compare point|significant]
+                               [--quantize int8|fp16] [--quant-tolerance 0.005] [--threads N]
+                               [--encoding onehot|codes] [--ingest-jobs N]
+                               [--distill auto|mlp|linear] [--distill-tolerance 0.01] [--distill-augment 1.0]
 
 For each task:
   1. load rows from all --data dirs (sim + real mixed), group-split by scenario/request
-  2. fit preprocessor on train, fit RULES baseline, GBDT and MLP
-  3. evaluate all on the held-out test split; pick the winner per --backend policy
-     (auto = best primary metric among {mlp, gbdt} that beats rules; ties → mlp)
-  4. save preprocessor + winner + metrics.json; update model_card.json
+     (stratified by source by default, so real rows always reach the test split)
+  2. fit preprocessor on train (categoricals one-hot, or integer codes when the task's
+     `encoding` / --encoding says so), fit RULES baseline, GBDT, MLP and LINEAR
+  3. evaluate all on the held-out test split (point metrics + group-bootstrap CIs) and
+     time each head's predict; pick the winner per --backend policy (auto = best primary
+     metric among {mlp, gbdt, linear} that beats rules; mlp/gbdt ties → mlp; --compare
+     significant applies to every comparison — a candidate displaces the incumbent only
+     when its bootstrap interval clears the incumbent's estimate, so differences inside
+     the interval are ties, kept by the earlier of gbdt, mlp, linear); with
+     --latency-tolerance T the fastest candidate within T (relative) of the best wins
+  4. optionally quantize an MLP winner (--quantize); the quantized head is kept next to
+     mlp.pt only if its test primary metric is within --quant-tolerance (relative) of
+     the float32 head — the comparison lands in metrics.json either way
+  5. optionally distill a GBDT winner into a small MLP / linear student (--distill, see
+     distill.py); the student is kept next to the GBDT and served in its place only if its
+     test primary metric is within --distill-tolerance (relative) of the teacher
+  6. save preprocessor + winner + metrics.json; update model_card.json
+  7. pack the version into model.hpack (single-file artifact the service maps at load)
 
 The model card records whether each task beat the rules baseline; the approval
 gate (scripts/ml/approveModel.ts) refuses versions where any task does not.
@@ -19,6 +38,7 @@ from __future__ import annotations
 
 import argparse
 import json
+import shutil
 import sys
 import time
 from pathlib import Path
@@ -26,11 +46,15 @@ from typing import Any
 
 import numpy as np
 
-from .data import TabularPreprocessor, describe, group_split, inverse_label, labels_for, load_manifest, load_task_rows
-from .metrics import compute_metrics, is_better, permutation_importance, primary
-from .models import GbdtPredictor, MlpPredictor, RulesPredictor
-from .registry import ModelCard, now_iso, resolve_model_dir
-from .tasks import TASK_NAMES, get_task
+from .data import TabularPreprocessor, describe, group_codes, group_split_indices, inverse_label, labels_for, load_manifest, load_task_rows, sample_task_rows
+from .distill import STUDENTS, distill_head, latency
+from .metrics import bootstrap_metrics, compute_metrics, is_better, permutation_importance, primary
+from .models import GbdtPredictor, LinearPredictor, MlpPredictor, Predictor, RulesPredictor
+from .pack import pack_version
+from .registry import LoadedModel, ModelCard, now_iso, resolve_model_dir, update_index
+from .tasks import TASK_NAMES, TaskSpec, get_task
+from .threads import apply_thread_budget
+from .warm import load_source, mlp_init_state
 
 
 def _log(msg: str) -> None:
@@ -40,6 +64,38 @@ def _log(msg: str) -> None:
         print(f"[train] {msg}".encode("ascii", "replace").decode(), flush=True)
 
 
+class _Stages:
+    """Wall-clock seconds per training stage; `lap(name)` closes the stage that just ran."""
+
+    def __init__(self) -> None:
+        self.seconds: dict[str, float] = {}
+        self._t = time.perf_counter()
+
+    def lap(self, stage: str) -> None:
+        now = time.perf_counter()
+        self.seconds[stage] = round(self.seconds.get(stage, 0.0) + now - self._t, 3)
+        self._t = now
+
+
+def pick_winner(spec: TaskSpec, candidates: dict[str, dict[str, Any]], compare: str = "point") -> str | None:
+    """Best candidate by test metrics under `compare` (see `is_better`); a later candidate displaces the
+    incumbent only when better, and mlp/gbdt ties go to mlp (the custom model): within 0.5% of the
+    metric (point), or when gbdt's interval does not clear mlp's estimate (significant)."""
+    winner: str | None = None
+    for name, m in candidates.items():
+        if winner is None or is_better(spec, m, candidates[winner], mode=compare):
+            winner = name
+    if "mlp" in candidates and winner == "gbdt":
+        pm, pg = primary(spec, candidates["mlp"]), primary(spec, candidates["gbdt"])
+        if compare == "significant":
+            tie = not is_better(spec, candidates["gbdt"], candidates["mlp"], mode="significant")
+        else:
+            tie = pm is not None and pg is not None and abs(pm - pg) <= 0.005 * max(abs(pg), 1e-9)
+        if tie:
+            winner = "mlp"
+    return winner
+
+
 def train_task(
     task: str,
     data_dirs: list[Path],
@@ -49,56 +105,164 @@ def train_task(
     epochs: int = 40,
     seed: int = 7,
     quick: bool = False,
+    stratify: tuple[str, ...] = ("source",),
+    n_boot: int = 200,
+    compare: str = "point",
+    quantize: str | None = None,
+    quant_tol: float = 0.005,
+    encoding: str | None = None,
+    warm_from: Path | None = None,
+    warm_compare: bool = False,
+    ingest_jobs: int | None = 1,
+    distill: str | None = None,
+    distill_tol: float = 0.01,
+    distill_augment: float = 1.0,
+    latency_tol: float = 0.0,
 ) -> dict[str, Any]:
     spec = get_task(task)
     t0 = time.time()
-    rows = load_task_rows(data_dirs, task)
+    st = _Stages()
+    if max_rows:  # sampled in the loader: whole groups, stratified like the split, deterministic under `seed`
+        rows, sampled = sample_task_rows(data_dirs, task, max_rows, seed=seed, stratify=stratify,
+                                         discrete_labels=spec.kind != "regression", jobs=ingest_jobs)
+    else:
+        rows, sampled = load_task_rows(data_dirs, task, jobs=ingest_jobs), None
     if not rows:
         _log(f"{task}: no rows found in {[str(d) for d in data_dirs]} — skipping")
         return {"task": task, "skipped": True}
-    if max_rows and len(rows) > max_rows:
-        rng = np.random.default_rng(seed)
-        idx = rng.choice(len(rows), max_rows, replace=False)
-        rows = [rows[i] for i in sorted(idx)]
-    train, val, test = group_split(rows, seed=seed)
-    _log(f"{task}: rows={len(rows)} train={len(train)} val={len(val)} test={len(test)}  {describe(rows, task)}")
-
-    pre = TabularPreprocessor(task).fit(train)
-    Xtr, Xva, Xte = pre.transform(train), pre.transform(val), pre.transform(test)
-    ytr, yva, yte = labels_for(train, spec), labels_for(val, spec), labels_for(test, spec)
-    yte_nat = np.asarray([float(r["label"]) for r in test], dtype=np.float32)
+    if sampled and sampled["kept"] < sampled["seen"]:
+        _log(f"{task}: sampled {sampled['kept']} of {sampled['seen']} rows (whole groups)")
+    st.lap("load")
+    itr, iva, ite = group_split_indices(rows, seed=seed, stratify=stratify)
+    st.lap("split")
+    _log(f"{task}: rows={len(rows)} train={len(itr)} val={len(iva)} test={len(ite)}  {describe(rows, task)}")
+
+    # warm start from a previous version's winner (see warm.py); a continued GBDT splits on the
+    # source preprocessor's columns, so that task keeps the source preprocessor unchanged
+    src = load_source(warm_from, task) if warm_from is not None else None
+    warm: dict[str, Any] | None = None
+    if src is not None:
+        warm = {"from": src.version, "backend": src.backend, "used": False}
+        if backend not in ("auto", src.backend):
+            warm["reason"], src = f"--backend {backend} excludes the source's {src.backend} head", None
+        elif src.backend == "gbdt" and (encoding or spec.encoding) != src.pre.encoding:
+            warm["reason"], src = f"encoding changed ({src.pre.encoding} → {encoding or spec.encoding})", None
+
+    # transform once, then slice the matrices by split index (no per-split row lists)
+    if src is not None and src.backend == "gbdt":
+        pre = src.pre
+    else:
+        pre = TabularPreprocessor(task, encoding=encoding or spec.encoding).fit(rows[i] for i in itr)
+    t_x = time.perf_counter()
+    X, y = pre.transform(rows), labels_for(rows, spec)
+    enc = {"mode": pre.encoding, "dim": pre.dim, "onehot_dim": pre.onehot_dim, "transform_s": round(time.perf_counter() - t_x, 3),
+           "matrix_mb": round(X.nbytes / 1e6, 2), "onehot_matrix_mb": round(len(X) * pre.onehot_dim * 4 / 1e6, 2), "fit_s": {}}
+    cats = {"cat_cols": pre.code_columns, "cat_cards": pre.cardinalities}
+    Xtr, Xva, Xte = X[itr], X[iva], X[ite]
+    ytr, yva, yte = y[itr], y[iva], y[ite]
+    yte_nat = np.asarray([float(rows[i]["label"]) for i in ite], dtype=np.float32)
+    gte = group_codes(rows)[0][ite]
+    st.lap("preprocess")
+    boot = {"n_boot": 50 if quick else n_boot, "alpha": 0.05, "seed": seed, "groups": int(len(np.unique(gte)))}
+
+    def evaluate(pred: np.ndarray) -> dict[str, Any]:
+        m = compute_metrics(spec, yte, pred, yte_nat)
+        ci = bootstrap_metrics(spec, yte, pred, gte, yte_nat, n_boot=boot["n_boot"], alpha=boot["alpha"], seed=seed)
+        return m | {"ci": ci} if ci else m
 
     # --- rules baseline -------------------------------------------------------
     rules = RulesPredictor(spec).fit(Xtr, ytr)
     if spec.kind == "regression" and "etaMinutes" in pre.numeric_cols:
         j = pre.numeric_cols.index("etaMinutes")
         rules.with_eta_feature(j, pre.num_mean["etaMinutes"], pre.num_std["etaMinutes"])
-    m_rules = compute_metrics(spec, yte, rules.predict(Xte), yte_nat)
+    m_rules = evaluate(rules.predict(Xte))
+    st.lap("rules")
     _log(f"{task}: rules   {spec.primary_metric}={primary(spec, m_rules)}")
 
+    warm_head: tuple[Any, dict[str, Any]] | None = None
+    if src is not None and warm is not None:
+        t_f = time.perf_counter()
+        if src.backend == "mlp":
+            wm = MlpPredictor(spec, epochs=3 if quick else max(3, epochs // 4), lr=5e-4, seed=seed, **cats)
+            init, remap = mlp_init_state(src.pre, src.predictor, pre, wm)
+            warm |= remap
+            if init is not None:
+                wm.init_state = init
+                warm_head = (wm.fit(Xtr, ytr, Xva, yva), {})
+        else:
+            wg = GbdtPredictor(spec, seed=seed, max_iter=40 if quick else 100, **cats)
+            wg.init_est = src.predictor.est
+            try:
+                warm_head = (wg.fit(Xtr, ytr, Xva, yva), {})
+            except ValueError as e:  # e.g. a class the source never saw
+                warm["reason"] = str(e)
+        if warm_head is not None:
+            warm |= {"used": True, "fit_s": round(time.perf_counter() - t_f, 2)}
+            st.lap("fit_warm")
+            warm_head = (warm_head[0], evaluate(warm_head[0].predict(Xte)))
+            st.lap("eval_warm")
+            _log(f"{task}: warm {src.backend} from {src.version}  {spec.primary_metric}={primary(spec, warm_head[1])}  ({warm['fit_s']}s)")
+    warmed = src.backend if warm_head is not None and src is not None else None
+
     candidates: dict[str, tuple[Any, dict[str, Any]]] = {}
-    if backend in ("auto", "gbdt"):
-        g = GbdtPredictor(spec, seed=seed, max_iter=120 if quick else 300).fit(Xtr, ytr, Xva, yva)
-        m_g = compute_metrics(spec, yte, g.predict(Xte), yte_nat)
+    if backend in ("auto", "gbdt") and (warmed != "gbdt" or warm_compare):
+        t_f = time.perf_counter()
+        g = GbdtPredictor(spec, seed=seed, max_iter=120 if quick else 300, **cats).fit(Xtr, ytr, Xva, yva)
+        enc["fit_s"]["gbdt"] = round(time.perf_counter() - t_f, 2)
+        st.lap("fit_gbdt")
+        m_g = evaluate(g.predict(Xte))
+        st.lap("eval_gbdt")
         candidates["gbdt"] = (g, m_g)
         _log(f"{task}: gbdt    {spec.primary_metric}={primary(spec, m_g)}  ({time.time() - t0:.0f}s)")
-    if backend in ("auto", "mlp"):
-        mlp = MlpPredictor(spec, epochs=8 if quick else epochs, seed=seed).fit(Xtr, ytr, Xva, yva)
-        m_m = compute_metrics(spec, yte, mlp.predict(Xte), yte_nat)
+    if backend in ("auto", "mlp") and (warmed != "mlp" or warm_compare):
+        t_f = time.perf_counter()
+        mlp = MlpPredictor(spec, epochs=8 if quick else epochs, seed=seed, **cats).fit(Xtr, ytr, Xva, yva)
+        enc["fit_s"]["mlp"] = round(time.perf_counter() - t_f, 2)
+        st.lap("fit_mlp")
+        m_m = evaluate(mlp.predict(Xte))
+        st.lap("eval_mlp")
         candidates["mlp"] = (mlp, m_m)
         _log(f"{task}: mlp     {spec.primary_metric}={primary(spec, m_m)}  ({time.time() - t0:.0f}s)")
+    if backend in ("auto", "linear"):
+        t_f = time.perf_counter()
+        lin = LinearPredictor(spec, **cats).fit(Xtr, ytr, Xva, yva)
+        enc["fit_s"]["linear"] = round(time.perf_counter() - t_f, 2)
+        st.lap("fit_linear")
+        m_l = evaluate(lin.predict(Xte))
+        st.lap("eval_linear")
+        candidates["linear"] = (lin, m_l)
+        _log(f"{task}: linear  {spec.primary_metric}={primary(spec, m_l)}  l2={lin.l2}  ({time.time() - t0:.0f}s)")
+
+    if warmed is not None and warm is not None and warm_head is not None:
+        cold = candidates.get(warmed)
+        warm["primary"] = primary(spec, warm_head[1])
+        if cold is not None:  # --warm-compare: the cold fit ran too
+            warm |= {"cold_fit_s": enc["fit_s"][warmed], "time_saved_s": round(enc["fit_s"][warmed] - warm["fit_s"], 2),
+                     "cold_primary": primary(spec, cold[1])}
+            warm["delta"] = None if warm["primary"] is None or warm["cold_primary"] is None else warm["primary"] - warm["cold_primary"]
+        else:  # estimate against the source's own fit of this head
+            warm["previous_fit_s"] = ((src.metrics.get("encoding") or {}).get("fit_s") or {}).get(warmed) if src else None
+        warm["chosen"] = cold is None or not is_better(spec, cold[1], warm_head[1], mode=compare)
+        if warm["chosen"]:
+            candidates[warmed] = warm_head
 
     # --- pick winner ----------------------------------------------------------
-    winner_name, (winner, winner_metrics) = None, (None, {})
-    for name, (pred, m) in candidates.items():
-        if winner is None or is_better(spec, m, winner_metrics):
-            winner_name, winner, winner_metrics = name, pred, m
-    # ties within 0.5% of the metric → prefer mlp (the custom model)
-    if "mlp" in candidates and winner_name == "gbdt":
-        pm, pg = primary(spec, candidates["mlp"][1]), primary(spec, candidates["gbdt"][1])
-        if pm is not None and pg is not None and abs(pm - pg) <= 0.005 * max(abs(pg), 1e-9):
-            winner_name, (winner, winner_metrics) = "mlp", candidates["mlp"]
-    beats_rules = is_better(spec, winner_metrics, m_rules)
+    winner_name = pick_winner(spec, {n: m for n, (_, m) in candidates.items()}, compare)
+    winner, winner_metrics = candidates[winner_name] if winner_name else (None, {})
+    # latency preference: the fastest head whose primary metric is within `latency_tol` of the winner's
+    lat = {name: latency(pred, Xte) for name, (pred, _) in candidates.items()}
+    selection: dict[str, Any] = {"latency_tolerance": latency_tol, "best": winner_name, "latency": lat}
+    pw = primary(spec, winner_metrics)
+    if latency_tol > 0 and pw is not None and len(candidates) > 1:
+        close = [n for n, (_, m) in candidates.items()
+                 if not is_better(spec, winner_metrics, m, min_delta=latency_tol * abs(pw), mode=compare)]
+        fastest = min(close, key=lambda n: lat[n]["ms_row"])
+        if fastest != winner_name:
+            _log(f"{task}: {fastest} within {latency_tol:.1%} of {winner_name} and faster "
+                 f"({lat[fastest]['ms_row']} vs {lat[winner_name]['ms_row']} ms/row)")
+            winner_name, (winner, winner_metrics) = fastest, candidates[fastest]
+    st.lap("latency")
+    beats_rules = is_better(spec, winner_metrics, m_rules, mode=compare)
     _log(f"{task}: winner={winner_name} beats_rules={beats_rules}")
 
     # --- importance -----------------------------------------------------------
@@ -109,20 +273,66 @@ def train_task(
         importance = winner.feature_importance(names)
     elif winner is not None:
         importance = winner.feature_importance(names)
+    st.lap("importance")
+
+    # --- quantization ---------------------------------------------------------
+    quant: dict[str, Any] | None = None
+    qhead: MlpPredictor | None = None
+    if quantize and isinstance(winner, MlpPredictor):
+        qhead = winner.quantized(quantize)
+        t_f = time.perf_counter()
+        winner.predict(Xte)
+        t_q = time.perf_counter()
+        m_q = compute_metrics(spec, yte, qhead.predict(Xte), yte_nat)
+        t_e = time.perf_counter()
+        pf, pq = primary(spec, winner_metrics), primary(spec, m_q)
+        # refused when the float head beats the quantized one by more than the tolerance
+        accepted = pf is not None and pq is not None and not is_better(spec, winner_metrics, m_q, min_delta=quant_tol * abs(pf))
+        quant = {"mode": quantize, "accepted": bool(accepted), "tolerance": quant_tol, "primary_float": pf, "primary_quant": pq,
+                 "delta": None if pf is None or pq is None else pq - pf,
+                 "ms_float": round((t_q - t_f) * 1e3, 2), "ms_quant": round((t_e - t_q) * 1e3, 2), "metrics": m_q}
+        _log(f"{task}: {quantize}    {spec.primary_metric}={pq}  accepted={accepted}")
+        st.lap("quantize")
+
+    # --- distillation ---------------------------------------------------------
+    distilled: dict[str, Any] | None = None
+    student: Predictor | None = None
+    if distill and isinstance(winner, GbdtPredictor):
+        student, distilled = distill_head(spec, pre, winner, winner_metrics, Xtr, Xva, Xte, yte, yte_nat,
+                                          students=STUDENTS if distill == "auto" else (distill,), tolerance=distill_tol,
+                                          augment=distill_augment, epochs=20 if quick else epochs, seed=seed)
+        tried = "  ".join(f"{k} {spec.primary_metric}={c['primary']}" for k, c in distilled["candidates"].items())
+        speedup = f"  ×{distilled['speedup_row']} per row" if student is not None else ""
+        _log(f"{task}: distill -> {distilled['student'] or 'refused'}  {tried}  (teacher {distilled['primary_teacher']}){speedup}")
+        st.lap("distill")
 
     # --- save -----------------------------------------------------------------
     td = version_dir / task
     td.mkdir(parents=True, exist_ok=True)
     pre.save(td / "preprocessor.json")
     assert winner is not None and winner_name is not None
+    for stale in td.glob("mlp_*.pt"):  # a previous training run's quantized head
+        stale.unlink()
     winner.save(td)
+    shutil.rmtree(td / "student", ignore_errors=True)  # a previous training run's student
+    if student is not None:
+        student.save(td / "student")
+        (td / "student" / "backend.txt").write_text(student.backend, encoding="utf-8")
+    if quant is not None and qhead is not None:
+        quant["bytes_float"] = (td / "mlp.pt").stat().st_size
+        if quant["accepted"]:
+            quant["bytes_quant"] = qhead.save_quantized(td).stat().st_size
+        winner.quant_info = quant
+        winner.save_config(td)  # mlp.pt is already on disk; only the report in mlp.json changes
     (td / "backend.txt").write_text(winner_name, encoding="utf-8")
     rules.save(td / "rules_baseline")
+    st.lap("save")
     result = {
         "task": task,
         "kind": spec.kind,
         "backend": winner_name,
-        "rows": {"total": len(rows), "train": len(train), "val": len(val), "test": len(test)},
+        "rows": {"total": len(rows), "train": len(itr), "val": len(iva), "test": len(ite)},
+        "sampling": sampled,
         "features": names,
         "n_features": len(names),
         "metrics": winner_metrics,
@@ -130,7 +340,15 @@ def train_task(
         "baseline_metrics": m_rules,
         "primary_metric": spec.primary_metric,
         "beats_baseline": bool(beats_rules),
+        "comparison": compare,
+        "selection": selection,
+        "bootstrap": boot,
         "feature_importance": importance,
+        "quantization": quant,
+        "distillation": distilled,
+        "encoding": enc,
+        "warm_start": warm,
+        "stages": st.seconds,
         "trained_at": now_iso(),
         "seconds": round(time.time() - t0, 1),
     }
@@ -149,6 +367,19 @@ def train_version(
     notes: str = "",
     seed: int = 7,
     quick: bool = False,
+    stratify: tuple[str, ...] = ("source",),
+    n_boot: int = 200,
+    compare: str = "point",
+    quantize: str | None = None,
+    quant_tol: float = 0.005,
+    encoding: str | None = None,
+    warm_from: str | None = None,
+    warm_compare: bool = False,
+    ingest_jobs: int | None = 1,
+    distill: str | None = None,
+    distill_tol: float = 0.01,
+    distill_augment: float = 1.0,
+    latency_tol: float = 0.0,
 ) -> ModelCard:
     root = resolve_model_dir(model_dir)
     version_dir = root / version
@@ -165,11 +396,19 @@ def train_version(
     card["dataDirs"] = [str(d) for d in data_dirs]
     card["priorsHash"] = [m.get("priorsHash") for m in manifests]
     card["seed"] = seed
+    card["splitStratify"] = list(stratify)
+    warm_dir = root / warm_from if warm_from else None
+    if warm_dir is not None and not (warm_dir / "model_card.json").exists():
+        _log(f"warm start: no version {warm_from} under {root}; training cold")
+        warm_dir = None
     card.save(version_dir)
 
     for task in tasks or TASK_NAMES:
         try:
-            res = train_task(task, data_dirs, version_dir, backend=backend, max_rows=max_rows, epochs=epochs, seed=seed, quick=quick)
+            res = train_task(task, data_dirs, version_dir, backend=backend, max_rows=max_rows, epochs=epochs, seed=seed, quick=quick,
+                             stratify=stratify, n_boot=n_boot, compare=compare, quantize=quantize, quant_tol=quant_tol, encoding=encoding,
+                             warm_from=warm_dir, warm_compare=warm_compare, ingest_jobs=ingest_jobs, distill=distill,
+                             distill_tol=distill_tol, distill_augment=distill_augment, latency_tol=latency_tol)
         except Exception as e:  # keep going; the card records the failure
             _log(f"{task}: FAILED {e!r}")
             res = {"task": task, "error": repr(e)}
@@ -182,12 +421,36 @@ def train_version(
     card["evaluatedAt"] = now_iso()
     card["allBeatBaseline"] = len(failing) == 0
     card["tasksNotBeatingBaseline"] = failing
+    if warm_dir is not None:
+        per_task = {t: r["warm_start"] for t, r in card["tasks"].items() if r.get("warm_start")}
+        card["warmStart"] = {
+            "from": warm_from,
+            "compare": warm_compare,
+            "tasks": per_task,
+            "fitSeconds": round(sum(w.get("fit_s", 0.0) for w in per_task.values() if w.get("used")), 2),
+            "timeSavedSeconds": round(sum(w["time_saved_s"] for w in per_task.values() if "time_saved_s" in w), 2) if warm_compare else None,
+        }
+    if distill:
+        card["distillation"] = {
+            "students": list(STUDENTS) if distill == "auto" else [distill],
+            "tolerance": distill_tol,
+            "tasks": {t: {k: r["distillation"].get(k) for k in ("teacher", "student", "accepted", "primary_teacher", "primary_student",
+                                                                 "delta", "speedup_row", "speedup_batch")}
+                      for t, r in card["tasks"].items() if r.get("distillation")},
+        }
     lim = list(card.get("limitations") or [])
     lim.append("Trained on simulator data (priors " + ",".join(str(p) for p in card["priorsHash"]) + "); calibrate against real outcomes before authority mode.")
     if failing:
         lim.append(f"Tasks not beating rules baseline: {failing}")
     card["limitations"] = sorted(set(lim))
     card.save(version_dir)
+    load_s = None
+    if trained:
+        _log(f"packed -> {pack_version(version_dir)}")
+        t0 = time.perf_counter()
+        LoadedModel.load(version_dir)
+        load_s = time.perf_counter() - t0
+    update_index(root, version, load_seconds=load_s)
     _log(f"version {version} evaluated -> {version_dir}  allBeatBaseline={card['allBeatBaseline']}")
     return card
 
@@ -197,17 +460,37 @@ def main(argv: list[str] | None = None) -> int:
     ap.add_argument("--version", required=True)
     ap.add_argument("--data", action="append", required=True, help="dataset dir (repeatable)")
     ap.add_argument("--tasks", default=None, help="comma list; default all")
-    ap.add_argument("--backend", default="auto", choices=["auto", "mlp", "gbdt"])
+    ap.add_argument("--backend", default="auto", choices=["auto", "mlp", "gbdt", "linear"])
+    ap.add_argument("--latency-tolerance", type=float, default=0.0,
+                    help="auto: pick the fastest candidate within this relative primary-metric distance of the best")
     ap.add_argument("--max-rows", type=int, default=None)
     ap.add_argument("--epochs", type=int, default=40)
     ap.add_argument("--model-dir", default=None)
     ap.add_argument("--notes", default="")
     ap.add_argument("--seed", type=int, default=7)
     ap.add_argument("--quick", action="store_true", help="tiny epochs/iters for smoke tests")
+    ap.add_argument("--stratify", default="source", help="group-split strata: comma list of source,label ('' = none)")
+    ap.add_argument("--bootstrap", type=int, default=200, help="group-bootstrap replicates for metric CIs (0 = off)")
+    ap.add_argument("--compare", default="point", choices=["point", "significant"],
+                    help="winner / beats-baseline rule: point estimates, or bootstrap-interval significance")
+    ap.add_argument("--quantize", default=None, choices=["int8", "fp16"], help="post-training quantization of an MLP winner")
+    ap.add_argument("--quant-tolerance", type=float, default=0.005, help="max relative primary-metric regression for the quantized head")
+    ap.add_argument("--threads", type=int, default=None, help="torch/OpenMP/BLAS threads (default ML_THREADS or all cores)")
+    ap.add_argument("--encoding", default=None, choices=["onehot", "codes"], help="categorical encoding for every task (default: per task)")
+    ap.add_argument("--warm-from", default=None, help="start each task from this version's saved head (see warm.py)")
+    ap.add_argument("--warm-compare", action="store_true", help="also fit cold and record time saved / metric delta")
+    ap.add_argument("--ingest-jobs", type=int, default=1, help="processes parsing each task's JSONL (0 = all cores)")
+    ap.add_argument("--distill", default=None, choices=["auto", *STUDENTS], help="distill GBDT winners into a student head (see distill.py)")
+    ap.add_argument("--distill-tolerance", type=float, default=0.01, help="max relative primary-metric regression for the student")
+    ap.add_argument("--distill-augment", type=float, default=1.0, help="synthetic rows per training row for the student")
     a = ap.parse_args(argv)
+    _log(f"threads {apply_thread_budget('train', threads=a.threads)}")
     card = train_version(
         a.version, [Path(d) for d in a.data], a.tasks.split(",") if a.tasks else None, a.backend, a.max_rows,
         a.epochs, Path(a.model_dir) if a.model_dir else None, a.notes, a.seed, a.quick,
+        tuple(s for s in a.stratify.split(",") if s), a.bootstrap, a.compare, a.quantize, a.quant_tolerance, a.encoding,
+        a.warm_from, a.warm_compare, a.ingest_jobs or None, a.distill, a.distill_tolerance, a.distill_augment,
+        a.latency_tolerance,
     )
     print(json.dumps({t: {"backend": r.get("backend"), r.get("primary_metric", "metric"): primary(get_task(t), r.get("metrics", {})) if r.get("metrics") else None,
                           "beats_baseline": r.get("beats_baseline")} for t, r in card["tasks"].items()}, indent=2))
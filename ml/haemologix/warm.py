@@ -0,0 +1,134 @@
+"""Warm-start retraining from a previous version's task heads.
+
+`train_task(..., warm_from=<version dir>)` starts each task from that version's
+saved winner instead of from scratch:
+
+  mlp   the new `_Mlp` is initialised from the old `mlp.pt` and fine-tuned with a
+        shorter, lower-learning-rate schedule. When the preprocessor layout moved
+        (columns added or dropped, numeric mean/std refitted, vocabularies grown)
+        the first layer is remapped by feature name: numeric weights are rescaled
+        so the old head computes the same function of the raw value under the new
+        standardisation, new columns start at zero weight, dropped ones are cut,
+        and code embeddings are re-indexed by category value. Hidden sizes must
+        match and at least `MIN_OVERLAP` of the new input units must map, else
+        the task trains cold.
+  gbdt  boosting continues from the stored estimator (`warm_start=True`, more
+        iterations on the new rows). Tree thresholds live in the old
+        preprocessor's space, so the warm GBDT keeps that preprocessor — it is
+        what gets saved with the head if it wins.
+
+Only the backend that won in the source version can be warm-started (that is the
+only one it saved); the other candidates train cold as usual, and a linear winner
+always refits from scratch (it fits in seconds).
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import torch
+
+from .data import TabularPreprocessor
+from .models import GbdtPredictor, MlpPredictor, Predictor, _emb_dim
+from .tasks import get_task
+
+#: share of the new first-layer input units that must map onto old ones
+MIN_OVERLAP = 0.5
+
+
+@dataclass
+class WarmSource:
+    version: str
+    task: str
+    backend: str
+    pre: TabularPreprocessor
+    predictor: Predictor
+    metrics: dict[str, Any]
+
+
+def load_source(version_dir: Path, task: str) -> WarmSource | None:
+    """The saved winner of `task` in `version_dir` (float weights, never a quantized copy); None if not warm-startable."""
+    td = Path(version_dir) / task
+    if not (td / "backend.txt").exists():
+        return None
+    backend = (td / "backend.txt").read_text(encoding="utf-8").strip()
+    spec = get_task(task)
+    if backend == "mlp":
+        cfg = json.loads((td / "mlp.json").read_text(encoding="utf-8"))
+        predictor: Predictor = MlpPredictor.from_state(spec, cfg, torch.load(td / "mlp.pt", map_location="cpu"))
+    elif backend == "gbdt":
+        predictor = GbdtPredictor.load(td, spec)
+    else:
+        return None
+    metrics = json.loads((td / "metrics.json").read_text(encoding="utf-8")) if (td / "metrics.json").exists() else {}
+    return WarmSource(Path(version_dir).name, task, backend, TabularPreprocessor.load(td / "preprocessor.json"), predictor, metrics)
+
+
+def _input_units(pre: TabularPreprocessor) -> list[tuple[Any, ...]]:
+    """Keys of the first Linear layer's inputs, in `_Mlp` order: dense matrix columns, then embedding dims."""
+    units: list[tuple[Any, ...]] = [("num", c) for c in pre.numeric_cols] + [("bool", b) for b in pre.bool_cols]
+    if pre.encoding == "codes":
+        for c in pre.cat_cols:
+            width = _emb_dim(len(pre.cat_vocab[c]))
+            units += [("emb", c, width, k) for k in range(width)]  # dims only line up at equal width
+    else:
+        units += [("onehot", c, v) for c in pre.cat_cols for v in pre.cat_vocab[c]]
+    return units
+
+
+def mlp_init_state(old_pre: TabularPreprocessor, old: MlpPredictor, new_pre: TabularPreprocessor,
+                   new: MlpPredictor) -> tuple[dict[str, torch.Tensor] | None, dict[str, Any]]:
+    """Initial (partial) state for `new`'s network over `new_pre`'s layout, carrying `old`'s weights;
+    (None, report) if incompatible. Embeddings of categoricals the source never saw are left out."""
+    assert old.model is not None
+    if tuple(old.hidden) != tuple(new.hidden) or old.out_dim != new.out_dim:
+        return None, {"reason": f"architecture changed (hidden {list(old.hidden)} → {list(new.hidden)})"}
+    old_units, new_units = _input_units(old_pre), _input_units(new_pre)
+    where = {u: i for i, u in enumerate(old_units)}
+    mapped = [u in where for u in new_units]
+    overlap = sum(mapped) / max(1, len(new_units))
+    if overlap < MIN_OVERLAP:
+        return None, {"reason": f"only {overlap:.0%} of the input layout maps onto the source", "overlap": round(overlap, 3)}
+
+    src = {k: v.detach().cpu().clone() for k, v in old.model.state_dict().items()}
+    w_old, b = src["net.0.weight"], src["net.0.bias"].clone()
+    w = torch.zeros((w_old.shape[0], len(new_units)), dtype=w_old.dtype)
+    rescaled = 0
+    for j, u in enumerate(new_units):
+        i = where.get(u)
+        if i is None:
+            continue
+        if u[0] == "num":  # z_old = a·z_new + s, so W·z_old = (a·W)·z_new + W·s
+            c = u[1]
+            a = new_pre.num_std[c] / old_pre.num_std[c]
+            s = (new_pre.num_mean[c] - old_pre.num_mean[c]) / old_pre.num_std[c]
+            w[:, j] = w_old[:, i] * a
+            b += w_old[:, i] * s
+            rescaled += int(a != 1.0 or s != 0.0)
+        else:
+            w[:, j] = w_old[:, i]
+    state = {k: v for k, v in src.items() if not k.startswith("emb.")}
+    state["net.0.weight"], state["net.0.bias"] = w, b
+    for j, c in enumerate(new_pre.cat_cols if new_pre.encoding == "codes" else []):
+        if old_pre.encoding != "codes" or c not in old_pre.cat_cols:
+            continue  # a new categorical keeps its fresh embedding
+        old_vocab = old_pre.cat_vocab[c]
+        old_table = src[f"emb.{old_pre.cat_cols.index(c)}.weight"]
+        if old_table.shape[1] != _emb_dim(len(new_pre.cat_vocab[c])):
+            continue
+        unknown = old_table[len(old_vocab)]  # last row: unknown / missing
+        state[f"emb.{j}.weight"] = torch.stack([old_table[old_vocab.index(v)] if v in old_vocab else unknown
+                                                for v in new_pre.cat_vocab[c]] + [unknown])
+    old_names, new_names = set(old_pre.feature_names), set(new_pre.feature_names)
+    report = {
+        "mode": "exact" if old_units == new_units and not rescaled else "remapped",
+        "overlap": round(overlap, 3),
+        "rescaled": rescaled,
+        "added": sorted(new_names - old_names),
+        "dropped": sorted(old_names - new_names),
+    }
+    return state, report
+
@@ -13,6 +13,10 @@ except Exception:  # pragma: no cover
     pass
 
 if __name__ == "__main__":
+    from haemologix.threads import export_thread_env, head_workers, resolve_thread_budget, share
+
+    budget = resolve_thread_budget("serve")
+    export_thread_env(share(budget, head_workers(budget)))  # inherited by every worker before it imports numpy/torch
     uvicorn.run(
         "haemologix.api:app",
         host=os.environ.get("API_HOST", "0.0.0.0"),
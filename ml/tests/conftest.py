@@ -35,9 +35,7 @@ def _synthetic_rows(task: str, n: int, seed: int = 0) -> list[dict]:
     return rows
 
 
-@pytest.fixture
-def synth_dataset(tmp_path: Path) -> Path:
-    d = tmp_path / "sim" / "vtest"
+def _write_synth_dataset(d: Path) -> Path:
     d.mkdir(parents=True)
     counts = {}
     for task, n in [("donor_accept", 1500), ("donor_eta", 800), ("urgency_priority", 900), ("donor_show", 600)]:
@@ -50,6 +48,17 @@ def synth_dataset(tmp_path: Path) -> Path:
     return d
 
 
+@pytest.fixture
+def synth_dataset(tmp_path: Path) -> Path:
+    return _write_synth_dataset(tmp_path / "sim" / "vtest")
+
+
+@pytest.fixture(scope="module")
+def module_synth_dataset(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """`synth_dataset` shared by a module's tests (e.g. to train one version for all of them)."""
+    return _write_synth_dataset(tmp_path_factory.mktemp("sim") / "vtest")
+
+
 @pytest.fixture
 def model_dir(tmp_path: Path) -> Path:
     d = tmp_path / "checkpoints"
@@ -1,18 +1,39 @@
+import gzip
 import json
 import os
+import shutil
+import threading
+import time
 from pathlib import Path
 
+import httpx
 import numpy as np
 import pytest
 from fastapi.testclient import TestClient
 
 from haemologix import api as api_module
-from haemologix.data import TabularPreprocessor, group_split, labels_for
-from haemologix.metrics import compute_metrics, expected_calibration_error
-from haemologix.models import GbdtPredictor, MlpPredictor, RulesPredictor
-from haemologix.registry import LoadedModel, ModelCard, get_active_version, list_versions, set_active_version
+from haemologix import profiler
+from haemologix import router as router_module
+from haemologix.calib import CalibrationOverlay, RecentScores, _read_outcomes, collect, join_log, record_outcomes
+from haemologix.bench import case_key, compare, ensure_dataset, run_case
+from haemologix.data import FeatureColumns, TabularPreprocessor, _row_fields, group_split, group_split_indices, labels_for, load_task_rows, sample_task_rows
+from haemologix.distill import augment_rows
+from haemologix.drift import DriftMonitor
+from haemologix.explain import top_attributions
+from haemologix.ingest import read_columns, read_rows, shard_ranges
+from haemologix.metrics import bootstrap_metrics, compute_metrics, expected_calibration_error, is_better, primary_score
+from haemologix.models import QUANT_MODES, GbdtPredictor, LinearPredictor, MlpPredictor, RulesPredictor, _Mlp
+from haemologix.pack import PackError, PackReader, load_packed_tasks, verify_pack
+from haemologix.pack import main as pack_main
+from haemologix.predlog import PredictionLog, iter_log
+from haemologix.registry import LoadedModel, ModelCard, get_active_version, list_versions, load_active, set_active_version, update_index
+from haemologix.sched import DeadlineExceeded, DeadlineExecutor
+from haemologix.score import score_files
+from haemologix.synth import generate_dataset
 from haemologix.tasks import TASKS, get_task
-from haemologix.train import train_version
+from haemologix.threads import cpu_count, head_workers, recommend, resolve_thread_budget, share
+from haemologix.train import pick_winner, train_version
+from haemologix.warm import load_source, mlp_init_state
 
 
 def test_preprocessor_roundtrip(tmp_path: Path):
@@ -32,6 +53,76 @@ def test_preprocessor_roundtrip(tmp_path: Path):
     z = q.transform_one({"a": 2.0, "b": True, "c": "zzz"})
     assert z[q.feature_names.index("c=x")] == 0 and z[q.feature_names.index("c=y")] == 0
     assert abs(z[q.numeric_cols.index("d")]) < 1e-6
+    # the vectorised column path matches transform_one on messy values, and on a row subset
+    messy = [{"a": "7", "b": 1, "c": 3, "d": float("nan")}, {"a": True, "b": "true", "c": "y"}, {}, {"a": None, "b": 0, "c": ["x"]}]
+    cols = FeatureColumns(messy)
+    assert np.array_equal(q.transform_columns(cols), np.stack([q.transform_one(f) for f in messy]))
+    assert np.array_equal(q.transform_columns(cols, np.array([3, 1])), q.transform_features([messy[3], messy[1]]))
+
+
+def test_drift_monitor_flags_shift(tmp_path: Path):
+    rng = np.random.default_rng(0)
+    train = [{"features": {"x": float(v), "c": str(rng.choice(["a", "b"]))}} for v in rng.normal(10, 2, 2000)]
+    pre = TabularPreprocessor("t").fit(train)
+    mon = DriftMonitor("v1", snapshot_dir=tmp_path, snapshot_every_s=3600)
+    mon.update("t", pre, pre.transform_features([{"x": float(v), "c": str(rng.choice(["a", "b"]))} for v in rng.normal(10, 2, 1000)]))
+    same = mon.summary()["tasks"]["t"]
+    assert same["rows"] == 1000 and same["drifted"] == []
+    assert same["numeric"]["x"]["psi"] < 0.05 and abs(same["numeric"]["x"]["z_shift"]) < 0.1
+    mon.update("u", pre, pre.transform_features([{"x": float(v), "c": "zzz"} for v in rng.normal(14, 2, 1000)] + [{}] * 250))
+    moved = mon.summary()["tasks"]["u"]
+    assert moved["numeric"]["x"]["z_shift"] > 1.0 and moved["numeric"]["x"]["psi"] > 0.25
+    assert abs(moved["numeric"]["x"]["imputed_rate"] - 0.2) < 1e-9 and moved["categorical"]["c"]["unseen_rate"] == 1.0
+    assert set(moved["drifted"]) == {"x", "c"}
+    assert not (tmp_path / "drift-v1.json").exists()  # snapshots are written off the request path
+    assert mon.close() == tmp_path / "drift-v1.json" and not mon._thread.is_alive()
+    assert json.loads((tmp_path / "drift-v1.json").read_text())["tasks"]["u"]["rows"] == 1250
+
+
+def test_prediction_log_bulk_writes_and_drops(tmp_path: Path):
+    log = PredictionLog(tmp_path / "preds", max_queue=3, segment_bytes=1, flush_every_s=0.01)
+    rec = lambda i: {"version": "v", "task": "donor_accept", "ref": f"r{i}", "features": {"x": i}, "prediction": 0.5, "latencyMs": 1}
+    assert log.log([rec(i) for i in range(5)]) == 3  # buffer full → 2 dropped, request path never waits
+    log.close()
+    assert [r["ref"] for r in iter_log(tmp_path / "preds")] == ["r0", "r1", "r2"]
+    st = log.stats()
+    assert st["written"] == 3 and st["dropped"] == 2 and st["errors"] == 0
+    assert log.log([rec(9)]) == 0 and log.stats()["dropped"] == 3
+
+
+def test_calibration_overlay_learns_from_outcomes(tmp_path: Path):
+    rng = np.random.default_rng(0)
+    true_p = rng.uniform(0.02, 0.98, 4000)
+    y = (rng.random(4000) < true_p).astype(np.float64)
+    z = np.log(true_p / (1 - true_p))
+    raw = 1 / (1 + np.exp(-3 * z))  # overconfident head: log-odds 3x too large
+    recent = RecentScores(max_refs=3)
+    recent.add("donor_accept", ["a", None, "b", "c", "d"], raw[:5])
+    assert len(recent) == 3 and recent.get("donor_accept", "a") is None and recent.get("donor_accept", "d") == raw[4]
+    per_task, skipped = collect([("donor_accept", 0.3, 1), ("donor_eta", 12.0, 5.0), ("donor_accept", None, 0), ("donor_accept", 0.4, 2),
+                                 ("retired_task", 0.5, 1)])
+    assert len(per_task["donor_accept"][1]) == 1
+    assert skipped == {"unknown_task": 1, "regression": 1, "unmatched": 1, "bad_label": 1}
+    (tmp_path / "log").mkdir()
+    with gzip.open(tmp_path / "log" / "predictions-000001.jsonl.gz", "wt", encoding="utf-8") as fh:
+        for ref, raw_p in ((17, 0.2), ("18", 0.7)):
+            fh.write(json.dumps({"version": "v1", "task": "donor_accept", "ref": ref, "prediction": raw_p, "backend": "gbdt"}) + "\n")
+    (tmp_path / "outcomes.jsonl").write_text('{"task": "donor_accept", "ref": "17", "label": 0}\n'
+                                             '{"task": "donor_accept", "ref": 18, "label": 1}\n', encoding="utf-8")
+    joined = join_log("v1", {"donor_accept": "gbdt"}, _read_outcomes(tmp_path / "outcomes.jsonl"), tmp_path / "log")
+    assert sorted(joined) == [("donor_accept", 0.2, 0), ("donor_accept", 0.7, 1)]
+
+    for i in range(0, 4000, 500):  # streamed in batches; O(1) state per task
+        ov = record_outcomes(tmp_path, {"donor_accept": (raw[i:i + 500], y[i:i + 500])})
+    tc = ov.tasks["donor_accept"]
+    assert ov.seq == 8 and tc.method in ("temperature", "isotonic") and 2.5 < 1 / tc.s < 3.5
+    fresh = 1 / (1 + np.exp(-3 * np.linspace(-2, 2, 5)))
+    assert np.allclose(ov.apply("donor_accept", fresh), 1 / (1 + np.exp(-np.linspace(-2, 2, 5))), atol=0.08)
+    assert ov.apply("donor_show", fresh) is fresh  # no feedback, no change
+    # persisted as revisions next to the checkpoint; the newest one serves
+    loaded = CalibrationOverlay.load(tmp_path)
+    assert loaded.seq == 8 and np.allclose(loaded.apply("donor_accept", fresh), ov.apply("donor_accept", fresh))
+    assert len(list((tmp_path / "calibration").glob("overlay-*.json"))) == 8
 
 
 def test_group_split_no_leak():
@@ -42,6 +133,118 @@ def test_group_split_no_leak():
     assert len(tr) + len(va) + len(te) == 200
 
 
+def test_group_split_indices_stratified():
+    rows = [{"features": {}, "label": int(i % 7 == 0), "groupId": f"g{i // 4}", "source": "real" if i < 12 else "sim"} for i in range(400)]
+    tr, va, te = group_split_indices(rows, 0.15, 0.15, seed=3, stratify=("source", "label"))
+    assert sorted(np.concatenate([tr, va, te]).tolist()) == list(range(400))
+    g = lambda idx: {rows[i]["groupId"] for i in idx}
+    assert not (g(tr) & g(va)) and not (g(tr) & g(te)) and not (g(va) & g(te))
+    assert any(rows[i]["source"] == "real" for i in te)  # 3 real groups → at least one in test
+    # unstratified indices reproduce the row-list split
+    rtr, _, rte = group_split(rows, seed=3)
+    itr, _, ite = group_split_indices(rows, seed=3)
+    assert [rows[i] for i in itr] == rtr and [rows[i] for i in ite] == rte
+
+
+def test_sample_task_rows_keeps_whole_groups_and_strata(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    generate_dataset(tmp_path / "sim", 3000, tasks=["donor_accept"])
+    lines = (tmp_path / "sim" / "donor_accept.jsonl").read_text(encoding="utf-8").splitlines()[:300]
+    (tmp_path / "real").mkdir()
+    with (tmp_path / "real" / "donor_accept.jsonl").open("w", encoding="utf-8") as fh:
+        for i, line in enumerate(lines):
+            fh.write(json.dumps(json.loads(line) | {"source": "real", "groupId": f"req-{i // 3}"}) + "\n")
+    dirs = [tmp_path / "sim", tmp_path / "real"]
+    full: dict[str, int] = {}
+    for d in dirs:
+        for line in (d / "donor_accept.jsonl").open():
+            g = json.loads(line)["groupId"]
+            full[g] = full.get(g, 0) + 1
+    rows, stats = sample_task_rows(dirs, "donor_accept", 660, seed=1, stratify=("source", "label"))
+    assert stats["seen"] == 3300 and stats["kept"] == len(rows) <= 660
+    kept: dict[str, int] = {}
+    for r in rows:
+        kept[r["groupId"]] = kept.get(r["groupId"], 0) + 1
+    assert all(full[g] == n for g, n in kept.items())  # whole groups only
+    n_real = sum(r["source"] == "real" for r in rows)
+    assert 45 <= n_real <= 66  # ~300/3300 of the sample
+    assert sample_task_rows(dirs, "donor_accept", 660, seed=1, stratify=("source", "label"))[0] == rows
+    assert sample_task_rows(dirs, "donor_accept", 660, seed=2)[0] != rows
+    monkeypatch.setattr("haemologix.ingest.DEFAULT_SHARD_MB", 0.05)
+    sharded = sample_task_rows(dirs, "donor_accept", 660, seed=1, stratify=("source", "label"), jobs=2)
+    assert sharded == (rows, stats)
+
+
+def test_sample_task_rows_reads_top_level_fields_only(tmp_path: Path):
+    rows = [
+        {"task": "donor_accept", "features": {"label": 1, "groupId": "feat", "source": "feat"}, "label": 0,
+         "source": "sim", "groupId": "g-1"},
+        {"features": {"groupId": "feat", "label": 7}, "groupId": "g\"2\u00e9", "source": "real", "label": 1, "task": "donor_accept"},
+        {"task": "donor_accept", "features": {"x": 1}, "label": None, "source": "sim", "groupId": "g-3"},
+        {"task": "donor_accept", "meta": {"source": "meta", "label": 1}, "features": {"groupId": "inner"}, "label": 1},
+    ]
+    (tmp_path / "donor_accept.jsonl").write_text("".join(json.dumps(r) + "\n" for r in rows), encoding="utf-8")
+    lines = (tmp_path / "donor_accept.jsonl").read_bytes().splitlines()
+    assert [_row_fields(ln, "#") for ln in lines] == [("g-1", "sim", 0.0), ('g"2\u00e9', "real", 1.0), ("g-3", "sim", 0.0),
+                                                        ("#", "", 1.0)]
+    sampled, stats = sample_task_rows([tmp_path], "donor_accept", 10, stratify=("source", "label"))
+    assert sampled == rows and stats["strata"]["sim/0"] == {"seen": 2, "kept": 2}
+
+
+def test_sharded_ingest_matches_serial_reader(tmp_path: Path):
+    generate_dataset(tmp_path, 2000, tasks=["urgency_priority"])
+    path = tmp_path / "urgency_priority.jsonl"
+    with path.open("a", encoding="utf-8") as fh:  # a mixed-type column in the last shard only
+        fh.write(json.dumps({"task": "urgency_priority", "features": {"currentUnits": "few", "bloodType": "O-"}, "label": 1, "groupId": "odd"}) + "\n")
+    ranges = shard_ranges(path, 16 << 10)
+    data = path.read_bytes()
+    assert len(ranges) > 10 and ranges[0][0] == 0 and ranges[-1][1] == len(data)
+    assert all(a == b for (_, a), (b, _) in zip(ranges, ranges[1:])) and all(data[b - 1:b] == b"\n" for _, b in ranges)
+    serial = load_task_rows([tmp_path], "urgency_priority")
+    assert read_rows([tmp_path], "urgency_priority", jobs=1, shard_mb=1 / 64) == serial
+    assert load_task_rows([tmp_path], "urgency_priority", jobs=2) == serial
+    tc = read_columns([tmp_path], "urgency_priority", jobs=2, shard_mb=1 / 64)
+    assert len(tc) == len(serial) and tc.kinds["currentUnits"] == "obj" and tc.group_id[-1] == "odd"
+    np.testing.assert_array_equal(tc.label, [r["label"] for r in serial])
+    pre = TabularPreprocessor("urgency_priority", encoding="codes").fit(serial)
+    np.testing.assert_array_equal(pre.transform_columns(tc.feature_columns()), pre.transform(serial))
+
+
+def test_registry_index_tracks_external_edits(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.delenv("ML_ACTIVE_VERSION", raising=False)
+    monkeypatch.setenv("ML_REGISTRY_POLL_S", "0")
+    for v in ("m-1.0", "m-1.1"):
+        (tmp_path / v).mkdir()
+        ModelCard.new(v, "ds", {}, "").save(tmp_path / v)
+    assert [e["version"] for e in list_versions(tmp_path)] == ["m-1.0", "m-1.1"]
+    assert not (tmp_path / "index.json").exists()  # listing is read-only; the writers maintain the file
+    set_active_version("m-1.0", tmp_path)
+    assert set(json.loads((tmp_path / "index.json").read_text())["versions"]) == {"m-1.0", "m-1.1"}
+    assert get_active_version(tmp_path) == "m-1.0"
+    update_index(tmp_path, "m-1.0", load_seconds=0.25)
+    # the TS scripts edit cards / the pointer directly; the listing must notice
+    card = json.loads((tmp_path / "m-1.1" / "model_card.json").read_text())
+    card["status"] = "approved"
+    (tmp_path / "m-1.1" / "model_card.json").write_text(json.dumps(card))
+    os.utime(tmp_path / "m-1.1" / "model_card.json", ns=(1, 1))
+    (tmp_path / "active").write_text("m-1.1")
+    os.utime(tmp_path / "active", ns=(2, 2))
+    listed = {e["version"]: e for e in list_versions(tmp_path)}
+    assert listed["m-1.1"]["status"] == "approved" and listed["m-1.0"]["loadSeconds"] == 0.25
+    assert get_active_version(tmp_path) == "m-1.1"
+
+
+def test_active_pointer_is_read_fresh_on_reload(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.delenv("ML_ACTIVE_VERSION", raising=False)
+    monkeypatch.setenv("ML_REGISTRY_POLL_S", "60")  # listing stays cached throughout
+    for v in ("m-1.0", "m-1.1"):
+        (tmp_path / v).mkdir()
+        ModelCard.new(v, "ds", {}, "").save(tmp_path / v)
+    set_active_version("m-1.0", tmp_path)
+    assert load_active(tmp_path).version == "m-1.0" and list_versions(tmp_path)
+    (tmp_path / "active").write_text("m-1.1")  # what activateModel.ts does right before POST /reload
+    assert get_active_version(tmp_path) == "m-1.1" and load_active(tmp_path).version == "m-1.1"
+
+
 def test_metrics_shapes():
     spec = get_task("donor_accept")
     y = np.array([0, 1, 1, 0, 1], dtype=np.float32)
@@ -54,12 +257,64 @@ def test_metrics_shapes():
     assert abs(m2["mae"] - 4.5) < 1e-6
 
 
+def test_metrics_engine_matches_sklearn():
+    from sklearn.metrics import average_precision_score, brier_score_loss, f1_score, log_loss, roc_auc_score
+
+    rng = np.random.default_rng(0)
+    y = (rng.random(3000) < 0.3).astype(np.float32)
+    p = np.round(rng.random(3000) * 0.6 + 0.3 * y, 2).astype(np.float32)  # many tied scores
+    spec = get_task("donor_accept")
+    m = compute_metrics(spec, y, p)
+    pc = np.clip(p, 1e-6, 1 - 1e-6)
+    assert abs(m["auroc"] - roc_auc_score(y, pc)) < 1e-6
+    assert abs(m["auprc"] - average_precision_score(y, pc)) < 1e-6
+    assert abs(m["brier"] - brier_score_loss(y, pc)) < 1e-6
+    assert abs(m["log_loss"] - log_loss(y, pc, labels=[0, 1])) < 1e-6
+    assert primary_score(spec, y, p) == m["auroc"]
+    yk = rng.integers(0, 4, 3000)
+    P = rng.dirichlet(np.ones(4), 3000).astype(np.float32)
+    mk = compute_metrics(get_task("urgency_priority"), yk, P)
+    assert abs(mk["macro_f1"] - f1_score(yk, P.argmax(1), average="macro", labels=[0, 1, 2, 3], zero_division=0)) < 1e-9
+    assert abs(mk["log_loss"] - log_loss(yk, np.clip(P, 1e-6, 1), labels=[0, 1, 2, 3])) < 1e-6
+
+
+def test_pick_winner_applies_compare_mode_to_every_candidate():
+    spec = get_task("donor_accept")
+    cands = {"gbdt": {"auroc": 0.80, "ci": {"auroc": [0.76, 0.84]}},
+             "mlp": {"auroc": 0.70, "ci": {"auroc": [0.66, 0.74]}},
+             "linear": {"auroc": 0.82, "ci": {"auroc": [0.79, 0.85]}}}
+    assert pick_winner(spec, cands, "point") == "linear"
+    assert pick_winner(spec, cands, "significant") == "gbdt"  # linear's interval does not clear gbdt's 0.80
+    cands["linear"]["ci"]["auroc"] = [0.81, 0.85]
+    assert pick_winner(spec, cands, "significant") == "linear"
+    tie = {"gbdt": {"auroc": 0.80, "ci": {"auroc": [0.77, 0.83]}}, "mlp": {"auroc": 0.79, "ci": {"auroc": [0.76, 0.82]}}}
+    assert pick_winner(spec, tie, "significant") == "mlp" and pick_winner(spec, tie, "point") == "gbdt"
+
+
+def test_group_bootstrap_ci_and_significance():
+    rng = np.random.default_rng(2)
+    groups = np.repeat(np.arange(300), 4)
+    y = (rng.random(1200) < 0.4).astype(np.float32)
+    p = np.clip(0.35 * y + rng.random(1200) * 0.65, 0, 1).astype(np.float32)
+    spec = get_task("donor_accept")
+    m = compute_metrics(spec, y, p)
+    ci = bootstrap_metrics(spec, y, p, groups, n_boot=100, seed=1, n_jobs=1)
+    assert bootstrap_metrics(spec, y, p, groups, n_boot=100, seed=1, n_jobs=3) == ci  # pool size does not matter
+    for k in ("auroc", "auprc", "brier", "log_loss", "ece"):
+        lo, hi = ci[k]
+        assert lo <= m[k] <= hi, (k, lo, m[k], hi)
+    cand = m | {"ci": ci}
+    assert is_better(spec, cand, {"auroc": m["auroc"] - 0.001})  # point: any gain wins
+    assert not is_better(spec, cand, {"auroc": m["auroc"] - 0.001}, mode="significant")
+    assert is_better(spec, cand, {"auroc": ci["auroc"][0] - 0.01}, mode="significant")
+
+
 def test_predictors_learn_and_persist(tmp_path: Path):
     rng = np.random.default_rng(0)
     X = rng.normal(size=(2000, 4)).astype(np.float32)
     y = (X[:, 0] + 0.5 * X[:, 1] > 0).astype(np.float32)
     spec = get_task("donor_accept")
-    for cls in (GbdtPredictor, MlpPredictor):
+    for cls in (GbdtPredictor, MlpPredictor, LinearPredictor):
         kw = {"epochs": 10} if cls is MlpPredictor else {}
         m = cls(spec, **kw).fit(X[:1500], y[:1500], X[1500:], y[1500:])
         auc = compute_metrics(spec, y[1500:], m.predict(X[1500:]))["auroc"]
@@ -71,12 +326,121 @@ def test_predictors_learn_and_persist(tmp_path: Path):
     assert abs(float(r.predict(X[:3])[0]) - y.mean()) < 1e-6
 
 
+def test_row_attributions_trace_the_heads():
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(1500, 5)).astype(np.float32)
+    X[:, 4] = rng.integers(0, 4, 1500)
+    X[::11, 0], X[::7, 4] = np.nan, np.nan
+    y = (np.nan_to_num(X[:, 0]) + (X[:, 4] == 2) - 0.2 * X[:, 2] > 0.2).astype(np.float32)
+    spec = get_task("donor_accept")
+    g = GbdtPredictor(spec, max_iter=40, cat_cols=[4], cat_cards=[4]).fit(X, y)
+    a = g.attributions(X[:200])
+    offset = g.est._raw_predict(X[:200])[:, 0] - a.sum(axis=1)
+    assert np.ptp(offset) < 1e-4  # path contributions add up to the raw output, up to one shared constant
+    assert set(np.argsort(-np.abs(a).mean(axis=0))[:2]) == {0, 4}
+    skewed = GbdtPredictor.from_estimator(spec, g.est)  # a walk that no longer matches the estimator is switched off
+    skewed._tables = [{**t, "dleft": 2 * t["dleft"]} for t in g._tables]
+    assert skewed.attributions(X[:50]) is None and "do not sum" in skewed._attr_error and skewed.attributions(X[:1]) is None
+    X[:, 0] = np.nan_to_num(X[:, 0])  # the MLP only ever sees NaN in code columns (numerics are imputed)
+    m = MlpPredictor(spec, epochs=8, cat_cols=[4], cat_cards=[4]).fit(X[:1200], y[:1200], X[1200:], y[1200:])
+    am = m.attributions(X[:200])
+    assert am.shape == (200, 5) and np.argmax(np.abs(am).mean(axis=0)) in (0, 4)
+    assert np.allclose(m.quantized("int8").attributions(X[:200]), am, atol=0.1)  # int8 heads explain via a float twin
+    top = top_attributions(am, ["a", "b", "c", "d", "cat"], 2)
+    assert len(top) == 200 and all(len(t) == 2 for t in top)
+    assert [abs(v) for v in top[0].values()] == sorted((abs(v) for v in top[0].values()), reverse=True)
+    lin = LinearPredictor(spec, cat_cols=[4], cat_cards=[4]).fit(X[:1200], y[:1200], X[1200:], y[1200:])
+    al = lin.attributions(X[:200])  # exact: weight × value, code columns through their one-hot expansion
+    logit = lin._raw(lin._design(X[:200]))[:, 0]
+    assert np.allclose(al.sum(axis=1), (logit - lin.b[0]) / lin.temperature, atol=1e-3)
+    assert al[np.isnan(X[:200, 4]), 4].tolist() == [0.0] * int(np.isnan(X[:200, 4]).sum())
+    assert RulesPredictor(spec).fit(X, y).attributions(X) is None
+
+
+def test_mlp_quantized_heads(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(2000, 4)).astype(np.float32)
+    y = (X[:, 0] + 0.5 * X[:, 1] > 0).astype(np.float32)
+    spec = get_task("donor_accept")
+    m = MlpPredictor(spec, epochs=10).fit(X[:1500], y[:1500], X[1500:], y[1500:])
+    for mode in QUANT_MODES:
+        q = m.quantized(mode)
+        assert np.abs(q.predict(X[1500:]) - m.predict(X[1500:])).mean() < 0.01, mode
+        assert q.feature_importance(["a", "b", "c", "d"])
+        d = tmp_path / mode
+        m.quant_info = {"mode": mode, "accepted": True}
+        m.save(d)
+        q.save_quantized(d)
+        loaded = MlpPredictor.load(d, spec)
+        assert loaded.quant == mode
+        assert np.allclose(loaded.predict(X[:50]), q.predict(X[:50]), atol=1e-6)
+        monkeypatch.setenv("ML_MLP_QUANT", "0")
+        assert MlpPredictor.load(d, spec).quant is None
+        monkeypatch.delenv("ML_MLP_QUANT")
+
+
+def test_thread_budget_and_recommendation(monkeypatch: pytest.MonkeyPatch):
+    for k in ("ML_THREADS", "ML_TORCH_THREADS", "ML_OMP_THREADS", "ML_BLAS_THREADS"):
+        monkeypatch.delenv(k, raising=False)
+    monkeypatch.setenv("API_WORKERS", "2")
+    assert resolve_thread_budget("serve")["omp"] == max(1, cpu_count() // 2)
+    assert resolve_thread_budget("train")["omp"] == cpu_count()
+    monkeypatch.setenv("ML_THREADS", "3")
+    monkeypatch.setenv("ML_TORCH_THREADS", "1")
+    assert resolve_thread_budget("serve") == {"torch": 1, "omp": 3, "blas": 3}
+    assert resolve_thread_budget("serve", threads=2, torch_threads=2) == {"torch": 2, "omp": 2, "blas": 2}
+    monkeypatch.delenv("ML_HEAD_WORKERS", raising=False)
+    assert head_workers({"torch": 1, "omp": 3, "blas": 3}) == 3 and head_workers({"torch": 16, "omp": 16, "blas": 16}) == 4
+    assert share({"torch": 1, "omp": 3, "blas": 8}, 3) == {"torch": 1, "omp": 1, "blas": 2}
+    monkeypatch.setenv("ML_HEAD_WORKERS", "2")
+    assert head_workers({"torch": 16, "omp": 16, "blas": 16}) == 2
+    results = {"mlp": [{"threads": n, "batch": b, "p50Ms": ms} for n, b, ms in
+                       [(1, 1, 0.10), (1, 512, 4.0), (2, 1, 0.11), (2, 512, 2.1), (4, 1, 0.2), (4, 512, 2.0)]]}
+    assert recommend(results) == {"mlp": 2}
+
+
+def test_deadline_executor_orders_and_sheds():
+    ex = DeadlineExecutor(workers=1)
+    gate, order = threading.Event(), []
+    ex.submit(None, gate.wait)  # occupy the only worker
+    while ex.stats()["running"] == 0:
+        time.sleep(0.001)
+    now = time.perf_counter()
+    late = ex.submit(now + 10, order.append, "late")
+    early = ex.submit(now + 5, order.append, "early")
+    stale = ex.submit(now + 0.01, order.append, "stale")
+    time.sleep(0.05)
+    gate.set()
+    late.result(timeout=5), early.result(timeout=5)
+    with pytest.raises(DeadlineExceeded):
+        stale.result(timeout=5)
+    assert order == ["early", "late"] and ex.stats()["shed"] == 1
+    ex.shutdown()
+
+
+def test_deadline_executor_survives_cancelled_jobs():
+    ex = DeadlineExecutor(workers=1)
+    gate = threading.Event()
+    ex.submit(None, gate.wait)
+    while ex.stats()["running"] == 0:
+        time.sleep(0.001)
+    now = time.perf_counter()
+    # what asyncio.wait_for does to a queued head when the request times out: cancel, then the deadline passes
+    for fut in (ex.submit(now + 0.01, time.sleep, 0), ex.submit(None, time.sleep, 0)):
+        assert fut.cancel()
+    time.sleep(0.05)
+    gate.set()
+    assert ex.submit(None, lambda: "still alive").result(timeout=5) == "still alive"
+    assert all(t.is_alive() for t in ex._threads)
+    ex.shutdown()
+
+
 def test_train_version_and_serve(synth_dataset: Path, model_dir: Path, monkeypatch: pytest.MonkeyPatch):
     card = train_version("test-model-0.1", [synth_dataset], tasks=["donor_accept", "donor_eta", "urgency_priority"], model_dir=model_dir, quick=True)
     assert card["status"] == "evaluated"
     for t in ("donor_accept", "donor_eta", "urgency_priority"):
         res = card["tasks"][t]
-        assert res.get("backend") in ("mlp", "gbdt"), res
+        assert res.get("backend") in ("mlp", "gbdt", "linear"), res
         assert (model_dir / "test-model-0.1" / t / "backend.txt").exists()
     assert card["tasks"]["donor_accept"]["beats_baseline"] is True
     assert card["tasks"]["donor_eta"]["metrics"]["mae"] > 0
@@ -118,6 +482,390 @@ def test_train_version_and_serve(synth_dataset: Path, model_dir: Path, monkeypat
     assert client.post("/predict/batch", json={"requests": [{"task": "delivery_time", "features": {}}]}, headers={"X-ML-Secret": "s3cret"}).status_code == 422
 
 
+VERSION = "test-model-0.1"
+SECRET = {"X-ML-Secret": "s3cret"}
+BATCH = {"requests": [
+    {"task": "donor_accept", "ref": "d1", "features": {"distanceKm": 2.0, "urgency": "critical", "isNight": False, "scoreFinal": 90, "hour": 10}},
+    {"task": "donor_accept", "ref": "d2", "features": {"distanceKm": 28.0, "urgency": "low", "isNight": True, "scoreFinal": 30, "hour": 2}},
+    {"task": "donor_eta", "ref": "e1", "features": {"distanceKm": 10.0, "urgency": "high", "isNight": False, "scoreFinal": 50, "hour": 12, "etaMinutes": 40}},
+    {"task": "urgency_priority", "ref": "u1", "features": {"distanceKm": 1.0, "urgency": "critical", "isNight": False, "scoreFinal": 50, "hour": 12}},
+]}
+DONOR = BATCH["requests"][2]["features"]
+SHARED = {"entities": {"don-1": DONOR}, "requests": [
+    {"task": "donor_accept", "ref": "a", "entity": "don-1"},
+    {"task": "donor_eta", "ref": "e", "entity": "don-1"},
+    {"task": "donor_eta", "ref": "e2", "entity": "don-1", "features": {"etaMinutes": 80}},
+]}
+INLINE = {"requests": [{"task": t, "ref": ref, "features": f} for t, ref, f in (
+    ("donor_accept", "a", DONOR), ("donor_eta", "e", DONOR), ("donor_eta", "e2", {**DONOR, "etaMinutes": 80}))]}
+
+
+@pytest.fixture(scope="module")
+def trained_version(module_synth_dataset: Path, tmp_path_factory: pytest.TempPathFactory) -> tuple[Path, ModelCard]:
+    """(model dir, card) of one quick version over three tasks, trained once and activated for this module."""
+    model_dir = tmp_path_factory.mktemp("checkpoints")
+    card = train_version(VERSION, [module_synth_dataset], tasks=["donor_accept", "donor_eta", "urgency_priority"], model_dir=model_dir,
+                         quick=True, quantize="int8")
+    set_active_version(VERSION, model_dir)
+    return model_dir, card
+
+
+@pytest.fixture
+def client(trained_version: tuple[Path, ModelCard], tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> TestClient:
+    """The service on the trained version, with fresh counters."""
+    monkeypatch.setenv("ML_MODEL_DIR", str(trained_version[0]))
+    monkeypatch.setenv("ML_API_SECRET", "s3cret")
+    monkeypatch.setenv("ML_DRIFT_DIR", str(tmp_path / "drift"))
+    for k in ("ML_ACTIVE_VERSION", "ML_TASKS", "ML_SHARD"):
+        monkeypatch.delenv(k, raising=False)
+    monkeypatch.setitem(api_module._state, "fallbacks", {"timeout": 0, "shed": 0, "error": 0, "teacher": 0})
+    monkeypatch.setitem(api_module._state, "deadline", {"requests": 0, "shed": 0, "missed": 0})
+    monkeypatch.setitem(api_module._state, "explain", {"rows": 0, "skipped": 0})
+    api_module._load()
+    return TestClient(api_module.app)
+
+
+def test_prediction_log_records_every_scored_row(client: TestClient, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setitem(api_module._state, "predlog", PredictionLog(tmp_path / "preds", flush_every_s=0.01))
+    r = client.post("/predict/batch", json=BATCH, headers=SECRET)
+    assert r.status_code == 200, r.text
+    api_module._state["predlog"].close()
+    logged = list(iter_log(tmp_path / "preds"))
+    assert [x["ref"] for x in logged] == ["d1", "d2", "e1", "u1"] and logged[0]["version"] == VERSION
+    assert logged[2]["features"]["etaMinutes"] == 40
+    assert [x["prediction"] for x in logged] == [x["prediction"] for x in r.json()["results"]]
+
+
+def test_trained_version_reports_bootstrap_intervals(trained_version: tuple[Path, ModelCard]):
+    metrics = trained_version[1]["tasks"]["donor_eta"]["metrics"]
+    lo, hi = metrics["ci"]["mae"]
+    assert lo <= metrics["mae"] <= hi
+
+
+def test_drift_endpoint_summarises_served_inputs(client: TestClient):
+    assert client.post("/predict/batch", json=BATCH, headers=SECRET).status_code == 200
+    drift = client.get("/drift", headers=SECRET).json()
+    assert drift["version"] == VERSION and drift["tasks"]["donor_accept"]["rows"] == 2
+    assert "distanceKm" in drift["tasks"]["donor_accept"]["numeric"]
+
+
+def test_pack_matches_directories_and_corrupt_pack_falls_back(trained_version: tuple[Path, ModelCard]):
+    vd = trained_version[0] / VERSION
+    pack = vd / "model.hpack"
+    assert pack.exists()  # written by train_version
+    lm = LoadedModel.load(vd)
+    packed = load_packed_tasks(vd, lm.card)
+    plain = LoadedModel.load(vd, packed=False)
+    for t, lt in plain.tasks.items():
+        X = np.random.default_rng(0).normal(size=(8, lt.pre.dim)).astype(np.float32)
+        assert np.allclose(lt.predictor.predict(X), packed[t].predictor.predict(X), atol=1e-6), t
+    good = pack.read_bytes()
+    reader = PackReader(pack)
+    start = reader._base  # first data block (a trailing block may end in padding, which no checksum covers)
+    reader.close()
+    try:
+        pack.write_bytes(good[:start] + bytes([good[start] ^ 0xFF]) + good[start + 1:])
+        with pytest.raises(PackError):
+            load_packed_tasks(vd, lm.card)
+        assert set(LoadedModel.load(vd).tasks) == set(lm.tasks)  # falls back to directories
+    finally:
+        pack.write_bytes(good)
+
+
+def test_registry_index_records_trained_version(trained_version: tuple[Path, ModelCard], monkeypatch: pytest.MonkeyPatch):
+    model_dir, _ = trained_version
+    monkeypatch.delenv("ML_ACTIVE_VERSION", raising=False)
+    assert [v["version"] for v in list_versions(model_dir)] == [VERSION]
+    assert get_active_version(model_dir) == VERSION
+    entry = json.loads((model_dir / "index.json").read_text())["versions"][VERSION]
+    assert entry["status"] == "active" and entry["packed"] and entry["loadSeconds"] > 0 and entry["artifactBytes"] > 0
+    assert set(LoadedModel.load(model_dir / VERSION).tasks) == {"donor_accept", "donor_eta", "urgency_priority"}
+
+
+def test_trained_version_keeps_quantized_heads_that_hold_the_metric(trained_version: tuple[Path, ModelCard]):
+    model_dir, card = trained_version
+    for t in ("donor_accept", "donor_eta", "urgency_priority"):
+        res = card["tasks"][t]
+        if res["backend"] == "mlp":
+            q = res["quantization"]
+            assert q["mode"] == "int8" and (model_dir / VERSION / t / "mlp_int8.pt").exists() == q["accepted"]
+
+
+def test_failing_or_late_head_answers_from_rules(client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    lt = api_module._state["model"].tasks["donor_accept"]
+
+    def boom(X):
+        raise RuntimeError("head down")
+
+    def slow(X, real=lt.predictor.predict):
+        time.sleep(0.3)
+        return real(X)
+
+    one = {"requests": BATCH["requests"][:2]}
+    for fake, env, reason in ((boom, "1000", "error"), (slow, "50", "timeout")):
+        monkeypatch.setenv("ML_HEAD_DEADLINE_MS", env)
+        monkeypatch.setattr(lt.predictor, "predict", fake)
+        out = client.post("/predict/batch", json=one, headers=SECRET).json()
+        assert [x["backend"] for x in out["results"]] == ["rules", "rules"]
+        assert out["results"][0]["prediction"] == pytest.approx(lt.rules.constant)
+        assert client.get("/health").json()["fallbacks"][reason] == 1
+
+
+def test_caller_budget_is_refused_when_spent_and_honoured_when_live(client: TestClient):
+    assert client.post("/predict/batch", json={**BATCH, "budgetMs": 0}, headers=SECRET).status_code == 504
+    assert client.post("/predict/batch", json={**BATCH, "budgetMs": 5000}, headers=SECRET).status_code == 200
+    dl = client.get("/health").json()["deadline"]
+    assert dl["requests"] == 2 and dl["shed"] == 1 and dl["missed"] == 0
+
+
+def test_shared_entities_match_inline_features(client: TestClient):
+    got = client.post("/predict/batch", json=SHARED, headers=SECRET).json()["results"]
+    want = client.post("/predict/batch", json=INLINE, headers=SECRET).json()["results"]
+    assert [r["prediction"] for r in got] == [r["prediction"] for r in want]
+    assert {r["backend"] for r in got} <= {"mlp", "gbdt", "linear"}
+    bad = {"requests": [{"task": "donor_accept", "entity": "nobody"}]}
+    assert client.post("/predict/batch", json=bad, headers=SECRET).status_code == 400
+
+
+def test_offline_scoring_reproduces_served_answers(client: TestClient, trained_version: tuple[Path, ModelCard], tmp_path: Path,
+                                                   monkeypatch: pytest.MonkeyPatch):
+    vd = trained_version[0] / VERSION
+    monkeypatch.setitem(api_module._state, "predlog", PredictionLog(tmp_path / "preds", flush_every_s=0.01))
+    res = {x["ref"]: x for x in client.post("/predict/batch", json=BATCH, headers=SECRET).json()["results"]}
+    api_module._state["predlog"].close()
+    # the logged rows, scored in input order across workers
+    for jobs in (1, 2):
+        summary = score_files([tmp_path / "preds"], tmp_path / f"scored-{jobs}.jsonl.gz", vd, jobs=jobs, chunk_rows=3)
+        assert summary["rows"] == summary["records"] == 4 and summary["tasks"]["donor_accept"] == 2
+        scored = [json.loads(x) for x in gzip.open(tmp_path / f"scored-{jobs}.jsonl.gz", "rt")]
+        assert [x["ref"] for x in scored] == ["d1", "d2", "e1", "u1"]
+        for x in scored:
+            assert x["prediction"] == pytest.approx(res[x["ref"]]["prediction"], rel=1e-5)
+            assert x["confidence"] == pytest.approx(res[x["ref"]]["confidence"], rel=1e-5)
+    what_if = score_files([tmp_path / "preds"], tmp_path / "what-if.jsonl", vd, tasks=["donor_eta", "donor_show"], keep=("ref",))
+    assert what_if["records"] == 4 and what_if["skipped"]["no_head"] == 4
+    assert [json.loads(x)["task"] for x in (tmp_path / "what-if.jsonl").read_text().splitlines()] == ["donor_eta"] * 4
+
+
+def test_explain_adds_attributions_without_changing_predictions(client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("ML_EXPLAIN_BUDGET_MS", "5000")
+    want = client.post("/predict/batch", json=INLINE, headers=SECRET).json()["results"]
+    explained = client.post("/predict/batch", json={**INLINE, "explain": 3}, headers=SECRET).json()["results"]
+    assert [r["prediction"] for r in explained] == [r["prediction"] for r in want]
+    assert all(0 < len(r["attributions"]) <= 3 for r in explained) and want[0]["attributions"] is None
+    assert client.get("/health").json()["explain"] == {"rows": 3, "skipped": 0}
+
+
+def test_calibration_outcomes_join_recent_scores(client: TestClient, trained_version: tuple[Path, ModelCard],
+                                                monkeypatch: pytest.MonkeyPatch):
+    cal_dir = trained_version[0] / VERSION / "calibration"
+    assert api_module._state["calibration"]._thread.is_alive()  # revisions are polled off the request path
+    assert client.post("/predict/batch", json=SHARED, headers=SECRET).status_code == 200
+    fb = {"outcomes": [{"task": "donor_accept", "ref": "a", "label": 1}, {"task": "donor_eta", "ref": "e", "label": 30},
+                       {"task": "donor_accept", "ref": "never-scored", "label": 0}]}
+    try:
+        cal = client.post("/calibration/outcomes", json=fb, headers=SECRET).json()
+        assert cal["used"] == {"donor_accept": 1} and cal["skipped"] == {"unknown_task": 0, "regression": 1, "unmatched": 1, "bad_label": 0}
+        assert cal["seq"] == 1 and cal["tasks"]["donor_accept"]["method"] == "raw"  # too few outcomes to move off raw
+        assert (cal_dir / "overlay-000001.json").exists()
+        assert client.get("/health").json()["calibration"]["seq"] == 1
+
+        def read_only(version_dir: Path, outcomes: dict) -> CalibrationOverlay:
+            raise PermissionError(13, "Read-only file system")
+        monkeypatch.setattr("haemologix.calib.record_outcomes", read_only)
+        r = client.post("/calibration/outcomes", json=fb, headers=SECRET)
+        assert r.status_code == 503 and "Read-only" in r.json()["detail"]
+    finally:
+        shutil.rmtree(cal_dir, ignore_errors=True)
+
+
+def test_router_splits_batches_across_shards(client: TestClient, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    direct = {x["ref"]: x for x in client.post("/predict/batch", json=BATCH, headers=SECRET).json()["results"]}
+    routes = tmp_path / "routes.json"
+    routes.write_text(json.dumps({"shards": {"donor": {"url": "http://donor", "tasks": ["donor_accept", "donor_eta"]},
+                                             "rest": {"url": "http://rest", "tasks": "*"}}}))
+    monkeypatch.setenv("ML_ROUTES", str(routes))
+    seen: list[tuple[str, int]] = []
+
+    class Recording(httpx.ASGITransport):
+        async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+            if request.url.path == "/predict/batch":
+                seen.append((request.url.host, len(json.loads(request.content)["requests"])))
+            return await super().handle_async_request(request)
+
+    monkeypatch.setitem(router_module._state, "routes", None)
+    monkeypatch.setitem(router_module._state, "client", httpx.AsyncClient(transport=Recording(app=api_module.app)))
+    front = TestClient(router_module.app)
+    assert front.get("/routes").json()["tasks"]["urgency_priority"] == "rest"
+    mixed = {"requests": [BATCH["requests"][3], *BATCH["requests"][:3]], "budgetMs": 5000}
+    routed = front.post("/predict/batch", json=mixed, headers=SECRET).json()
+    assert sorted(seen) == [("donor", 3), ("rest", 1)]
+    assert [x["ref"] for x in routed["results"]] == ["u1", "d1", "d2", "e1"] and routed["modelVersion"] == VERSION
+    for x in routed["results"]:
+        assert x["prediction"] == pytest.approx(direct[x["ref"]]["prediction"], rel=1e-5)
+    assert front.post("/predict/batch", json=mixed).status_code == 401
+    fh = front.get("/health").json()
+    h = client.get("/health").json()
+    assert fh["model_loaded"] and set(fh["shards"]) == {"donor", "rest"} and fh["tasks"]["donor_eta"] == h["tasks"]["donor_eta"]
+
+
+def test_shard_serves_only_its_allow_list(client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("ML_TASKS", "donor_accept,donor_eta")
+    monkeypatch.setenv("ML_SHARD", "donor")
+    api_module._load()
+    assert set(api_module._state["model"].tasks) == {"donor_accept", "donor_eta"}
+    assert client.get("/health").json()["shard"] == {"name": "donor", "tasks": ["donor_accept", "donor_eta"]}
+    assert client.post("/predict/batch", json={"requests": BATCH["requests"][3:]}, headers=SECRET).status_code == 421
+    assert client.post("/predict/batch", json={"requests": BATCH["requests"][:1]}, headers=SECRET).status_code == 200
+
+
+def test_profiler_attributes_busy_head_threads_to_their_task(client: TestClient):
+    stop = threading.Event()
+    ut = api_module._state["model"].tasks["urgency_priority"]
+    Xh = ut.pre.transform_columns(FeatureColumns([x["features"] for x in BATCH["requests"][:2]] * 256), np.arange(512))
+
+    def head_load() -> None:
+        while not stop.is_set():
+            api_module._run_head(ut, Xh)
+
+    worker = threading.Thread(target=head_load, name="ml-head-test")
+    worker.start()
+    try:
+        prof = client.get("/debug/profile", params={"seconds": 0.5, "intervalMs": 2}, headers=SECRET).json()
+        folded = client.get("/debug/profile", params={"seconds": 0.1, "format": "collapsed"}, headers=SECRET).text
+        with profiler._busy:
+            assert client.get("/debug/profile", params={"seconds": 0.1}, headers=SECRET).status_code == 409
+    finally:
+        stop.set()
+        worker.join()
+    assert prof["ticks"] > 20 and "ml-head-test" in prof["threads"]
+    head = prof["tasks"]["urgency_priority"]
+    assert head["samples"] > 0 and any(f["function"].startswith("[native") or "haemologix." in f["function"] for f in head["top"])
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in folded.splitlines()) and "ml-head-test;" in folded
+    assert client.get("/debug/profile", params={"seconds": 0.1}).status_code == 401
+
+
+def test_codes_encoding_trains_packs_and_monitors(synth_dataset: Path, tmp_path: Path):
+    card = train_version("codes-0.1", [synth_dataset], tasks=["donor_accept"], model_dir=tmp_path, quick=True, n_boot=0, encoding="codes",
+                         latency_tol=0.05)
+    res = card["tasks"]["donor_accept"]
+    lat, best = res["selection"]["latency"], max(m["auroc"] for m in res["candidates"].values())
+    assert set(lat) == {"gbdt", "mlp", "linear"}  # the fastest head within 5% of the best auroc is served
+    assert res["backend"] == min((n for n, m in res["candidates"].items() if m["auroc"] >= best * 0.95), key=lambda n: lat[n]["ms_row"])
+    assert res["encoding"]["mode"] == "codes" and res["encoding"]["dim"] < res["encoding"]["onehot_dim"]
+    assert res["beats_baseline"] is True
+    vd = tmp_path / "codes-0.1"
+    plain = LoadedModel.load(vd, packed=False).tasks["donor_accept"]
+    assert plain.pre.encoding == "codes" and plain.pre.code_columns
+    packed = LoadedModel.load(vd).tasks["donor_accept"]
+    feats = [{"distanceKm": 3.0, "urgency": "critical", "isNight": False}, {"distanceKm": 20.0, "urgency": "never-seen"}]
+    X = packed.pre.transform_features(feats)
+    assert np.isnan(X[1, packed.pre.code_columns[0]])  # unknown category → NaN code
+    assert np.allclose(plain.predictor.predict(X), packed.predictor.predict(X), atol=1e-6)
+    assert verify_pack(vd) == [] and pack_main(["--version", "codes-0.1", "--model-dir", str(tmp_path), "--verify"]) == 0
+    assert plain.predictor.feature_importance(plain.pre.feature_names)
+    mon = DriftMonitor("codes-0.1")
+    mon.update("donor_accept", packed.pre, X)
+    assert mon.summary()["tasks"]["donor_accept"]["categorical"]["urgency"]["unseen_rate"] == 0.5
+
+
+def test_synth_dataset_covers_tasks_and_is_deterministic(tmp_path: Path):
+    m = generate_dataset(tmp_path / "a", 600, chunk_rows=250)
+    assert set(m["rows"]) == set(TASKS) and m["source"] == "sim" and m["priorsHash"].startswith("synth-")
+    generate_dataset(tmp_path / "b", 600, tasks=["donor_accept"], chunk_rows=250)
+    assert (tmp_path / "a" / "donor_accept.jsonl").read_bytes() == (tmp_path / "b" / "donor_accept.jsonl").read_bytes()
+    generate_dataset(tmp_path / "c", 600, tasks=["donor_accept"], chunk_rows=7)  # groups straddle every chunk
+    alerts = {}
+    for d in ("a", "c"):
+        rows = [json.loads(line) for line in (tmp_path / d / "donor_accept.jsonl").open()]
+        assert "scoreFinal" in rows[0]["features"] and "trafficMultiplier" in rows[0]["features"]
+        shared: dict[str, set] = {}
+        for r in rows:  # alert-side features are a property of the group
+            shared.setdefault(r["groupId"], set()).add((r["features"]["alertBloodType"], r["features"]["urgency"], r["features"]["hour"]))
+        assert len(shared) == 50 and all(len(v) == 1 for v in shared.values())
+        alerts[d] = shared
+    assert alerts["a"] == alerts["c"]
+    card = train_version("synth-0.1", [tmp_path / "a"], tasks=["expansion_yield"], model_dir=tmp_path / "ck", quick=True, n_boot=0)
+    assert card["tasks"]["expansion_yield"]["metrics"]["auroc"] > 0.6
+
+
+def test_bench_case_records_stages_and_flags_regressions(tmp_path: Path):
+    d = ensure_dataset(tmp_path, 800, ["donor_accept"])
+    assert ensure_dataset(tmp_path, 800, ["donor_accept"]) == d  # cached
+    case = run_case(d, "donor_accept", "gbdt", quick=True)
+    assert case["rows"] == 800 and case["metric"] == "auroc" and case["value"] > 0.5
+    assert {"load", "split", "preprocess", "rules", "fit_gbdt", "eval_gbdt", "save"} <= set(case["stages"])
+    key = case_key(case)
+    assert compare({key: case}, {key: case}) == []
+    slow = case | {"seconds": case["seconds"] * 2 + 1, "value": case["value"] - 0.1, "peakRssMb": (case["peakRssMb"] or 1) * 2}
+    checks = {r["check"] for r in compare({key: slow}, {key: case})}
+    assert {"seconds", "metric.auroc"} <= checks and (case["peakRssMb"] is None or "peakRssMb" in checks)
+    assert compare({key: case | {"seconds": case["seconds"] + 0.1}}, {key: case}, tolerance=0.0) == []  # under --min-seconds
+
+
+def test_warm_start_remaps_mlp_and_continues_gbdt(tmp_path: Path):
+    for seed in (1, 2):
+        generate_dataset(tmp_path / f"d{seed}", 1200, tasks=["donor_accept"], seed=seed)
+    ck = tmp_path / "ck"
+    train_version("w-mlp", [tmp_path / "d1"], tasks=["donor_accept"], backend="mlp", model_dir=ck, quick=True, n_boot=0)
+    train_version("w-gbdt", [tmp_path / "d1"], tasks=["donor_accept"], backend="gbdt", model_dir=ck, quick=True, n_boot=0)
+
+    # the remapped head computes the same function of the raw features under the refitted preprocessor
+    src = load_source(ck / "w-mlp", "donor_accept")
+    assert src is not None and src.backend == "mlp"
+    rows = [json.loads(line) for line in (tmp_path / "d2" / "donor_accept.jsonl").open()]
+    new_pre = TabularPreprocessor("donor_accept").fit(rows)
+    head = MlpPredictor(get_task("donor_accept"))
+    state, report = mlp_init_state(src.pre, src.predictor, new_pre, head)
+    assert state is not None and report["rescaled"] > 0
+    head.in_dim, head.temperature = new_pre.dim, src.predictor.temperature
+    head.model = _Mlp(new_pre.dim, 1)
+    head.model.load_state_dict(head.model.state_dict() | state)
+    seen = [r for r in rows if all(r["features"][c] in src.pre.cat_vocab[c] for c in src.pre.cat_cols)][:200]
+    assert np.allclose(src.predictor.predict(src.pre.transform(seen)), head.predict(new_pre.transform(seen)), atol=1e-4)
+
+    card = train_version("w-2", [tmp_path / "d2"], tasks=["donor_accept"], model_dir=ck, quick=True, n_boot=0, warm_from="w-mlp", warm_compare=True)
+    w = card["warmStart"]["tasks"]["donor_accept"]
+    assert w["used"] and w["backend"] == "mlp" and "cold_fit_s" in w and "delta" in w and card["warmStart"]["timeSavedSeconds"] is not None
+    card = train_version("w-3", [tmp_path / "d2"], tasks=["donor_accept"], backend="gbdt", model_dir=ck, quick=True, n_boot=0, warm_from="w-gbdt")
+    w = card["warmStart"]["tasks"]["donor_accept"]
+    assert w["used"] and w["chosen"] and w["previous_fit_s"] is not None
+    gbdt = LoadedModel.load(ck / "w-3", packed=False).tasks["donor_accept"]
+    assert gbdt.pre.to_dict() == load_source(ck / "w-gbdt", "donor_accept").pre.to_dict()  # trees keep the source layout
+    assert gbdt.predictor.est.n_iter_ > load_source(ck / "w-gbdt", "donor_accept").predictor.est.n_iter_
+
+
+def test_distilled_student_serves_with_teacher_fallback(synth_dataset: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    card = train_version("dist-0.1", [synth_dataset], tasks=["donor_accept"], backend="gbdt", model_dir=tmp_path, quick=True, n_boot=0,
+                         distill="linear", distill_tol=0.05)
+    d = card["distillation"]["tasks"]["donor_accept"]
+    assert d["teacher"] == "gbdt" and d["student"] == "linear" and d["accepted"] and d["speedup_row"] > 1
+    assert card["tasks"]["donor_accept"]["backend"] == "gbdt"  # the teacher stays the task's head
+    vd = tmp_path / "dist-0.1"
+    plain, packed = LoadedModel.load(vd, packed=False).tasks["donor_accept"], LoadedModel.load(vd).tasks["donor_accept"]
+    assert (plain.backend, plain.teacher_backend) == (packed.backend, packed.teacher_backend) == ("linear", "gbdt")
+    rows = load_task_rows([synth_dataset], "donor_accept")[:300]
+    X = plain.pre.transform(rows)
+    assert np.allclose(plain.predictor.predict(X), packed.predictor.predict(X), atol=1e-6)
+    assert np.corrcoef(plain.predictor.predict(X), plain.teacher.predict(X))[0, 1] > 0.6
+    assert plain.metrics["metrics"]["auroc"] == d["primary_student"]  # confidence uses the served head's own metrics
+
+    calls = api_module._state["fallbacks"]["teacher"]
+    monkeypatch.setattr(plain.predictor, "predict", lambda X: 1 / 0)
+    pred, backend, used = api_module._run_head(plain, X)
+    assert backend == "gbdt" and used is plain.teacher_metrics and np.allclose(pred, plain.teacher.predict(X))
+    assert api_module._state["fallbacks"]["teacher"] == calls + 1
+    monkeypatch.setenv("ML_DISTILLED", "0")
+    assert LoadedModel.load(vd).tasks["donor_accept"].backend == "gbdt"
+
+    aug = augment_rows(plain.pre, X, 500)  # swapped blocks keep every one-hot group valid
+    start = len(plain.pre.numeric_cols) + len(plain.pre.bool_cols)
+    assert aug.shape == (500, X.shape[1]) and set(np.unique(aug[:, start:])) <= {0.0, 1.0}
+    assert (aug[:, start:start + len(plain.pre.cat_vocab["urgency"])].sum(axis=1) <= 1).all()
+    soft = np.random.default_rng(0).dirichlet(np.ones(4), 200).astype(np.float32)  # multiclass students fit class distributions
+    assert MlpPredictor(get_task("urgency_priority"), epochs=2).fit(X[:200], soft).predict(X[:5]).shape == (5, 4)
+
+
 def test_task_registry_matches_ts_contract():
     ts = Path(__file__).resolve().parents[2] / "lib" / "ml" / "types.ts"
     text = ts.read_text(encoding="utf-8")